@@ -0,0 +1,97 @@
+"""
+Compare the time taken to plan users one by one (MetabaseManager.find_objects_to_*)
+and with columns of bitsets (MetabaseManager.plan_columnar), on generated users.
+
+    python bin/benchmark_users.py --users 100000 --groups 50
+"""
+import argparse
+import random
+import time
+
+import metabase
+
+from metabase_manager.entities import Group, User
+from metabase_manager.manager import MetabaseManager
+from metabase_manager.parser import MetabaseParser
+from metabase_manager.registry import MetabaseRegistry
+
+
+def generate(users: int, groups: int, changed: float, seed: int) -> MetabaseManager:
+    rng = random.Random(seed)
+    names = [f"Group {i}" for i in range(groups)]
+
+    registry = MetabaseRegistry(
+        client=None,
+        groups=[
+            metabase.PermissionGroup(_using=None, id=i + 2, name=name)
+            for i, name in enumerate(names)
+        ],
+    )
+    config = MetabaseParser()
+
+    for i in range(users):
+        email = f"user{i}@example.com"
+        member = rng.sample(range(groups), k=min(3, groups))
+        registry.users.append(
+            metabase.User(
+                _using=None,
+                id=i + 1,
+                email=email,
+                first_name="First",
+                last_name=f"Last {i}",
+                group_ids=[1] + [g + 2 for g in member],
+            )
+        )
+
+        if rng.random() < changed:
+            # moved to another group
+            member = member[1:] + [rng.randrange(groups)]
+        config.register_object(
+            User(
+                first_name="First",
+                last_name=f"Last {i}",
+                email=email,
+                groups=[Group(name=names[g]) for g in member],
+            ),
+            "users",
+        )
+
+    manager = MetabaseManager(
+        metabase_host=None, metabase_user=None, metabase_password=None
+    )
+    manager.registry = registry
+    manager.config = config
+    return manager
+
+
+def measure(manager: MetabaseManager, columnar: bool):
+    manager.columnar = columnar
+    started = time.perf_counter()
+    plan = manager.plan(User)
+    return time.perf_counter() - started, plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--groups", type=int, default=50)
+    parser.add_argument("--changed", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manager = generate(args.users, args.groups, args.changed, args.seed)
+
+    objects, expected = measure(manager, columnar=False)
+    columns, plan = measure(manager, columnar=True)
+
+    for action in ("create", "update", "delete"):
+        keys = sorted(entity.key for entity in getattr(plan, action))
+        assert keys == sorted(entity.key for entity in getattr(expected, action))
+
+    print(f"{args.users} users, {args.groups} groups, {len(plan.update)} updated")
+    print(f"objects:  {objects:.2f}s")
+    print(f"columnar: {columns:.2f}s ({objects / columns:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,47 @@
+from pathlib import Path
+
 import click
 from alive_progress import alive_bar
 
+from metabase_manager.client import MetabaseClient
+from metabase_manager.exceptions import BudgetExceededError, NotFoundError
+from metabase_manager.export import Exporter
+from metabase_manager.journal import Journal
 from metabase_manager.manager import MetabaseManager
+from metabase_manager.parser import MetabaseParser
+from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.report import REPORTERS
+from metabase_manager.rescan import Rescan
+from metabase_manager.serve import Reconciler
+from metabase_manager.shard import Shard
+from metabase_manager.warm import Warm
+
+
+def validate_selectors(ctx, param, value):
+    for selector in value:
+        try:
+            MetabaseManager.resolve_selector(selector)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return value
+
+
+def validate_scope(ctx, param, value):
+    for selector in value:
+        try:
+            Rescan.parse_selector(selector)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return value
+
+
+def validate_shard(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return Shard.parse(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
 
 
 @click.group()
@@ -38,39 +78,140 @@ def cli():
 @click.option(
     "--select",
     "-s",
-    type=click.Choice(MetabaseManager.get_allowed_keys()),
     multiple=True,
-    help="Sync only certain objects.",
+    callback=validate_selectors,
+    metavar=f"[{'|'.join(MetabaseManager.get_allowed_keys())}]",
+    help="Sync only certain objects. Prefix with '+' to include dependencies, "
+    "suffix with '+' to include dependents.",
 )
 @click.option(
     "--exclude",
     "-e",
-    type=click.Choice(MetabaseManager.get_allowed_keys()),
     multiple=True,
-    help="Don't sync certain objects.",
+    callback=validate_selectors,
+    metavar=f"[{'|'.join(MetabaseManager.get_allowed_keys())}]",
+    help="Don't sync certain objects. Accepts the same syntax as --select.",
 )
 @click.option(
     "--no-delete",
     is_flag=True,
     help="Don't run the delete step (only create/update existing objects).",
 )
+@click.option(
+    "--delete-databases",
+    is_flag=True,
+    help="Delete databases that aren't declared, along with the questions using them.",
+)
+@click.option(
+    "--shard",
+    callback=validate_shard,
+    metavar="i/N",
+    help="Only sync the i-th of N partitions of users. "
+    "Objects that can't be partitioned (i.e. groups) are only synced by shard 0.",
+)
+@click.option(
+    "--shard-timeout",
+    default=300.0,
+    type=click.FloatRange(min=0),
+    show_default=True,
+    help="Seconds other shards wait for shard 0 to create the groups of their users.",
+)
+@click.option(
+    "--journal",
+    type=click.Path(dir_okay=False),
+    help="Path to the journal of completed actions, used by --resume. "
+    f"Defaults to {Journal.DEFAULT_PATH}, or one journal per shard with --shard.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Resume an interrupted sync, skipping actions found in the journal.",
+)
+@click.option(
+    "--max-concurrency",
+    default=8,
+    type=click.IntRange(min=1),
+    help="Maximum number of concurrent requests to Metabase.",
+)
+@click.option(
+    "--max-rps",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Maximum number of requests per second to Metabase.",
+)
+@click.option(
+    "--max-requests",
+    type=click.IntRange(min=0),
+    help="Don't apply any change if the sync requires more requests than this.",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write metrics of the sync to a file, in the text format of Prometheus.",
+)
+@click.option(
+    "--columnar",
+    is_flag=True,
+    help="Compare users as columns of bitsets, faster with many users.",
+)
+@click.option(
+    "--output",
+    type=click.Choice(list(REPORTERS)),
+    default="human",
+    show_default=True,
+    help="Format of the logs: every action, a summary, or one JSON event per line.",
+)
 @click.option("--silent", is_flag=True, help="Don't print logs.")
 @click.option(
     "--dry-run", is_flag=True, help="Don't execute commands that mutate Metabase."
 )
-def sync(file, host, user, password, select, exclude, no_delete, silent, dry_run):
+def sync(
+    file,
+    host,
+    user,
+    password,
+    select,
+    exclude,
+    no_delete,
+    delete_databases,
+    shard,
+    shard_timeout,
+    journal,
+    resume,
+    max_concurrency,
+    max_rps,
+    max_requests,
+    metrics_file,
+    columnar,
+    output,
+    silent,
+    dry_run,
+):
     """
     Sync your declared configuration to Metabase.
     """
+    journal = Journal(path=journal or Journal.get_default_path(shard))
+    if resume:
+        journal.load()
+    elif not dry_run:
+        journal.clear()
+
     manager = MetabaseManager(
         select=select,
         exclude=exclude,
+        shard=shard,
+        shard_timeout=shard_timeout,
+        journal=journal,
+        delete_databases=delete_databases,
+        max_concurrency=max_concurrency,
+        max_rps=max_rps,
+        columnar=columnar,
+        reporter=None if silent else REPORTERS[output](),
         metabase_host=host,
         metabase_user=user,
         metabase_password=password,
     )
-    manager.parse_config(paths=file)
-    manager.cache_metabase()
+    # objects to sync depend on the keys declared in the config, see get_selected_keys()
+    manager.parse_config(file)
 
     with alive_bar(
         total=len(manager.get_entities_to_manage()),
@@ -81,29 +222,485 @@ def sync(file, host, user, password, select, exclude, no_delete, silent, dry_run
         enrich_print=False,
         receipt=True,
         elapsed="[{elapsed}]",
-        disable=silent,
+        # events are the only output of jsonl
+        disable=silent or output == "jsonl",
     ) as bar:
-        for obj in manager.get_entities_to_manage():
-            bar.text(obj.__name__)
-            manager.cache_metabase()
-
-            for entity in manager.find_objects_to_create(obj):
-                if not silent:
-                    click.echo(click.style(f"[CREATE] {entity}", fg="green"))
-                if not dry_run:
-                    manager.create(entity)
-
-            for entity in manager.find_objects_to_update(obj):
-                if not silent:
-                    click.echo(click.style(f"[UPDATE] {entity}", fg="yellow"))
-                if not dry_run:
-                    manager.update(entity)
-
-            if not no_delete:
-                for entity in manager.find_objects_to_delete(obj):
-                    if not silent:
-                        click.echo(click.style(f"[DELETE] {entity}", fg="red"))
-                    if not dry_run:
-                        manager.delete(entity)
 
+        def progress(obj):
+            bar.text(obj.__name__)
             bar()
+
+        try:
+            result = manager.sync(
+                delete=not no_delete,
+                dry_run=dry_run,
+                max_requests=max_requests,
+                progress=progress,
+            )
+            # a complete sync leaves nothing to resume
+            if result.ok and not dry_run:
+                journal.clear()
+        except BudgetExceededError as e:
+            raise click.ClickException(str(e))
+        finally:
+            if not silent:
+                manager.reporter.flush()
+            if metrics_file is not None:
+                # written even if the sync failed, to alert on failures
+                manager.client.metrics.write(metrics_file)
+
+    if not silent:
+        limiter = manager.client.limiter
+        manager.reporter.log(
+            f"Sent {limiter.requests} requests at {limiter.rate:.1f} requests/s, "
+            f"settled at {int(limiter.limit)} concurrent requests "
+            f"({limiter.throttled} throttled by Metabase)."
+        )
+        manager.reporter.close()
+
+
+@cli.command()
+@click.option(
+    "--host",
+    "-h",
+    envvar="METABASE_HOST",
+    required=True,
+    help="Metabase URL (ex. https://<org>.metabaseapp.com)",
+)
+@click.option(
+    "--user", "-u", envvar="METABASE_USER", required=True, help="Metabase user"
+)
+@click.option(
+    "--password",
+    "-p",
+    envvar="METABASE_PASSWORD",
+    required=True,
+    help="Metabase password",
+)
+@click.option(
+    "--select",
+    "-s",
+    multiple=True,
+    callback=validate_scope,
+    metavar="database[.schema[.table]]",
+    help="Rescan only certain databases, schemas or tables.",
+)
+@click.option(
+    "--sync-schema/--no-sync-schema",
+    default=True,
+    help="Sync the schema of databases.",
+)
+@click.option(
+    "--rescan-values/--no-rescan-values",
+    default=True,
+    help="Rescan the field values of databases.",
+)
+@click.option(
+    "--max-concurrency",
+    default=2,
+    type=click.IntRange(min=1),
+    help="Maximum number of databases rescanned at once.",
+)
+@click.option(
+    "--poll-interval",
+    default=5.0,
+    type=click.FloatRange(min=0),
+    help="Seconds between checks for the completion of a rescan.",
+)
+@click.option(
+    "--timeout",
+    default=3600.0,
+    type=click.FloatRange(min=0),
+    help="Seconds to wait for the rescan of a database to complete.",
+)
+@click.option("--silent", is_flag=True, help="Don't print logs.")
+def rescan(
+    host,
+    user,
+    password,
+    select,
+    sync_schema,
+    rescan_values,
+    max_concurrency,
+    poll_interval,
+    timeout,
+    silent,
+):
+    """
+    Sync the schema and rescan the field values of databases.
+    """
+    client = MetabaseClient(host=host, user=user, password=password)
+    rescanner = Rescan(
+        registry=MetabaseRegistry(client=client),
+        select=list(select),
+        sync_schema=sync_schema,
+        rescan_values=rescan_values,
+        max_concurrency=max_concurrency,
+        poll_interval=poll_interval,
+        timeout=timeout,
+    )
+
+    failed = 0
+    try:
+        for result in rescanner.run():
+            scope = ""
+            if result.tables is not None:
+                scope = f" ({result.tables} table{'s' if result.tables != 1 else ''})"
+            if result.error is not None:
+                failed += 1
+                message = click.style(
+                    f"[FAILED] {result.database}{scope} after {result.duration:.1f}s: "
+                    f"{result.error}",
+                    fg="red",
+                )
+            else:
+                message = click.style(
+                    f"[DONE] {result.database}{scope} in {result.duration:.1f}s",
+                    fg="green",
+                )
+            if not silent:
+                click.echo(message)
+    except NotFoundError as e:
+        raise click.ClickException(str(e))
+
+    if failed:
+        raise click.ClickException(f"Failed to rescan {failed} database(s).")
+
+
+@cli.command()
+@click.option(
+    "--host",
+    "-h",
+    envvar="METABASE_HOST",
+    required=True,
+    help="Metabase URL (ex. https://<org>.metabaseapp.com)",
+)
+@click.option(
+    "--user", "-u", envvar="METABASE_USER", required=True, help="Metabase user"
+)
+@click.option(
+    "--password",
+    "-p",
+    envvar="METABASE_PASSWORD",
+    required=True,
+    help="Metabase password",
+)
+@click.option(
+    "--select",
+    "-s",
+    multiple=True,
+    callback=validate_selectors,
+    metavar=f"[{'|'.join(MetabaseManager.get_allowed_keys())}]",
+    help="Export only certain objects. Accepts the same syntax as sync.",
+)
+@click.option(
+    "--exclude",
+    "-e",
+    multiple=True,
+    callback=validate_selectors,
+    metavar=f"[{'|'.join(MetabaseManager.get_allowed_keys())}]",
+    help="Don't export certain objects. Accepts the same syntax as --select.",
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Write a file per object type to this directory, rather than to stdout.",
+)
+@click.option(
+    "--max-objects",
+    type=click.IntRange(min=1),
+    help="Split each object type into files of at most this many objects. "
+    "Requires --output.",
+)
+@click.option(
+    "--page-size",
+    default=1000,
+    type=click.IntRange(min=1),
+    help="Number of users read from Metabase per request.",
+)
+@click.option("--silent", is_flag=True, help="Don't print logs.")
+def export(
+    host, user, password, select, exclude, output, max_objects, page_size, silent
+):
+    """
+    Export the objects found in Metabase to a YAML configuration.
+    """
+    if max_objects is not None and output is None:
+        raise click.UsageError("--max-objects requires --output.")
+
+    manager = MetabaseManager(
+        select=select,
+        exclude=exclude,
+        metabase_host=host,
+        metabase_user=user,
+        metabase_password=password,
+    )
+    exporter = Exporter(
+        registry=MetabaseRegistry(client=manager.client),
+        entities={key: manager.get_entity(key) for key in manager.get_selected_keys()},
+        page_size=page_size,
+    )
+
+    if output is None:
+        counts = exporter.export(click.get_text_stream("stdout"))
+    else:
+        counts = exporter.export_files(output, max_objects=max_objects)
+
+    if not silent:
+        for name, count in counts.items():
+            click.echo(f"[EXPORT] {name}: {count} object(s)", err=True)
+
+
+@cli.command()
+@click.option(
+    "--file",
+    "-f",
+    type=click.Path(exists=True),
+    multiple=True,
+    help="Warm the cards and dashboards declared in YAML configuration file(s).",
+)
+@click.option(
+    "--host",
+    "-h",
+    envvar="METABASE_HOST",
+    required=True,
+    help="Metabase URL (ex. https://<org>.metabaseapp.com)",
+)
+@click.option(
+    "--user", "-u", envvar="METABASE_USER", required=True, help="Metabase user"
+)
+@click.option(
+    "--password",
+    "-p",
+    envvar="METABASE_PASSWORD",
+    required=True,
+    help="Metabase password",
+)
+@click.option(
+    "--select",
+    "-s",
+    multiple=True,
+    metavar="/collection | /collection:name",
+    help="Warm every card in a collection and its children, or a card or dashboard.",
+)
+@click.option(
+    "--max-concurrency",
+    default=4,
+    type=click.IntRange(min=1),
+    help="Maximum number of queries run at once.",
+)
+@click.option(
+    "--max-per-database",
+    default=2,
+    type=click.IntRange(min=1),
+    help="Maximum number of queries run at once on a database.",
+)
+@click.option(
+    "--budget",
+    type=click.FloatRange(min=0),
+    help="Seconds after which queries that haven't started are skipped.",
+)
+@click.option("--silent", is_flag=True, help="Don't print logs.")
+def warm(
+    file,
+    host,
+    user,
+    password,
+    select,
+    max_concurrency,
+    max_per_database,
+    budget,
+    silent,
+):
+    """
+    Run the queries of cards and dashboards so that their results are cached.
+    """
+    select = list(select)
+    if file:
+        config = MetabaseParser.from_paths(file)
+        # cards and dashboards declared with an entity id are selected by name
+        select.extend(f"{obj.collection}:{obj.name}" for obj in config.cards)
+        select.extend(f"{obj.collection}:{obj.name}" for obj in config.dashboards)
+    if not select:
+        raise click.UsageError("Select cards or dashboards with --select or --file.")
+
+    client = MetabaseClient(
+        host=host,
+        user=user,
+        password=password,
+        limiter=Warm.get_limiter(max_concurrency),
+    )
+    warmer = Warm(
+        registry=MetabaseRegistry(client=client),
+        select=select,
+        max_concurrency=max_concurrency,
+        max_per_database=max_per_database,
+        budget=budget,
+    )
+
+    failed = skipped = 0
+    try:
+        for result in warmer.run():
+            if result.skipped:
+                skipped += 1
+                message = click.style(f"[SKIPPED] {result.card}", fg="yellow")
+            elif result.error is not None:
+                failed += 1
+                message = click.style(
+                    f"[FAILED] {result.card} after {result.duration:.1f}s: "
+                    f"{result.error}",
+                    fg="red",
+                )
+            else:
+                message = click.style(
+                    f"[DONE] {result.card} in {result.duration:.1f}s", fg="green"
+                )
+            if not silent:
+                click.echo(message)
+    except NotFoundError as e:
+        raise click.ClickException(str(e))
+
+    if skipped and not silent:
+        click.echo(f"Skipped {skipped} card(s) after the time budget ran out.")
+    if failed:
+        raise click.ClickException(f"Failed to warm {failed} card(s).")
+
+
+@cli.command()
+@click.option(
+    "--file",
+    "-f",
+    default=["metabase.yml"],
+    type=click.Path(exists=True),
+    multiple=True,
+    help="Path(s) to YAML configuration file.",
+)
+@click.option(
+    "--host",
+    "-h",
+    envvar="METABASE_HOST",
+    required=True,
+    help="Metabase URL (ex. https://<org>.metabaseapp.com)",
+)
+@click.option(
+    "--user", "-u", envvar="METABASE_USER", required=True, help="Metabase user"
+)
+@click.option(
+    "--password",
+    "-p",
+    envvar="METABASE_PASSWORD",
+    required=True,
+    help="Metabase password",
+)
+@click.option(
+    "--select",
+    "-s",
+    multiple=True,
+    callback=validate_selectors,
+    metavar=f"[{'|'.join(MetabaseManager.get_allowed_keys())}]",
+    help="Sync only certain objects. Prefix with '+' to include dependencies, "
+    "suffix with '+' to include dependents.",
+)
+@click.option(
+    "--exclude",
+    "-e",
+    multiple=True,
+    callback=validate_selectors,
+    metavar=f"[{'|'.join(MetabaseManager.get_allowed_keys())}]",
+    help="Don't sync certain objects. Accepts the same syntax as --select.",
+)
+@click.option(
+    "--no-delete",
+    is_flag=True,
+    help="Don't run the delete step (only create/update existing objects).",
+)
+@click.option(
+    "--delete-databases",
+    is_flag=True,
+    help="Delete databases that aren't declared, along with the questions using them.",
+)
+@click.option(
+    "--interval",
+    default=300.0,
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    help="Seconds between syncs of every selected object, correcting drift.",
+)
+@click.option(
+    "--poll",
+    default=0.5,
+    type=click.FloatRange(min=0, min_open=True),
+    show_default=True,
+    help="Seconds between checks for changed configuration files.",
+)
+@click.option(
+    "--address",
+    default="127.0.0.1",
+    show_default=True,
+    help="Address of the HTTP server to trigger syncs and read their status.",
+)
+@click.option(
+    "--port", default=8080, show_default=True, help="Port of the HTTP server."
+)
+@click.option(
+    "--max-concurrency",
+    default=8,
+    type=click.IntRange(min=1),
+    help="Maximum number of concurrent requests to Metabase.",
+)
+@click.option(
+    "--output",
+    type=click.Choice(list(REPORTERS)),
+    default="human",
+    show_default=True,
+    help="Format of the logs: every action, a summary, or one JSON event per line.",
+)
+@click.option("--silent", is_flag=True, help="Don't print logs.")
+def serve(
+    file,
+    host,
+    user,
+    password,
+    select,
+    exclude,
+    no_delete,
+    delete_databases,
+    interval,
+    poll,
+    address,
+    port,
+    max_concurrency,
+    output,
+    silent,
+):
+    """
+    Keep Metabase in sync with your configuration, syncing again when files change.
+    """
+    manager = MetabaseManager(
+        select=list(select),
+        exclude=list(exclude),
+        delete_databases=delete_databases,
+        max_concurrency=max_concurrency,
+        # failed actions are reported in the status, and retried by the next sync
+        stop_on_error=False,
+        reporter=None if silent else REPORTERS[output](buffer_size=100),
+        metabase_host=host,
+        metabase_user=user,
+        metabase_password=password,
+    )
+    reconciler = Reconciler(
+        manager=manager,
+        paths=list(file),
+        interval=interval,
+        poll=poll,
+        delete=not no_delete,
+    )
+
+    reconciler.log(
+        f"Serving on http://{address}:{port} (GET /status, GET /metrics, POST /sync)"
+    )
+    try:
+        reconciler.serve(address=address, port=port)
+    except KeyboardInterrupt:
+        reconciler.stop()
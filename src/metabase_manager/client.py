@@ -0,0 +1,85 @@
+import time
+from typing import Optional
+
+import requests
+from metabase import Metabase
+
+from metabase_manager.metrics import Metrics
+from metabase_manager.throttle import AdaptiveLimiter
+
+
+class MetabaseClient(Metabase):
+    """
+    Metabase client sending every request through an AdaptiveLimiter,
+    and retrying requests that Metabase rejected because it is overloaded.
+    """
+
+    RETRY_STATUS_CODES = (429, 503)
+
+    def __init__(
+        self,
+        host: str,
+        user: str,
+        password: str,
+        token: str = None,
+        limiter: AdaptiveLimiter = None,
+        max_retries: int = 3,
+        metrics: Metrics = None,
+    ):
+        super(MetabaseClient, self).__init__(
+            host=host, user=user, password=password, token=token
+        )
+        self.limiter = limiter or AdaptiveLimiter()
+        self.max_retries = max_retries
+        self.metrics = metrics or Metrics()
+
+    @staticmethod
+    def get_retry_delay(response: requests.Response, attempt: int) -> float:
+        """Seconds to wait before retrying, honoring the Retry-After header if any."""
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return 0.5 * 2**attempt
+
+    def request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """
+        Send a request once the limiter allows it. The seconds taken by the last attempt,
+        without waiting for the limiter, are set as the `latency` of the response.
+        """
+        for attempt in range(self.max_retries + 1):
+            status_code: Optional[int] = None
+            started = self.limiter.acquire()
+            try:
+                response = requests.request(
+                    method, self.host + endpoint, headers=self.headers, **kwargs
+                )
+                status_code = response.status_code
+            finally:
+                self.limiter.release(started, status_code)
+            response.latency = time.monotonic() - started
+
+            self.metrics.inc(
+                "metabase_manager_http_responses_total",
+                method=method.upper(),
+                status=status_code,
+            )
+            if (
+                response.status_code not in self.RETRY_STATUS_CODES
+                or attempt == self.max_retries
+            ):
+                return response
+
+            self.metrics.inc("metabase_manager_http_retries_total", status=status_code)
+            time.sleep(self.get_retry_delay(response, attempt))
+
+    def get(self, endpoint: str, **kwargs):
+        return self.request("get", endpoint, **kwargs)
+
+    def post(self, endpoint: str, **kwargs):
+        return self.request("post", endpoint, **kwargs)
+
+    def put(self, endpoint: str, **kwargs):
+        return self.request("put", endpoint, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs):
+        return self.request("delete", endpoint, **kwargs)
@@ -0,0 +1,137 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import metabase
+
+from metabase_manager.entities import User
+from metabase_manager.registry import MetabaseRegistry
+
+# 'All Users' is always the first group and is mandatory, see User.group_ids
+ALL_USERS = 1 << 1
+
+
+def to_bitset(group_ids: Iterable[int]) -> int:
+    """
+    Get the bitset of a list of group ids, where bit i is set for group i. Bit 0 stands for
+    groups that don't exist yet (id -1), since Metabase never uses the id 0.
+    """
+    bitset = 0
+    for group_id in group_ids:
+        bitset |= 1 << group_id if group_id > 0 else 1
+    return bitset
+
+
+def from_bitset(bitset: int) -> List[int]:
+    """Get the ids of the groups in a bitset, the inverse of to_bitset()."""
+    ids = []
+    while bitset:
+        low = bitset & -bitset
+        position = low.bit_length() - 1
+        ids.append(-1 if position == 0 else position)
+        bitset ^= low
+    return ids
+
+
+@dataclass
+class UserColumns:
+    """Users stored as columns, with their groups as bitsets of group ids."""
+
+    emails: List[str] = field(default_factory=list)
+    first_names: List[str] = field(default_factory=list)
+    last_names: List[str] = field(default_factory=list)
+    groups: List[int] = field(default_factory=list)
+    login_attributes: List[Optional[Dict[str, Any]]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.emails)
+
+    @classmethod
+    def from_config(
+        cls, users: Iterable[User], registry: MetabaseRegistry
+    ) -> "UserColumns":
+        """Store users of the config, resolving each group name once."""
+        columns = cls()
+        masks: Dict[str, int] = {}
+
+        for user in users:
+            bitset = ALL_USERS
+            for group in user.groups:
+                if group.name not in masks:
+                    resource = registry.get_group_by_name(group.name)
+                    # placeholder for groups created by the same sync, see User.group_ids
+                    masks[group.name] = to_bitset([resource.id if resource else -1])
+                bitset |= masks[group.name]
+
+            columns.emails.append(user.email)
+            columns.first_names.append(user.first_name)
+            columns.last_names.append(user.last_name)
+            columns.groups.append(bitset)
+            columns.login_attributes.append(user.login_attributes)
+
+        return columns
+
+    @classmethod
+    def from_metabase(cls, users: Iterable[metabase.User]) -> "UserColumns":
+        columns = cls()
+        for user in users:
+            columns.emails.append(user.email)
+            columns.first_names.append(user.first_name)
+            columns.last_names.append(user.last_name)
+            columns.groups.append(to_bitset(getattr(user, "group_ids", None) or []))
+            columns.login_attributes.append(
+                getattr(user, "login_attributes", None) or {}
+            )
+
+        return columns
+
+
+@dataclass
+class UserDiff:
+    """
+    Differences between the users of the config and of Metabase, computed column by
+    column. Users are referred to by email, and groups by bitsets of group ids.
+    """
+
+    create: List[str] = field(default_factory=list)
+    update: List[str] = field(default_factory=list)
+    delete: List[str] = field(default_factory=list)
+    # groups each updated user is added to, and removed from
+    added: Dict[str, int] = field(default_factory=dict)
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def compute(cls, config: UserColumns, metabase: UserColumns) -> "UserDiff":
+        diff = cls()
+
+        # emails are interned to the row of the user in Metabase
+        rows = {email: row for row, email in enumerate(metabase.emails)}
+        matched = [rows.get(email) for email in config.emails]
+
+        for i, j in enumerate(matched):
+            if j is None:
+                diff.create.append(config.emails[i])
+                continue
+
+            groups, other = config.groups[i], metabase.groups[j]
+            attributes = config.login_attributes[i]
+            if (
+                groups != other
+                or config.first_names[i] != metabase.first_names[j]
+                or config.last_names[i] != metabase.last_names[j]
+                or (
+                    attributes is not None
+                    and attributes != metabase.login_attributes[j]
+                )
+            ):
+                email = config.emails[i]
+                diff.update.append(email)
+                if groups != other:
+                    diff.added[email] = groups & ~other
+                    diff.removed[email] = other & ~groups
+
+        found = set(matched)
+        diff.delete = [
+            email for j, email in enumerate(metabase.emails) if j not in found
+        ]
+
+        return diff
@@ -1,17 +1,31 @@
-from dataclasses import dataclass, field
-from typing import ClassVar, List, Type
+from dataclasses import MISSING, dataclass, field, fields
+from typing import Any, ClassVar, Dict, List, Optional, Set, Tuple, Type
 from uuid import uuid4
 
 import metabase
 from metabase.resource import Resource
 from requests import HTTPError
 
-from metabase_manager.exceptions import NotFoundError
+from metabase_manager import resources
+from metabase_manager.exceptions import InvalidConfigError, NotFoundError
+from metabase_manager.files import FileCache
+from metabase_manager.mbql import hash_sql, normalize
 from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.resources import SchemasPermission
 
 
 class Entity:
     METABASE: ClassVar[Type[Resource]]
+    # other Entity types that must be synced before this one
+    DEPENDENCIES: ClassVar[List[Type["Entity"]]] = []
+    # whether objects can be partitioned across shards by key, see Shard
+    SHARDED: ClassVar[bool] = False
+    # number of HTTP requests sent to Metabase by each action
+    REQUESTS: ClassVar[Dict[str, int]] = {"create": 1, "update": 1, "delete": 1}
+    # whether changes are applied all at once with apply_many(), rather than one by one
+    BULK: ClassVar[bool] = False
+    # whether objects that aren't declared are only deleted when selected explicitly
+    EXPLICIT_DELETE: ClassVar[bool] = False
     _resource: Resource = field(default=None, repr=False)
     registry: MetabaseRegistry = field(default=None, repr=False)
 
@@ -31,7 +45,11 @@ class Entity:
 
     @resource.setter
     def resource(self, value):
-        if self.key != self.get_key_from_metabase_instance(value):
+        keys = [
+            self.get_key_from_metabase_instance(value),
+            *self.get_alternate_keys(value),
+        ]
+        if self.key not in keys and not set(self.get_fallback_keys()) & set(keys):
             raise ValueError(
                 f"Key mismatch between Entity and Resource: {self.key}, {self.get_key_from_metabase_instance(value)}"
             )
@@ -46,6 +64,21 @@ class Entity:
         """
         raise NotImplementedError
 
+    @staticmethod
+    def get_alternate_keys(resource: Resource) -> List[str]:
+        """
+        Get other keys a Metabase Resource can be declared with (i.e. an entity id).
+        A Resource matches an Entity declared with one of these keys instead of its key.
+        """
+        return []
+
+    def get_fallback_keys(self) -> List[str]:
+        """
+        Get other keys an Entity matches a Resource with, when no Resource has its key
+        (i.e. the name of a card declared with an entity id Metabase didn't keep).
+        """
+        return []
+
     @classmethod
     def from_resource(cls, resource: Resource) -> "Entity":
         """Create an instance of Entity from a Resource."""
@@ -59,6 +92,36 @@ class Entity:
         """
         return True
 
+    @classmethod
+    def can_export(cls, resource: Resource) -> bool:
+        """
+        Whether a resource is written by `export`. Objects that can't be deleted
+        are protected or implicit (i.e. Administrators group) and aren't declared.
+        """
+        return cls.can_delete(resource)
+
+    @classmethod
+    def export(cls, resource: Resource, registry: MetabaseRegistry) -> dict:
+        """Get the config definition of a Resource, resolving references through the registry."""
+        return cls.from_resource(resource).dump()
+
+    def dump(self) -> dict:
+        """Dump an Entity to a dictionary, the inverse of Entity.load()."""
+        config = {}
+        for f in fields(self):
+            if f.name.startswith("_") or f.name == "registry":
+                continue
+
+            value = getattr(self, f.name)
+            default = (
+                f.default_factory() if f.default_factory is not MISSING else f.default
+            )
+            if value != default:
+                # attributes left to their default value are omitted
+                config[f.name] = value
+
+        return config
+
     def is_equal(self, resource: Resource) -> bool:
         """
         Whether an Entity should be considered equal to a given Resource.
@@ -66,6 +129,49 @@ class Entity:
         """
         raise NotImplementedError
 
+    def estimate_requests(self, action: str) -> int:
+        """Estimate the number of HTTP requests sent to Metabase by an action."""
+        return self.REQUESTS[action]
+
+    @classmethod
+    def estimate_requests_many(
+        cls, create: List["Entity"], update: List["Entity"], delete: List["Entity"]
+    ) -> int:
+        """Estimate the number of HTTP requests sent to Metabase to apply several changes."""
+        return (
+            sum(entity.estimate_requests("create") for entity in create)
+            + sum(entity.estimate_requests("update") for entity in update)
+            + sum(entity.estimate_requests("delete") for entity in delete)
+        )
+
+    @classmethod
+    def apply_many(
+        cls,
+        using: metabase.Metabase,
+        create: List["Entity"],
+        update: List["Entity"],
+        delete: List["Entity"],
+    ):
+        """Apply several changes at once, for Entities where BULK is True."""
+        raise NotImplementedError
+
+    @classmethod
+    def batch(cls, entities: List["Entity"], action: str) -> List[List["Entity"]]:
+        """
+        Split the Entities on which to apply an action into batches applied one after the other.
+        Entities in the same batch are applied concurrently.
+        """
+        return [entities]
+
+    def get_changes(self) -> List[str]:
+        """
+        Get the names of the attributes that differ from the Resource to update, for
+        Entities that compare attributes one by one (i.e. with a get_delta() method).
+        """
+        if self.resource is None or not hasattr(self, "get_delta"):
+            return []
+        return sorted(self.get_delta(self.resource))
+
     def create(self, using: metabase.Metabase):
         """Create an Entity in Metabase based on the config definition."""
         raise NotImplementedError
@@ -83,8 +189,12 @@ class Entity:
 class Group(Entity):
     METABASE: ClassVar = metabase.PermissionGroup
     _PROTECTED: ClassVar = ["All Users", "Administrators"]
+    # groups are never updated, see Group.update()
+    REQUESTS: ClassVar = {"create": 1, "update": 0, "delete": 1}
 
     name: str
+    # emails of members, or patterns of emails (i.e. *@finance.example.com)
+    members: List[str] = field(default_factory=list, repr=False)
 
     _resource: metabase.PermissionGroup = field(default=None, repr=False)
 
@@ -113,7 +223,7 @@ class Group(Entity):
         return cls(name=resource.name, _resource=resource)
 
     def create(self, using: metabase.Metabase):
-        metabase.PermissionGroup.create(using=using, name=self.name)
+        self._resource = metabase.PermissionGroup.create(using=using, name=self.name)
 
     def update(self):
         # PermissionGroup should not be updated given the only attribute is the key
@@ -127,11 +237,19 @@ class Group(Entity):
 @dataclass
 class User(Entity):
     METABASE: ClassVar = metabase.User
+    DEPENDENCIES: ClassVar = [Group]
+    SHARDED: ClassVar = True
+    # users are invited once created; group membership is set by the same request
+    REQUESTS: ClassVar = {"create": 2, "update": 1, "delete": 1}
+    # creating a deactivated user fails, then the user is found, reactivated and updated
+    REACTIVATE_REQUESTS: ClassVar = 4
 
     first_name: str
     last_name: str
     email: str
     groups: List[Group] = field(default_factory=list)
+    # attributes used by sandboxes, only synced if declared
+    login_attributes: Optional[Dict[str, Any]] = None
 
     _resource: metabase.User = field(default=None, repr=False)
     registry: MetabaseRegistry = field(default=None, repr=False)
@@ -169,30 +287,70 @@ class User(Entity):
 
         return ids
 
-    def is_equal(self, user: metabase.User) -> bool:
-        if (
-            self.first_name == user.first_name
-            and self.last_name == user.last_name
-            and self.email == user.email
-            and set(self.group_ids) == set(user.group_ids)
+    def get_delta(self, user: metabase.User) -> Dict[str, Any]:
+        """Get the attributes that differ between the config and a metabase.User."""
+        delta = {
+            attribute: getattr(self, attribute)
+            for attribute in ("first_name", "last_name", "email")
+            if getattr(self, attribute) != getattr(user, attribute)
+        }
+
+        group_ids = self.group_ids
+        if set(group_ids) != set(getattr(user, "group_ids", None) or []):
+            delta["group_ids"] = group_ids
+
+        if self.login_attributes is not None and self.login_attributes != (
+            getattr(user, "login_attributes", None) or {}
         ):
-            return True
-        return False
+            delta["login_attributes"] = self.login_attributes
+
+        return delta
+
+    def is_equal(self, user: metabase.User) -> bool:
+        return not self.get_delta(user)
 
     @staticmethod
     def get_key_from_metabase_instance(resource: metabase.User) -> str:
         return resource.email
 
     @classmethod
-    def from_resource(cls, resource: metabase.User) -> "User":
+    def from_resource(
+        cls, resource: metabase.User, registry: MetabaseRegistry = None
+    ) -> "User":
+        groups = "<Unknown>"
+        if registry is not None:
+            # 'All Users' is implicit, see User.group_ids
+            index = registry.get_index("groups", "id")
+            groups = [
+                Group(name=index[group_id].name)
+                for group_id in getattr(resource, "group_ids", None) or []
+                if group_id in index and group_id != 1
+            ]
+
         return cls(
             first_name=resource.first_name,
             last_name=resource.last_name,
             email=resource.email,
-            groups="<Unknown>",
+            groups=groups,
+            login_attributes=getattr(resource, "login_attributes", None) or None,
             _resource=resource,
+            registry=registry,
         )
 
+    @classmethod
+    def export(cls, resource: metabase.User, registry: MetabaseRegistry) -> dict:
+        return cls.from_resource(resource, registry=registry).dump()
+
+    def dump(self) -> dict:
+        config = super().dump()
+        if "groups" in config:
+            if isinstance(self.groups, list):
+                config["groups"] = [group.name for group in self.groups]
+            else:
+                # groups are unknown without a registry, see User.from_resource()
+                config.pop("groups")
+        return config
+
     def create(self, using: metabase.Metabase):
         try:
             self.validate_groups()
@@ -203,8 +361,10 @@ class User(Entity):
                 email=self.email,
                 password=uuid4().hex,
                 group_ids=self.group_ids,
+                login_attributes=self.login_attributes,
             )
             user.send_invite()
+            self._resource = user
 
         except HTTPError as e:
             if "Email address already in use." in str(e):
@@ -219,19 +379,1738 @@ class User(Entity):
 
     def update(self):
         self.validate_groups()
-        self.resource.update(
-            first_name=self.first_name,
-            last_name=self.last_name,
-            email=self.email,
-            group_ids=self.group_ids,
-        )
+        # only the changed attributes are sent, i.e. a change of login attributes
+        # doesn't rewrite the name or group membership of a user
+        delta = self.get_delta(self.resource)
+        if delta:
+            super(metabase.User, self.resource).update(**delta)
 
     def delete(self):
         self.resource.delete()
 
+    def estimate_requests(self, action: str) -> int:
+        if (
+            action == "create"
+            and self.registry is not None
+            and self.email in self.registry.get_deactivated_emails()
+        ):
+            return self.REACTIVATE_REQUESTS
+        return super().estimate_requests(action)
+
     def validate_groups(self):
         if -1 in self.group_ids:
             group = self.groups[self.group_ids.index(-1)]
             raise NotFoundError(
                 f"User {self.email} is part of group {group.name} which could not be found in Metabase."
             )
+
+
+@dataclass
+class Database(Entity):
+    """
+    A database connection. Only declared attributes and connection details are compared,
+    and secrets redacted by Metabase are ignored, so unchanged databases are never updated.
+    """
+
+    METABASE: ClassVar = metabase.Database
+    # the schema is synced and field values rescanned after connection details change
+    REQUESTS: ClassVar = {"create": 1, "update": 3, "delete": 1}
+    # value of secrets in the connection details returned by Metabase
+    REDACTED: ClassVar = "**MetabasePass**"
+    # attributes that can be declared, compared and updated, other than details and schedules
+    ATTRIBUTES: ClassVar = (
+        "engine",
+        "description",
+        "is_full_sync",
+        "is_on_demand",
+        "auto_run_queries",
+        "cache_ttl",
+        "refingerprint",
+    )
+
+    name: str
+    engine: str
+    # not shown in logs, as they contain secrets
+    details: Dict[str, Any] = field(default_factory=dict, repr=False)
+    description: Optional[str] = None
+    schedules: Optional[Dict[str, Dict[str, Any]]] = None
+    is_full_sync: Optional[bool] = None
+    is_on_demand: Optional[bool] = None
+    auto_run_queries: Optional[bool] = None
+    cache_ttl: Optional[int] = None
+    refingerprint: Optional[bool] = None
+
+    _resource: metabase.Database = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return self.name
+
+    @Entity.resource.getter
+    def resource(self) -> metabase.Database:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: metabase.Database) -> str:
+        return resource.name
+
+    @classmethod
+    def from_resource(cls, resource: metabase.Database) -> "Database":
+        return cls(
+            name=resource.name,
+            details=getattr(resource, "details", None) or {},
+            _resource=resource,
+            **{
+                attribute: getattr(resource, attribute, None)
+                for attribute in cls.ATTRIBUTES
+            },
+        )
+
+    @classmethod
+    def can_delete(cls, resource: metabase.Database) -> bool:
+        return not getattr(resource, "is_sample", False)
+
+    @staticmethod
+    def get_schedules(resource: metabase.Database) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the sync schedules of a database. They are only returned when getting a
+        single database, so they are fetched the first time they are needed.
+        """
+        if getattr(resource, "schedules", None) is None:
+            database = metabase.Database.get(resource.id, using=resource._using)
+            resource.schedules = getattr(database, "schedules", None) or {}
+
+        return resource.schedules
+
+    def get_delta(self, resource: metabase.Database) -> Dict[str, Any]:
+        """Get the declared attributes that differ between the config and a resource."""
+        delta = {
+            attribute: getattr(self, attribute)
+            for attribute in self.ATTRIBUTES
+            if getattr(self, attribute) is not None
+            and getattr(self, attribute) != getattr(resource, attribute, None)
+        }
+
+        details = getattr(resource, "details", None) or {}
+        if any(
+            details.get(key) not in (value, self.REDACTED)
+            for key, value in self.details.items()
+        ):
+            # redacted secrets are sent back as is, Metabase keeps their current value
+            delta["details"] = {**details, **self.details}
+
+        if self.schedules:
+            schedules = self.get_schedules(resource)
+            if any(
+                any(schedules.get(name, {}).get(k) != v for k, v in schedule.items())
+                for name, schedule in self.schedules.items()
+            ):
+                delta["schedules"] = self.schedules
+
+        return delta
+
+    def is_equal(self, resource: metabase.Database) -> bool:
+        return not self.get_delta(resource)
+
+    def estimate_requests(self, action: str) -> int:
+        if action == "update" and "details" not in self.get_delta(self.resource):
+            return 1
+        return super().estimate_requests(action)
+
+    def create(self, using: metabase.Metabase):
+        # Metabase syncs the schema of new databases on its own
+        self._resource = metabase.Database.create(
+            using=using,
+            name=self.name,
+            engine=self.engine,
+            details=self.details,
+            is_full_sync=self.is_full_sync,
+            is_on_demand=self.is_on_demand,
+            schedules=self.schedules,
+            auto_run_queries=self.auto_run_queries,
+            cache_ttl=self.cache_ttl,
+            description=self.description,
+            refingerprint=self.refingerprint,
+        )
+
+    def update(self):
+        delta = self.get_delta(self.resource)
+        if not delta:
+            return
+
+        self.resource.update(**delta)
+
+        if "details" in delta:
+            # the schema and field values may have changed along with the connection
+            self.resource.sync_schema()
+            self.resource.rescan_values()
+
+    def delete(self):
+        self.resource.delete()
+
+
+@dataclass
+class Permission(Entity):
+    """Data permissions of a group on a database, its schemas and tables."""
+
+    METABASE: ClassVar = resources.DataPermission
+    DEPENDENCIES: ClassVar = [Group, Database]
+    # all changes are sent in a single request, see Permission.apply_many()
+    BULK: ClassVar = True
+
+    group: str
+    database: str
+    native: str = "none"
+    schemas: SchemasPermission = "none"
+
+    _resource: resources.DataPermission = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.group}/{self.database}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.DataPermission:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.DataPermission) -> str:
+        return f"{resource.group}/{resource.database}"
+
+    @classmethod
+    def from_resource(cls, resource: resources.DataPermission) -> "Permission":
+        return cls(
+            group=resource.group,
+            database=resource.database,
+            native=resource.native,
+            schemas=resource.schemas,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.DataPermission) -> bool:
+        # permissions of administrators can't be changed, and there is
+        # nothing to revoke from groups without any permissions
+        return resource.group != "Administrators" and (
+            resource.native != "none" or resource.schemas != "none"
+        )
+
+    @classmethod
+    def diff(cls, current: Any, desired: Any, depth: int = 0) -> Optional[Any]:
+        """
+        Get the smallest permissions value that turns `current` into `desired`, None if equal.
+        Levels are the schemas of a database (0), the tables of a schema (1), and the
+        permissions of a table (2), which are always compared as a whole.
+        """
+        if current == desired:
+            return None
+
+        if depth == 2 or not isinstance(current, dict) or not isinstance(desired, dict):
+            # changing granularity (i.e. from "all" to some schemas) requires the whole level
+            return desired
+
+        delta = {}
+        for key in list(current) + [k for k in desired if k not in current]:
+            value = cls.diff(
+                current.get(key, "none"), desired.get(key, "none"), depth + 1
+            )
+            if value is not None:
+                delta[key] = value
+
+        return delta or None
+
+    def get_delta(self, resource: resources.DataPermission) -> Dict[str, Any]:
+        """Get the permissions that differ between the config and a resource."""
+        delta = {}
+        if self.native != resource.native:
+            delta["native"] = self.native
+
+        schemas = self.diff(resource.schemas, self.schemas)
+        if schemas is not None:
+            delta["schemas"] = schemas
+
+        return delta
+
+    def is_equal(self, resource: resources.DataPermission) -> bool:
+        return not self.get_delta(resource)
+
+    def to_graph(self, delta: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert permissions to the format of the permissions graph, with table ids."""
+        schemas = delta.get("schemas")
+        if isinstance(schemas, dict):
+            schemas = {
+                schema: self.get_table_ids(schema, tables)
+                if isinstance(tables, dict)
+                else tables
+                for schema, tables in schemas.items()
+            }
+            delta = {**delta, "schemas": schemas}
+
+        return {"data": delta}
+
+    def get_table_ids(self, schema: str, tables: Dict[str, Any]) -> Dict[str, Any]:
+        ids = {}
+        for table, permission in tables.items():
+            if (table_id := self.resource.get_table_id(schema, table)) is None:
+                raise NotFoundError(
+                    f"Table {schema}.{table} could not be found in database {self.database}."
+                )
+            ids[str(table_id)] = permission
+
+        return ids
+
+    @classmethod
+    def estimate_requests_many(
+        cls, create: List["Entity"], update: List["Entity"], delete: List["Entity"]
+    ) -> int:
+        return 1 if create or update or delete else 0
+
+    @classmethod
+    def apply_many(
+        cls,
+        using: metabase.Metabase,
+        create: List["Permission"],
+        update: List["Permission"],
+        delete: List["Permission"],
+    ):
+        for entity in create:
+            # resources.DataPermission lists every group and database, even without permissions
+            raise NotFoundError(
+                f"Group {entity.group} or database {entity.database} could not be found in Metabase."
+            )
+
+        groups = {}
+        for entity in update:
+            delta = entity.to_graph(entity.get_delta(entity.resource))
+            groups.setdefault(str(entity.resource.group_id), {})[
+                str(entity.resource.database_id)
+            ] = delta
+        for entity in delete:
+            groups.setdefault(str(entity.resource.group_id), {})[
+                str(entity.resource.database_id)
+            ] = {"data": {"native": "none", "schemas": "none"}}
+
+        if groups:
+            # only the changed cells are sent, the rest of the graph is left untouched
+            (update + delete)[0].resource.graph.update(groups)
+
+    def create(self, using: metabase.Metabase):
+        self.apply_many(using=using, create=[self], update=[], delete=[])
+
+    def update(self):
+        self.apply_many(using=None, create=[], update=[self], delete=[])
+
+    def delete(self):
+        self.apply_many(using=None, create=[], update=[], delete=[self])
+
+
+@dataclass
+class Collection(Entity):
+    """A collection, identified by its path (i.e. /Finance/Reports)."""
+
+    METABASE: ClassVar = resources.Collection
+    # Metabase requires a color when creating a collection
+    DEFAULT_COLOR: ClassVar = "#509EE3"
+
+    path: str
+    description: Optional[str] = None
+    archived: bool = False
+
+    _resource: resources.Collection = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.path = self.normalize_path(self.path)
+
+    @staticmethod
+    def normalize_path(path: str) -> str:
+        return "/" + path.strip("/")
+
+    @property
+    def key(self) -> str:
+        return self.path
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Collection:
+        return self._resource
+
+    @property
+    def name(self) -> str:
+        return self.path.rsplit("/", 1)[-1]
+
+    @property
+    def parent_path(self) -> Optional[str]:
+        parent = self.path.rsplit("/", 1)[0]
+        return parent or None
+
+    @property
+    def ancestors(self) -> List[str]:
+        """Paths of every collection containing this one."""
+        parts = self.path.split("/")[1:-1]
+        return ["/" + "/".join(parts[: i + 1]) for i in range(len(parts))]
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Collection) -> str:
+        return resource.path
+
+    @classmethod
+    def from_resource(cls, resource: resources.Collection) -> "Collection":
+        return cls(
+            path=resource.path,
+            description=resource.description,
+            archived=resource.archived,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.Collection) -> bool:
+        # collections are archived rather than deleted
+        return not resource.archived
+
+    def is_equal(self, resource: resources.Collection) -> bool:
+        return self.archived == resource.archived and (
+            self.description is None or self.description == resource.description
+        )
+
+    @staticmethod
+    def get_id(registry: MetabaseRegistry, path: str) -> Optional[int]:
+        """Get the id of a collection from its path, None for the root collection."""
+        if path == resources.CollectionPermission.ROOT:
+            return None
+
+        collection = registry.get_collection_by_path(path)
+        if collection is None:
+            raise NotFoundError(f"Collection {path} could not be found in Metabase.")
+        return collection.id
+
+    @classmethod
+    def batch(
+        cls, entities: List["Collection"], action: str
+    ) -> List[List["Collection"]]:
+        if action == "create":
+            # parents are created before their children, one depth at a time
+            depths = {}
+            for entity in entities:
+                depths.setdefault(len(entity.ancestors), []).append(entity)
+            return [depths[depth] for depth in sorted(depths)]
+
+        if action == "delete":
+            # archiving a collection also archives its children
+            paths = {entity.path for entity in entities}
+            return [[e for e in entities if not paths.intersection(e.ancestors)]]
+
+        return [entities]
+
+    def create(self, using: metabase.Metabase):
+        parent_id = None
+        if self.parent_path is not None:
+            parent = self.registry.get_collection_by_path(self.parent_path)
+            if parent is None:
+                raise NotFoundError(
+                    f"Collection {self.path} is in collection {self.parent_path} which could not be found in Metabase."
+                )
+            parent_id = parent.id
+
+        collection = resources.Collection.create(
+            using=using,
+            name=self.name,
+            color=self.DEFAULT_COLOR,
+            parent_id=parent_id,
+            description=self.description,
+        )
+        collection.path = self.path
+        if self.archived:
+            collection.archive()
+
+        self.resource = collection
+        # children created in the next batch look up their parent in the registry
+        self.registry.add("collections", collection)
+
+    def update(self):
+        changes = {"archived": self.archived}
+        if self.description is not None:
+            changes["description"] = self.description
+
+        self.resource.update(**changes)
+
+    def delete(self):
+        self.resource.archive()
+
+
+@dataclass
+class CollectionPermission(Entity):
+    """Permissions of a group on a collection: read, write or none."""
+
+    METABASE: ClassVar = resources.CollectionPermission
+    DEPENDENCIES: ClassVar = [Group, Collection]
+    # all changes are sent in a single request, see CollectionPermission.apply_many()
+    BULK: ClassVar = True
+
+    group: str
+    collection: str
+    access: str = "read"
+
+    _resource: resources.CollectionPermission = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.collection = Collection.normalize_path(self.collection)
+
+    @property
+    def key(self) -> str:
+        return f"{self.group}:{self.collection}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.CollectionPermission:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(
+        resource: resources.CollectionPermission,
+    ) -> str:
+        return f"{resource.group}:{resource.collection}"
+
+    @classmethod
+    def from_resource(
+        cls, resource: resources.CollectionPermission
+    ) -> "CollectionPermission":
+        return cls(
+            group=resource.group,
+            collection=resource.collection,
+            access=resource.access,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.CollectionPermission) -> bool:
+        # permissions of administrators can't be changed
+        return resource.group != "Administrators"
+
+    def is_equal(self, resource: resources.CollectionPermission) -> bool:
+        return self.access == resource.access
+
+    def get_ids(self) -> Tuple[str, str]:
+        """Get the ids of the group and collection, as used in the collection graph."""
+        if self.resource is not None:
+            return str(self.resource.group_id), str(self.resource.collection_id)
+
+        group = self.registry.get_group_by_name(self.group)
+        if group is None:
+            raise NotFoundError(f"Group {self.group} could not be found in Metabase.")
+
+        if self.collection == resources.CollectionPermission.ROOT:
+            return str(group.id), "root"
+
+        collection = self.registry.get_collection_by_path(self.collection)
+        if collection is None:
+            raise NotFoundError(
+                f"Collection {self.collection} could not be found in Metabase."
+            )
+
+        return str(group.id), str(collection.id)
+
+    @classmethod
+    def estimate_requests_many(
+        cls, create: List["Entity"], update: List["Entity"], delete: List["Entity"]
+    ) -> int:
+        return 1 if create or update or delete else 0
+
+    @classmethod
+    def apply_many(
+        cls,
+        using: metabase.Metabase,
+        create: List["CollectionPermission"],
+        update: List["CollectionPermission"],
+        delete: List["CollectionPermission"],
+    ):
+        groups = {}
+        for entity in create + update:
+            group_id, collection_id = entity.get_ids()
+            groups.setdefault(group_id, {})[collection_id] = entity.access
+        for entity in delete:
+            group_id, collection_id = entity.get_ids()
+            groups.setdefault(group_id, {})[collection_id] = "none"
+
+        if not groups:
+            return
+
+        existing = next((e.resource for e in update + delete), None)
+        if existing is not None:
+            graph = existing.graph
+        else:
+            graph = resources.CollectionGraph.get(using=using)
+
+        # only the changed cells are sent, the rest of the graph is left untouched
+        graph.update(groups)
+
+    def create(self, using: metabase.Metabase):
+        self.apply_many(using=using, create=[self], update=[], delete=[])
+
+    def update(self):
+        self.apply_many(using=None, create=[], update=[self], delete=[])
+
+    def delete(self):
+        self.apply_many(using=None, create=[], update=[], delete=[self])
+
+
+class Metadata(Entity):
+    """
+    Base class for the metadata of existing objects, i.e. tables and fields, which are
+    discovered by Metabase rather than created or deleted. Only declared attributes are synced.
+    """
+
+    # attributes that can be declared, compared and updated
+    ATTRIBUTES: ClassVar[Tuple[str, ...]] = ()
+
+    @classmethod
+    def can_delete(cls, resource: Resource) -> bool:
+        return False
+
+    @classmethod
+    def can_export(cls, resource: Resource) -> bool:
+        return True
+
+    def get_value(self, attribute: str) -> Any:
+        """Get the value of an attribute, as sent to Metabase."""
+        return getattr(self, attribute)
+
+    @staticmethod
+    def get_resource_value(resource: Resource, attribute: str) -> Any:
+        """Get the value of an attribute of a resource, as declared in the config."""
+        return getattr(resource, attribute, None)
+
+    def get_delta(self, resource: Resource) -> Dict[str, Any]:
+        """Get the declared attributes that differ between the config and a resource."""
+        return {
+            attribute: self.get_value(attribute)
+            for attribute in self.ATTRIBUTES
+            if getattr(self, attribute) is not None
+            and getattr(self, attribute) != self.get_resource_value(resource, attribute)
+        }
+
+    def is_equal(self, resource: Resource) -> bool:
+        return not self.get_delta(resource)
+
+    def create(self, using: metabase.Metabase):
+        raise NotFoundError(
+            f"{type(self).__name__} {self.key} could not be found in Metabase."
+        )
+
+
+@dataclass
+class Table(Metadata):
+    """Metadata of a table, identified by its database, schema and name."""
+
+    METABASE: ClassVar = resources.TableMetadata
+    DEPENDENCIES: ClassVar = [Database]
+    ATTRIBUTES: ClassVar = ("display_name", "description", "visibility_type")
+    # tables with the same changes are updated in a single request, see Table.apply_many()
+    BULK: ClassVar = True
+    # visibility of tables that are neither hidden, technical or cruft, which Metabase represents as null
+    VISIBLE: ClassVar = "normal"
+
+    database: str
+    schema: str
+    name: str
+    display_name: Optional[str] = None
+    description: Optional[str] = None
+    visibility_type: Optional[str] = None
+
+    _resource: resources.TableMetadata = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.database}.{self.schema}.{self.name}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.TableMetadata:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.TableMetadata) -> str:
+        return resource.key
+
+    @classmethod
+    def from_resource(cls, resource: resources.TableMetadata) -> "Table":
+        return cls(
+            database=resource.database,
+            schema=resource.schema,
+            name=resource.name,
+            display_name=resource.display_name,
+            description=resource.description,
+            visibility_type=cls.get_resource_value(resource, "visibility_type"),
+            _resource=resource,
+        )
+
+    def get_value(self, attribute: str) -> Any:
+        value = getattr(self, attribute)
+        if attribute == "visibility_type" and value == self.VISIBLE:
+            return None
+        return value
+
+    @classmethod
+    def get_resource_value(cls, resource: Resource, attribute: str) -> Any:
+        value = getattr(resource, attribute, None)
+        if attribute == "visibility_type" and value is None:
+            return cls.VISIBLE
+        return value
+
+    @classmethod
+    def group_changes(cls, entities: List["Table"]) -> Dict[tuple, List[int]]:
+        """Group the ids of tables by their changes, to update them together."""
+        changes = {}
+        for entity in entities:
+            delta = tuple(sorted(entity.get_delta(entity.resource).items()))
+            changes.setdefault(delta, []).append(entity.resource.id)
+
+        return changes
+
+    @classmethod
+    def estimate_requests_many(
+        cls, create: List["Entity"], update: List["Entity"], delete: List["Entity"]
+    ) -> int:
+        return len(cls.group_changes(update))
+
+    @classmethod
+    def apply_many(
+        cls,
+        using: metabase.Metabase,
+        create: List["Table"],
+        update: List["Table"],
+        delete: List["Table"],
+    ):
+        for entity in create:
+            entity.create(using=using)
+
+        for delta, ids in cls.group_changes(update).items():
+            resources.TableMetadata.update_many(using=using, ids=ids, **dict(delta))
+
+    def update(self):
+        self.apply_many(using=self.resource._using, create=[], update=[self], delete=[])
+
+
+@dataclass
+class Field(Metadata):
+    """Metadata of a field, identified by its database, schema, table and name."""
+
+    METABASE: ClassVar = resources.FieldMetadata
+    DEPENDENCIES: ClassVar = [Database]
+    ATTRIBUTES: ClassVar = (
+        "display_name",
+        "description",
+        "visibility_type",
+        "semantic_type",
+    )
+
+    database: str
+    schema: str
+    table: str
+    name: str
+    display_name: Optional[str] = None
+    description: Optional[str] = None
+    visibility_type: Optional[str] = None
+    semantic_type: Optional[str] = None
+
+    _resource: resources.FieldMetadata = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.database}.{self.schema}.{self.table}.{self.name}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.FieldMetadata:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.FieldMetadata) -> str:
+        return f"{resource.database}.{resource.schema}.{resource.table}.{resource.name}"
+
+    @classmethod
+    def from_resource(cls, resource: resources.FieldMetadata) -> "Field":
+        return cls(
+            database=resource.database,
+            schema=resource.schema,
+            table=resource.table,
+            name=resource.name,
+            display_name=resource.display_name,
+            description=resource.description,
+            visibility_type=resource.visibility_type,
+            semantic_type=resource.semantic_type,
+            _resource=resource,
+        )
+
+    def update(self):
+        # Metabase has no bulk endpoint for fields, only the changed attributes of changed fields are sent
+        self.resource.update(**self.get_delta(self.resource))
+
+
+class TableDefinition(Entity):
+    """
+    Base class for definitions on a table, i.e. segments and metrics, identified by their
+    table and name. Definitions are compared by the hash of their normalized MBQL.
+    """
+
+    DEPENDENCIES: ClassVar = [Table]
+    REVISION_MESSAGE: ClassVar = "Updated by metabase-manager."
+
+    @property
+    def key(self) -> str:
+        return f"{self.table}:{self.name}"
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.TableDefinition) -> str:
+        return f"{resource.table}:{resource.name}"
+
+    @classmethod
+    def from_resource(cls, resource: resources.TableDefinition) -> "TableDefinition":
+        return cls(
+            table=resource.table,
+            name=resource.name,
+            definition=resource.definition,
+            description=resource.description,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.TableDefinition) -> bool:
+        # definitions are archived rather than deleted
+        return not resource.archived
+
+    @property
+    def definition_hash(self) -> str:
+        if self._definition_hash is None:
+            self._definition_hash = self.METABASE.hash_definition(self.definition)
+        return self._definition_hash
+
+    def get_delta(self, resource: resources.TableDefinition) -> Dict[str, Any]:
+        """Get the attributes that differ between the config and a resource."""
+        delta = {}
+        if self.definition_hash != resource.definition_hash:
+            delta["definition"] = self.get_definition(resource.table_id)
+        if self.description is not None and self.description != resource.description:
+            delta["description"] = self.description
+
+        return delta
+
+    def is_equal(self, resource: resources.TableDefinition) -> bool:
+        return not self.get_delta(resource)
+
+    def get_definition(self, table_id: int) -> Dict[str, Any]:
+        return {**self.definition, "source-table": table_id}
+
+    def create(self, using: metabase.Metabase):
+        table = self.registry.get_table_by_key(self.table)
+        if table is None:
+            raise NotFoundError(f"Table {self.table} could not be found in Metabase.")
+
+        resource = self.METABASE.create(
+            using=using,
+            name=self.name,
+            table_id=table.id,
+            definition=self.get_definition(table.id),
+            description=self.description,
+        )
+        resource.table = self.table
+        resource.definition_hash = self.definition_hash
+        self.resource = resource
+
+    def update(self):
+        self.resource.update(
+            revision_message=self.REVISION_MESSAGE, **self.get_delta(self.resource)
+        )
+
+    def delete(self):
+        self.resource.archive()
+
+
+@dataclass
+class Segment(TableDefinition):
+    """A segment, i.e. a named filter on a table."""
+
+    METABASE: ClassVar = resources.Segment
+
+    table: str
+    name: str
+    definition: Dict[str, Any]
+    description: Optional[str] = None
+
+    _resource: resources.Segment = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+    _definition_hash: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Segment:
+        return self._resource
+
+
+@dataclass
+class Metric(TableDefinition):
+    """A metric, i.e. a named aggregation on a table."""
+
+    METABASE: ClassVar = resources.Metric
+
+    table: str
+    name: str
+    definition: Dict[str, Any]
+    description: Optional[str] = None
+
+    _resource: resources.Metric = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+    _definition_hash: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Metric:
+        return self._resource
+
+
+@dataclass
+class Card(Entity):
+    """
+    A card (question), identified by its collection and name, or by its entity id.
+    Cards are compared by a hash of their content, so unchanged cards are never updated.
+    """
+
+    METABASE: ClassVar = resources.Card
+    DEPENDENCIES: ClassVar = [Collection]
+
+    name: str
+    dataset_query: Dict[str, Any]
+    collection: str = resources.CollectionPermission.ROOT
+    display: str = "table"
+    description: Optional[str] = None
+    visualization_settings: Dict[str, Any] = field(default_factory=dict)
+    entity_id: Optional[str] = None
+
+    _resource: resources.Card = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+    _content_hash: Optional[str] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.collection = Collection.normalize_path(self.collection)
+
+    @property
+    def key(self) -> str:
+        return self.entity_id or f"{self.collection}:{self.name}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Card:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Card) -> str:
+        return resource.key
+
+    @staticmethod
+    def get_alternate_keys(resource: resources.Card) -> List[str]:
+        entity_id = getattr(resource, "entity_id", None)
+        return [entity_id] if entity_id else []
+
+    def get_fallback_keys(self) -> List[str]:
+        return [f"{self.collection}:{self.name}"] if self.entity_id else []
+
+    @classmethod
+    def from_resource(cls, resource: resources.Card) -> "Card":
+        return cls(
+            name=resource.name,
+            dataset_query=resource.dataset_query,
+            collection=resource.collection_path or resources.CollectionPermission.ROOT,
+            display=resource.display,
+            description=resource.description,
+            visualization_settings=resource.visualization_settings,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.Card) -> bool:
+        # cards in personal collections are never archived
+        return resource.collection_path is not None
+
+    @property
+    def content_hash(self) -> str:
+        if self._content_hash is None:
+            self._content_hash = resources.Card.hash_content(
+                name=self.name,
+                collection=self.collection,
+                description=self.description,
+                display=self.display,
+                dataset_query=self.dataset_query,
+                visualization_settings=self.visualization_settings,
+            )
+        return self._content_hash
+
+    def is_equal(self, resource: resources.Card) -> bool:
+        return self.content_hash == resource.content_hash
+
+    def create(self, using: metabase.Metabase):
+        card = resources.Card.create(
+            using=using,
+            name=self.name,
+            dataset_query=self.dataset_query,
+            visualization_settings=self.visualization_settings,
+            display=self.display,
+            description=self.description,
+            collection_id=Collection.get_id(self.registry, self.collection),
+            # only kept by versions of Metabase that support serialization
+            **({"entity_id": self.entity_id} if self.entity_id else {}),
+        )
+        card.collection_path = self.collection
+        card.content_hash = self.content_hash
+
+        self._resource = card
+        # dashboards created in the same sync look up their cards in the registry
+        self.registry.add("cards", card)
+
+    def update(self):
+        self.resource.update(
+            name=self.name,
+            dataset_query=self.dataset_query,
+            visualization_settings=self.visualization_settings,
+            display=self.display,
+            description=self.description,
+            collection_id=Collection.get_id(self.registry, self.collection),
+        )
+
+    def delete(self):
+        self.resource.archive()
+
+
+@dataclass
+class Dashboard(Entity):
+    """
+    A dashboard, identified by its collection and name, or by its entity id. Its cards
+    refer to cards by key, and are replaced all at once when any of them changes.
+    """
+
+    METABASE: ClassVar = resources.Dashboard
+    DEPENDENCIES: ClassVar = [Collection, Card]
+    # the dashboard is created, then its cards are added in a single request
+    REQUESTS: ClassVar = {"create": 2, "update": 2, "delete": 1}
+
+    name: str
+    collection: str = resources.CollectionPermission.ROOT
+    description: Optional[str] = None
+    parameters: List[Dict[str, Any]] = field(default_factory=list)
+    # {card: <key of a card>, row, col, size_x, size_y, parameter_mappings, visualization_settings}
+    cards: List[Dict[str, Any]] = field(default_factory=list)
+    entity_id: Optional[str] = None
+
+    _resource: resources.Dashboard = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.collection = Collection.normalize_path(self.collection)
+
+    @property
+    def key(self) -> str:
+        return self.entity_id or f"{self.collection}:{self.name}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Dashboard:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Dashboard) -> str:
+        return resource.key
+
+    @staticmethod
+    def get_alternate_keys(resource: resources.Dashboard) -> List[str]:
+        entity_id = getattr(resource, "entity_id", None)
+        return [entity_id] if entity_id else []
+
+    def get_fallback_keys(self) -> List[str]:
+        return [f"{self.collection}:{self.name}"] if self.entity_id else []
+
+    @classmethod
+    def from_resource(cls, resource: resources.Dashboard) -> "Dashboard":
+        return cls(
+            name=resource.name,
+            collection=resource.collection_path or resources.CollectionPermission.ROOT,
+            description=resource.description,
+            parameters=resource.parameters,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.Dashboard) -> bool:
+        # dashboards in personal collections are never archived
+        return resource.collection_path is not None
+
+    @classmethod
+    def export(cls, resource: resources.Dashboard, registry: MetabaseRegistry) -> dict:
+        dashboard = cls.from_resource(resource)
+        index = registry.get_index("cards", "id")
+
+        for dashcard in resource.dashcards:
+            card = index.get(dashcard.get("card_id"))
+            if card is None or not Card.can_export(card):
+                # text cards, and cards that aren't declared (i.e. in personal collections)
+                continue
+
+            config = {"card": card.key}
+            for attribute in ("row", "col", "size_x", "size_y"):
+                config[attribute] = dashcard.get(attribute, 0)
+            for attribute in ("parameter_mappings", "visualization_settings"):
+                if dashcard.get(attribute):
+                    config[attribute] = dashcard[attribute]
+            dashboard.cards.append(config)
+
+        return dashboard.dump()
+
+    @property
+    def content_hash(self) -> str:
+        return resources.Dashboard.hash_content(
+            name=self.name,
+            collection=self.collection,
+            description=self.description,
+            parameters=self.parameters,
+        )
+
+    def get_dashcards(self) -> List[Dict[str, Any]]:
+        """Get the cards of the dashboard as sent to Metabase, with card ids."""
+        index = self.registry.get_index("cards", "key")
+        entity_ids = self.registry.get_index("cards", "entity_id")
+
+        dashcards = []
+        for card in self.cards:
+            resource = index.get(card["card"]) or entity_ids.get(card["card"])
+
+            dashcards.append(
+                {
+                    # placeholder for cards created by the same sync, see validate_cards()
+                    "card_id": resource.id if resource is not None else -1,
+                    "row": card.get("row", 0),
+                    "col": card.get("col", 0),
+                    "size_x": card.get("size_x", 4),
+                    "size_y": card.get("size_y", 4),
+                    "parameter_mappings": card.get("parameter_mappings", []),
+                    "visualization_settings": card.get("visualization_settings", {}),
+                }
+            )
+
+        return dashcards
+
+    def validate_cards(self, dashcards: List[Dict[str, Any]]):
+        """
+        Raise NotFoundError if a card of the dashboard doesn't exist. Only validated on
+        create/update to allow dry-run to succeed, see User.validate_groups().
+        """
+        for card, dashcard in zip(self.cards, dashcards):
+            if dashcard["card_id"] == -1:
+                raise NotFoundError(
+                    f"Card {card['card']} could not be found in Metabase."
+                )
+
+    def get_delta(self, resource: resources.Dashboard) -> Dict[str, bool]:
+        """Get which of the dashboard and its cards differ from the config."""
+        return {
+            "dashboard": self.content_hash != resource.content_hash,
+            "dashcards": resources.Dashboard.hash_dashcards(self.get_dashcards())
+            != resource.dashcards_hash,
+        }
+
+    def is_equal(self, resource: resources.Dashboard) -> bool:
+        return not any(self.get_delta(resource).values())
+
+    def estimate_requests(self, action: str) -> int:
+        if action == "update":
+            return sum(self.get_delta(self.resource).values())
+        return super().estimate_requests(action)
+
+    def create(self, using: metabase.Metabase):
+        dashboard = resources.Dashboard.create(
+            using=using,
+            name=self.name,
+            description=self.description,
+            collection_id=Collection.get_id(self.registry, self.collection),
+            parameters=self.parameters,
+            # only kept by versions of Metabase that support serialization
+            **({"entity_id": self.entity_id} if self.entity_id else {}),
+        )
+        dashboard.collection_path = self.collection
+        dashboard.dashcards = []
+        self._resource = dashboard
+
+        if self.cards:
+            dashcards = self.get_dashcards()
+            self.validate_cards(dashcards)
+            dashboard.update_dashcards(dashcards)
+
+    def update(self):
+        delta = self.get_delta(self.resource)
+
+        if delta["dashboard"]:
+            self.resource.update(
+                name=self.name,
+                description=self.description,
+                collection_id=Collection.get_id(self.registry, self.collection),
+                parameters=self.parameters,
+            )
+        if delta["dashcards"]:
+            dashcards = self.get_dashcards()
+            self.validate_cards(dashcards)
+            # every card of the dashboard is sent in a single request
+            self.resource.update_dashcards(dashcards)
+
+    def delete(self):
+        self.resource.archive()
+
+
+@dataclass
+class Sandbox(Entity):
+    """
+    A sandbox restricting the rows of a table a group can see based on user attributes
+    (see User.login_attributes), identified by its group and table (i.e. Warehouse.public.orders).
+    """
+
+    METABASE: ClassVar = resources.Sandbox
+    DEPENDENCIES: ClassVar = [Group, Table, Card]
+
+    group: str
+    table: str
+    # key of a saved question filtering the table (i.e. /Finance:Orders by region), if any
+    card: Optional[str] = None
+    # user attribute -> name of a field of the table, or a target of the card
+    # (i.e. ["dimension", ["template-tag", "region"]])
+    attribute_remappings: Dict[str, Any] = field(default_factory=dict)
+
+    _resource: resources.Sandbox = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.group}:{self.table}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Sandbox:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Sandbox) -> str:
+        return resource.key
+
+    @classmethod
+    def from_resource(cls, resource: resources.Sandbox) -> "Sandbox":
+        return cls(
+            group=resource.group,
+            table=resource.table,
+            attribute_remappings=resource.attribute_remappings,
+            _resource=resource,
+        )
+
+    @classmethod
+    def export(cls, resource: resources.Sandbox, registry: MetabaseRegistry) -> dict:
+        sandbox = cls.from_resource(resource)
+        if resource.card_id is not None:
+            card = registry.get_index("cards", "id").get(resource.card_id)
+            sandbox.card = card.key if card is not None else None
+        return sandbox.dump()
+
+    def get_table(self) -> resources.TableMetadata:
+        table = self.registry.get_table_by_key(self.table)
+        if table is None:
+            raise NotFoundError(f"Table {self.table} could not be found in Metabase.")
+        return table
+
+    def get_card_id(self) -> Optional[int]:
+        if self.card is None:
+            return None
+
+        card = self.registry.get_index("cards", "key").get(self.card)
+        # placeholder for cards created by the same sync, see validate()
+        return card.id if card is not None else -1
+
+    def get_attribute_remappings(self) -> Dict[str, Any]:
+        """Get the attribute remappings as sent to Metabase, with field ids rather than names."""
+        fields = None
+        remappings = {}
+        for attribute, target in self.attribute_remappings.items():
+            if isinstance(target, str):
+                if fields is None:
+                    table = self.registry.get_table_by_key(self.table)
+                    fields = {f.name: f.id for f in table.fields} if table else {}
+                # placeholder for fields that can't be found, see validate()
+                target = ["dimension", ["field", fields.get(target, -1), None]]
+            remappings[attribute] = target
+
+        return remappings
+
+    def validate(self):
+        """
+        Raise NotFoundError if the table, card or fields of the sandbox can't be found.
+        Only validated on create/update to allow dry-run to succeed, see User.validate_groups().
+        """
+        fields = {f.name for f in self.get_table().fields}
+        for target in self.attribute_remappings.values():
+            if isinstance(target, str) and target not in fields:
+                raise NotFoundError(
+                    f"Field {target} could not be found in table {self.table}."
+                )
+
+        if self.get_card_id() == -1:
+            raise NotFoundError(f"Card {self.card} could not be found in Metabase.")
+
+    def is_equal(self, resource: resources.Sandbox) -> bool:
+        return self.get_card_id() == resource.card_id and normalize(
+            self.get_attribute_remappings()
+        ) == normalize(resource.attribute_remappings)
+
+    def create(self, using: metabase.Metabase):
+        group = self.registry.get_group_by_name(self.group)
+        if group is None:
+            raise NotFoundError(f"Group {self.group} could not be found in Metabase.")
+        self.validate()
+
+        sandbox = resources.Sandbox.create(
+            using=using,
+            group_id=group.id,
+            table_id=self.get_table().id,
+            card_id=self.get_card_id(),
+            attribute_remappings=self.get_attribute_remappings(),
+        )
+        sandbox.group, sandbox.table = self.group, self.table
+        self._resource = sandbox
+
+    def update(self):
+        self.validate()
+        self.resource.update(
+            card_id=self.get_card_id(),
+            attribute_remappings=self.get_attribute_remappings(),
+        )
+
+    def delete(self):
+        self.resource.delete()
+
+
+@dataclass
+class Subscription(Entity):
+    """
+    A dashboard subscription sent by email, identified by its dashboard and name. Recipients are
+    declared as emails and as groups, whose members are read from Metabase, and are compared
+    with the recipients of the subscription as a set.
+    """
+
+    METABASE: ClassVar = resources.Subscription
+    DEPENDENCIES: ClassVar = [User, Dashboard]
+
+    name: str
+    dashboard: str
+    # i.e. {"schedule_type": "weekly", "schedule_day": "mon", "schedule_hour": 8}
+    schedule: Dict[str, Any] = field(
+        default_factory=lambda: {"schedule_type": "daily", "schedule_hour": 8}
+    )
+    recipients: List[str] = field(default_factory=list)
+    # every member of these groups receives the subscription
+    groups: List[str] = field(default_factory=list)
+
+    _resource: resources.Subscription = field(default=None, repr=False)
+    registry: MetabaseRegistry = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return f"{self.dashboard}:{self.name}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Subscription:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Subscription) -> str:
+        return resource.key
+
+    @classmethod
+    def from_resource(cls, resource: resources.Subscription) -> "Subscription":
+        return cls(
+            name=resource.name,
+            dashboard=resource.dashboard,
+            schedule={k: v for k, v in resource.schedule.items() if v is not None},
+            recipients=sorted(resource.recipients),
+            _resource=resource,
+        )
+
+    def get_schedule(self) -> Dict[str, Any]:
+        """
+        Get the schedule as read from Metabase, with every attribute. Schedules that aren't
+        hourly are sent at 8am unless an hour is declared, as Metabase always stores one.
+        """
+        schedule = {
+            k: self.schedule.get(k) for k in resources.Subscription.SCHEDULE_ATTRIBUTES
+        }
+        if schedule["schedule_type"] != "hourly" and schedule["schedule_hour"] is None:
+            schedule["schedule_hour"] = 8
+        return schedule
+
+    def get_recipients(self) -> Set[str]:
+        """
+        Get the emails of every recipient, including the members of groups. Groups that
+        don't exist yet (i.e. created by the same sync) have no members.
+        """
+        recipients = {email.lower() for email in self.recipients}
+
+        members = self.registry.get_members()
+        for name in self.groups:
+            group = self.registry.get_group_by_name(name)
+            if group is not None:
+                recipients.update(email.lower() for email in members.get(group.id, ()))
+
+        return recipients
+
+    def validate_groups(self):
+        """
+        Raise NotFoundError if a group of recipients doesn't exist. Only validated on
+        create/update to allow dry-run to succeed, see User.validate_groups().
+        """
+        for name in self.groups:
+            if self.registry.get_group_by_name(name) is None:
+                raise NotFoundError(f"Group {name} could not be found in Metabase.")
+
+    def get_channel(self) -> Dict[str, Any]:
+        """Get the email channel of the subscription, as sent to Metabase."""
+        # recipients are compared in lowercase, whatever the case of emails in Metabase
+        users = {
+            email.lower(): user
+            for email, user in self.registry.get_index("users", "email").items()
+        }
+
+        channel = {
+            "channel_type": "email",
+            "enabled": True,
+            # users of Metabase are referred to by id, others by email
+            "recipients": [
+                {"id": users[email].id} if email in users else {"email": email}
+                for email in sorted(self.get_recipients())
+            ],
+            **self.get_schedule(),
+        }
+        if self.resource is not None and self.resource.channel is not None:
+            channel["id"] = self.resource.channel["id"]
+
+        return channel
+
+    def is_equal(self, resource: resources.Subscription) -> bool:
+        return (
+            self.get_schedule() == resource.schedule
+            and self.get_recipients() == resource.recipients
+        )
+
+    def create(self, using: metabase.Metabase):
+        self.validate_groups()
+        dashboard = self.registry.get_index("dashboards", "key").get(self.dashboard)
+        if dashboard is None:
+            raise NotFoundError(
+                f"Dashboard {self.dashboard} could not be found in Metabase."
+            )
+
+        subscription = resources.Subscription.create(
+            using=using,
+            name=self.name,
+            dashboard_id=dashboard.id,
+            collection_id=dashboard.collection_id,
+            cards=[
+                {
+                    "id": dashcard["card_id"],
+                    "dashboard_card_id": dashcard["id"],
+                    "include_csv": False,
+                    "include_xls": False,
+                }
+                for dashcard in dashboard.dashcards
+                if dashcard.get("card_id") is not None
+            ],
+            channels=[self.get_channel()],
+        )
+        subscription.dashboard = self.dashboard
+        self._resource = subscription
+
+    def update(self):
+        self.validate_groups()
+        # only the email channel is sent, the cards of the subscription are left untouched
+        channels = [
+            c for c in self.resource.channels if c.get("channel_type") != "email"
+        ]
+        self.resource.update(channels=channels + [self.get_channel()])
+
+    def delete(self):
+        self.resource.archive()
+
+
+@dataclass
+class Snippet(Entity):
+    """
+    A snippet of native query, identified by its name. Its content is declared inline,
+    or read from a file (i.e. snippets/region.sql), and compared by hash once normalized.
+    """
+
+    METABASE: ClassVar = resources.Snippet
+    # contents of files, shared across syncs so that unchanged files are read once
+    FILES: ClassVar[FileCache] = FileCache()
+
+    name: str
+    content: Optional[str] = field(default=None, repr=False)
+    # path of a file with the content, relative to the working directory
+    file: Optional[str] = None
+    description: Optional[str] = None
+
+    _resource: resources.Snippet = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if (self.content is None) == (self.file is None):
+            raise InvalidConfigError(
+                f"Snippet {self.name} must declare exactly one of content or file."
+            )
+
+    @property
+    def key(self) -> str:
+        return self.name
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Snippet:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Snippet) -> str:
+        return resource.name
+
+    @classmethod
+    def from_resource(cls, resource: resources.Snippet) -> "Snippet":
+        return cls(
+            name=resource.name,
+            content=resource.content,
+            description=resource.description,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.Snippet) -> bool:
+        # snippets are archived rather than deleted
+        return not resource.archived
+
+    def get_content(self) -> str:
+        if self.file is not None:
+            return self.FILES.read(self.file)
+        return self.content
+
+    @property
+    def content_hash(self) -> str:
+        if self.file is not None:
+            return self.FILES.hash(self.file)
+        return hash_sql(self.content)
+
+    def get_description(self) -> Dict[str, str]:
+        """Only send the description when declared, leaving the one in Metabase otherwise."""
+        return {"description": self.description} if self.description is not None else {}
+
+    def is_equal(self, resource: resources.Snippet) -> bool:
+        return (
+            not resource.archived
+            and (self.description is None or self.description == resource.description)
+            and self.content_hash == resource.content_hash
+        )
+
+    def create(self, using: metabase.Metabase):
+        self._resource = resources.Snippet.create(
+            using=using,
+            name=self.name,
+            content=self.get_content(),
+            **self.get_description(),
+        )
+        self._resource.content_hash = self.content_hash
+
+    def update(self):
+        self.resource.update(
+            content=self.get_content(), archived=False, **self.get_description()
+        )
+        self.resource.content_hash = self.content_hash
+
+    def delete(self):
+        self.resource.archive()
+
+
+@dataclass
+class Setting(Entity):
+    """
+    A site setting (i.e. site-name), identified by its key. Settings that aren't declared
+    are left untouched, and changed settings are updated all at once.
+    """
+
+    METABASE: ClassVar = resources.Setting
+    BULK: ClassVar = True
+
+    name: str
+    # not shown in logs, as some settings are secrets
+    value: Any = field(default=None, repr=False)
+
+    _resource: resources.Setting = field(default=None, repr=False)
+
+    @property
+    def key(self) -> str:
+        return self.name
+
+    @Entity.resource.getter
+    def resource(self) -> resources.Setting:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.Setting) -> str:
+        return resource.key
+
+    @classmethod
+    def from_resource(cls, resource: resources.Setting) -> "Setting":
+        return cls(name=resource.key, value=resource.value, _resource=resource)
+
+    @classmethod
+    def can_delete(cls, resource: resources.Setting) -> bool:
+        # settings that aren't declared keep their current value
+        return False
+
+    @classmethod
+    def can_export(cls, resource: resources.Setting) -> bool:
+        # only settings that were changed from their default
+        return (
+            resource.value is not None
+            and not resource.is_redacted
+            and not resource.is_env_setting
+        )
+
+    def is_equal(self, resource: resources.Setting) -> bool:
+        if resource.is_redacted or resource.is_env_setting:
+            # secrets can't be compared, and settings set by environment variables can't be changed
+            return True
+
+        return self.value == resource.value or (
+            resource.value is None and self.value == resource.default
+        )
+
+    @classmethod
+    def estimate_requests_many(
+        cls, create: List["Entity"], update: List["Entity"], delete: List["Entity"]
+    ) -> int:
+        return 1 if update else 0
+
+    @classmethod
+    def apply_many(
+        cls,
+        using: metabase.Metabase,
+        create: List["Setting"],
+        update: List["Setting"],
+        delete: List["Setting"],
+    ):
+        for entity in create:
+            raise NotFoundError(
+                f"Setting {entity.name} could not be found in Metabase."
+            )
+
+        if update:
+            resources.Setting.update_many(
+                using=using, values={entity.name: entity.value for entity in update}
+            )
+
+    def create(self, using: metabase.Metabase):
+        self.apply_many(using=using, create=[self], update=[], delete=[])
+
+    def update(self):
+        self.apply_many(using=self.resource._using, create=[], update=[self], delete=[])
+
+    def delete(self):
+        pass
+
+
+@dataclass
+class CachePolicy(Entity):
+    """
+    Query caching policy of the whole instance (model: root), or the cache TTL of
+    a database, dashboard or card identified by its name (i.e. /Finance:Revenue).
+    Only declared attributes of the root policy are synced.
+    """
+
+    METABASE: ClassVar = resources.CachePolicy
+    DEPENDENCIES: ClassVar = [Database, Card, Dashboard]
+    # cache TTLs are only removed with --select caching, see can_delete()
+    EXPLICIT_DELETE: ClassVar = True
+    MODELS: ClassVar = ("root", "database", "dashboard", "card")
+    # attributes of the root policy
+    ATTRIBUTES: ClassVar = tuple(resources.CachePolicy.ROOT_SETTINGS)
+
+    model: str
+    name: Optional[str] = None
+    # hours, for databases, dashboards and cards
+    ttl: Optional[int] = None
+    enabled: Optional[bool] = None
+    # cached results are kept for this many times the average duration of the query
+    ttl_ratio: Optional[int] = None
+    # seconds a query must take for its results to be cached
+    min_duration: Optional[int] = None
+    max_kb: Optional[int] = None
+    # seconds
+    max_ttl: Optional[int] = None
+
+    _resource: resources.CachePolicy = field(default=None, repr=False)
+
+    def __post_init__(self):
+        if self.model not in self.MODELS:
+            raise InvalidConfigError(
+                f"Unexpected cache policy model: {self.model}, expected one of {', '.join(self.MODELS)}."
+            )
+
+    @property
+    def key(self) -> str:
+        return self.model if self.model == "root" else f"{self.model}:{self.name}"
+
+    @Entity.resource.getter
+    def resource(self) -> resources.CachePolicy:
+        return self._resource
+
+    @staticmethod
+    def get_key_from_metabase_instance(resource: resources.CachePolicy) -> str:
+        return resource.key
+
+    @classmethod
+    def from_resource(cls, resource: resources.CachePolicy) -> "CachePolicy":
+        if resource.model == "root":
+            return cls(
+                model="root",
+                _resource=resource,
+                **{a: getattr(resource, a, None) for a in cls.ATTRIBUTES},
+            )
+        return cls(
+            model=resource.model,
+            name=resource.name,
+            ttl=resource.ttl,
+            _resource=resource,
+        )
+
+    @classmethod
+    def can_delete(cls, resource: resources.CachePolicy) -> bool:
+        # the cache TTL of objects that aren't declared is removed
+        return resource.model != "root" and resource.ttl is not None
+
+    @classmethod
+    def can_export(cls, resource: resources.CachePolicy) -> bool:
+        return resource.model == "root" or resource.ttl is not None
+
+    def get_delta(self, resource: resources.CachePolicy) -> Dict[str, Any]:
+        """Get the attributes that differ between the config and a resource."""
+        if self.model != "root":
+            return {"ttl": self.ttl} if self.ttl != resource.ttl else {}
+
+        return {
+            attribute: getattr(self, attribute)
+            for attribute in self.ATTRIBUTES
+            if getattr(self, attribute) is not None
+            and getattr(self, attribute) != getattr(resource, attribute, None)
+        }
+
+    def is_equal(self, resource: resources.CachePolicy) -> bool:
+        return not self.get_delta(resource)
+
+    def create(self, using: metabase.Metabase):
+        raise NotFoundError(
+            f"{self.model.capitalize()} {self.name} could not be found in Metabase."
+        )
+
+    def update(self):
+        self.resource.update(**self.get_delta(self.resource))
+
+    def delete(self):
+        self.resource.update(ttl=None)
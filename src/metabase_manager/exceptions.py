@@ -1,3 +1,7 @@
+class BudgetExceededError(Exception):
+    pass
+
+
 class DuplicateKeyError(Exception):
     pass
 
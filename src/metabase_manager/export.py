@@ -0,0 +1,124 @@
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Type
+
+import metabase
+import yaml
+from metabase.resource import Resource
+
+from metabase_manager.entities import Entity
+from metabase_manager.registry import MetabaseRegistry
+
+
+@dataclass
+class Exporter:
+    """
+    Write the objects found in Metabase as a config, one object at a time. Users are
+    read page by page and never held in memory all at once.
+    """
+
+    registry: MetabaseRegistry
+    # Entity types to export by key, in the order they are written
+    entities: Dict[str, Type[Entity]] = field(default_factory=dict)
+    # number of users read from Metabase per request
+    page_size: int = 1000
+
+    # keys whose instances are looked up while exporting another key
+    _LOOKUPS = {"users": "groups", "dashboards": "cards", "sandboxes": "cards"}
+
+    def iter_users(self) -> Iterator[metabase.User]:
+        """Iterate over every active user, one page at a time."""
+        offset = 0
+        while True:
+            page = metabase.User.list(
+                using=self.registry.client, limit=self.page_size, offset=offset
+            )
+            yield from page
+
+            # versions of Metabase that don't paginate return every user at once
+            if len(page) != self.page_size:
+                return
+            offset += self.page_size
+
+    def iter_resources(self, key: str) -> Iterator[Resource]:
+        if key == "users":
+            yield from self.iter_users()
+            return
+
+        self.registry.cache(select=[key])
+        yield from getattr(self.registry, key)
+
+        if key not in self._LOOKUPS.values():
+            # release the instances once written, unless other keys look them up
+            setattr(self.registry, key, [])
+
+    def iter_objects(self, key: str) -> Iterator[dict]:
+        """Iterate over the config definitions of the objects of a key."""
+        entity = self.entities[key]
+
+        if key in self._LOOKUPS and not getattr(self.registry, self._LOOKUPS[key]):
+            self.registry.cache(select=[self._LOOKUPS[key]])
+
+        for resource in self.iter_resources(key):
+            if entity.can_export(resource):
+                yield entity.export(resource, registry=self.registry)
+
+    @staticmethod
+    def write(stream: TextIO, key: str, objects: Iterable[dict]) -> int:
+        """Write the objects of a key to a YAML stream, returning the number written."""
+        count = 0
+        for obj in objects:
+            if count == 0:
+                stream.write(f"{key}:\n")
+            stream.write(
+                yaml.safe_dump([obj], sort_keys=False, allow_unicode=True, indent=2)
+            )
+            count += 1
+
+        if count == 0:
+            stream.write(f"{key}: []\n")
+
+        return count
+
+    def export(self, stream: TextIO) -> Dict[str, int]:
+        """Write every key to a single stream, returning the number of objects per key."""
+        return {
+            key: self.write(stream, key, self.iter_objects(key))
+            for key in self.entities
+        }
+
+    def export_files(
+        self, directory: Path, max_objects: Optional[int] = None
+    ) -> Dict[Path, int]:
+        """
+        Write each key to its own file in a directory (i.e. users.yml), or to several
+        numbered files of at most `max_objects` objects each (i.e. users-0001.yml).
+        Returns the number of objects written per file.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+
+        written = {}
+        for key in self.entities:
+            objects = self.iter_objects(key)
+            if max_objects is None:
+                path = directory / f"{key}.yml"
+                with open(path, "w") as f:
+                    written[path] = self.write(f, key, objects)
+                continue
+
+            for i, chunk in enumerate(self.chunks(objects, max_objects), start=1):
+                path = directory / f"{key}-{i:04d}.yml"
+                with open(path, "w") as f:
+                    written[path] = self.write(f, key, chunk)
+
+        return written
+
+    @staticmethod
+    def chunks(objects: Iterator[dict], size: int) -> Iterator[List[dict]]:
+        """Split objects into lists of at most `size` objects, with at least one list."""
+        chunk = list(islice(objects, size))
+        yield chunk
+
+        while chunk := list(islice(objects, size)):
+            yield chunk
@@ -0,0 +1,42 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Dict, Tuple, Union
+
+from metabase_manager.mbql import hash_sql
+
+
+@dataclass
+class FileCache:
+    """
+    Contents of files referenced by the config, along with their hash. A file is only
+    read again once its modification time or size changes.
+    """
+
+    # (modification time, size) of every file, along with its content and hash
+    _entries: Dict[Path, Tuple[Tuple[int, int], str, str]] = field(
+        default_factory=dict, repr=False
+    )
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def get(self, path: Union[str, Path]) -> Tuple[str, str]:
+        """Get the content of a file and its hash."""
+        path = Path(path).resolve()
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == version:
+                return entry[1], entry[2]
+
+        content = path.read_text()
+        with self._lock:
+            self._entries[path] = (version, content, hash_sql(content))
+            return content, self._entries[path][2]
+
+    def read(self, path: Union[str, Path]) -> str:
+        return self.get(path)[0]
+
+    def hash(self, path: Union[str, Path]) -> str:
+        return self.get(path)[1]
@@ -0,0 +1,76 @@
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Optional, Set, Tuple
+
+from metabase_manager.shard import Shard
+
+
+@dataclass
+class Journal:
+    """
+    Append-only log of the actions applied to Metabase during a sync.
+    Every line is a JSON object, written as soon as an action completes so that
+    an interrupted sync can be resumed without re-applying these actions.
+    """
+
+    DEFAULT_PATH = ".metabase-manager.journal"
+
+    path: str
+
+    _entries: Set[Tuple[str, str, str]] = field(default_factory=set, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @classmethod
+    def get_default_path(cls, shard: Optional[Shard] = None) -> str:
+        """
+        Get the path of the journal, distinct for every shard so that shards syncing at the
+        same time don't resume or clear each other's actions.
+        """
+        if shard is None:
+            return cls.DEFAULT_PATH
+        return f".metabase-manager.{shard.index}-of-{shard.count}.journal"
+
+    def load(self):
+        """Load the actions recorded by a previous sync."""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be incomplete if the process was killed
+                    continue
+                self._entries.add((entry["type"], entry["key"], entry["action"]))
+
+    def clear(self):
+        """Start a new journal, discarding the actions of a previous sync."""
+        with self._lock:
+            self._entries.clear()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def record(
+        self, object_type: str, key: str, action: str, resource_id: Optional[int]
+    ):
+        """Append a completed action to the journal."""
+        entry = {
+            "type": object_type,
+            "key": key,
+            "action": action,
+            "resource_id": resource_id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._entries.add((object_type, key, action))
+
+    def contains(self, object_type: str, key: str, action: str) -> bool:
+        """Whether an action was already completed."""
+        return (object_type, key, action) in self._entries
@@ -1,13 +1,46 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import InitVar, dataclass, field
-from typing import Dict, List, Type
+from queue import Queue
+from threading import Thread
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
 
-from metabase import Metabase
 from metabase.resource import Resource
 
-from metabase_manager.entities import Entity, Group, User
-from metabase_manager.exceptions import DuplicateKeyError
+from metabase_manager.client import MetabaseClient
+from metabase_manager.columnar import UserColumns, UserDiff
+from metabase_manager.entities import (
+    CachePolicy,
+    Card,
+    Collection,
+    CollectionPermission,
+    Dashboard,
+    Database,
+    Entity,
+    Field,
+    Group,
+    Metric,
+    Permission,
+    Sandbox,
+    Segment,
+    Setting,
+    Snippet,
+    Subscription,
+    Table,
+    User,
+)
+from metabase_manager.exceptions import (
+    BudgetExceededError,
+    DuplicateKeyError,
+    NotFoundError,
+)
+from metabase_manager.journal import Journal
 from metabase_manager.parser import MetabaseParser
+from metabase_manager.plan import Plan
 from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.report import Event, Reporter, SyncResult
+from metabase_manager.shard import Shard
+from metabase_manager.throttle import AdaptiveLimiter
 
 
 @dataclass
@@ -18,56 +51,330 @@ class MetabaseManager:
 
     select: List[str] = field(default_factory=list)
     exclude: List[str] = field(default_factory=list)
+    shard: Shard = None
+    # seconds other shards wait for the objects synced by the leader shard, see wait_for_leader()
+    shard_timeout: float = 300.0
+    max_concurrency: int = 8
+    max_rps: float = None
+    # plan users with columns and bitsets rather than comparing them one by one
+    columnar: bool = False
+    # whether a failed action stops the sync, otherwise it is reported and skipped
+    stop_on_error: bool = True
+    # whether databases that aren't declared are deleted, along with every question using them
+    delete_databases: bool = False
 
-    client: Metabase = None
+    client: MetabaseClient = None
     registry: MetabaseRegistry = None
     config: MetabaseParser = None
+    journal: Journal = None
+    reporter: Reporter = None
 
-    # objects are managed in the same order as the dictionary keys
+    # events of the sync in progress, streamed by iter_sync()
+    _events: Optional[Queue] = field(default=None, init=False, repr=False)
+    # keys whose objects were changed in Metabase since they were last listed
+    _stale: Set[str] = field(default_factory=set, init=False, repr=False)
+    # keys listed by the sync in progress, and not changed since
+    _fresh: Set[str] = field(default_factory=set, init=False, repr=False)
+
+    # objects are managed in the order of their dependencies (Entity.DEPENDENCIES),
+    # ties are broken using the order of the dictionary keys
     _entities = {
         "groups": Group,
         "users": User,
+        "databases": Database,
+        "permissions": Permission,
+        "collections": Collection,
+        "collection_permissions": CollectionPermission,
+        "tables": Table,
+        "fields": Field,
+        "segments": Segment,
+        "metrics": Metric,
+        "cards": Card,
+        "dashboards": Dashboard,
+        "settings": Setting,
+        "caching": CachePolicy,
+        "sandboxes": Sandbox,
+        "subscriptions": Subscription,
+        "snippets": Snippet,
     }
 
     def __post_init__(self, metabase_host, metabase_user, metabase_password):
-        self.client = Metabase(
-            host=metabase_host, user=metabase_user, password=metabase_password
+        self.client = MetabaseClient(
+            host=metabase_host,
+            user=metabase_user,
+            password=metabase_password,
+            limiter=AdaptiveLimiter(ceiling=self.max_concurrency, max_rps=self.max_rps),
         )
 
     @classmethod
     def get_allowed_keys(cls) -> List[str]:
         return list(cls._entities.keys())
 
-    def get_entities_to_manage(self) -> List[Type[Entity]]:
-        select = self.select or self.get_allowed_keys()
+    @classmethod
+    def get_key(cls, obj: Type[Entity]) -> str:
+        """Get the key under which an Entity is managed (i.e. User -> users)."""
+        for key, entity in cls._entities.items():
+            if entity == obj:
+                return key
+
+        raise KeyError(f"{obj.__name__} is not a managed Entity.")
+
+    @classmethod
+    def get_entity(cls, key: str) -> Type[Entity]:
+        """Get the Entity managed under a key (i.e. users -> User)."""
+        return cls._entities[key]
+
+    @classmethod
+    def get_dependencies(cls, key: str, recursive: bool = False) -> List[str]:
+        """Get the keys of the objects that must be synced before a given key."""
+        dependencies = [cls.get_key(dep) for dep in cls._entities[key].DEPENDENCIES]
+
+        if recursive:
+            for dependency in list(dependencies):
+                for parent in cls.get_dependencies(dependency, recursive=True):
+                    if parent not in dependencies:
+                        dependencies.append(parent)
+
+        return dependencies
+
+    @classmethod
+    def get_dependents(cls, key: str, recursive: bool = False) -> List[str]:
+        """Get the keys of the objects that must be synced after a given key."""
         return [
-            self._entities[key]
-            for key in self.get_allowed_keys()
-            if key in set(select).difference(self.exclude)
+            other
+            for other in cls.get_allowed_keys()
+            if key in cls.get_dependencies(other, recursive=recursive)
         ]
 
+    @classmethod
+    def get_sorted_keys(cls) -> List[str]:
+        """Get all keys sorted such that every key comes after its dependencies."""
+        remaining = cls.get_allowed_keys()
+        ordered = []
+
+        while remaining:
+            ready = [
+                key
+                for key in remaining
+                if set(cls.get_dependencies(key)).issubset(ordered)
+            ]
+
+            if not ready:
+                raise ValueError(f"Found circular dependencies between: {remaining}")
+
+            ordered.extend(ready)
+            remaining = [key for key in remaining if key not in ready]
+
+        return ordered
+
+    @classmethod
+    def resolve_selector(cls, selector: str) -> Set[str]:
+        """
+        Resolve a --select/--exclude value against the dependency graph.
+        A leading '+' includes every upstream dependency (i.e. +users -> users, groups),
+        and a trailing '+' includes every downstream dependent (i.e. groups+ -> groups, users).
+        """
+        key = selector.strip("+")
+
+        if key not in cls._entities:
+            raise ValueError(f"Unknown object type: {key}")
+
+        keys = {key}
+        if selector.startswith("+"):
+            keys.update(cls.get_dependencies(key, recursive=True))
+        if selector.endswith("+"):
+            keys.update(cls.get_dependents(key, recursive=True))
+
+        return keys
+
+    def get_selected_keys(self) -> List[str]:
+        """
+        Get the keys to manage given `select` and `exclude`, sorted by dependencies.
+        Without `select`, only the keys declared in the config are managed so that objects
+        of other types are never deleted, or every key if no config was parsed (i.e. export).
+        """
+        selectors = self.select
+        if not selectors:
+            selectors = (
+                self.get_allowed_keys()
+                if self.config is None
+                else self.config.get_declared_keys()
+            )
+
+        select, exclude = set(), set()
+        for selector in selectors:
+            select.update(self.resolve_selector(selector))
+        for selector in self.exclude:
+            exclude.update(self.resolve_selector(selector))
+
+        if self.shard and not self.shard.is_leader:
+            # objects that can't be partitioned are only synced by the leader shard
+            select = {key for key in select if self._entities[key].SHARDED}
+
+        return [key for key in self.get_sorted_keys() if key in select - exclude]
+
+    def get_explicit_keys(self) -> Set[str]:
+        """Get the keys selected with `select`, rather than declared in the config."""
+        keys = set()
+        for selector in self.select:
+            keys.update(self.resolve_selector(selector))
+        return keys
+
+    def in_shard(self, obj: Type[Entity], key: str) -> bool:
+        """Whether the object with a given key is synced by this process."""
+        if self.shard is None or not obj.SHARDED:
+            return True
+        return self.shard.contains(key)
+
+    def wait_for_leader(self, poll: float = 5.0):
+        """
+        Wait until the declared objects that only the leader shard syncs (i.e. groups), and
+        that the objects of this shard depend on, exist in Metabase. The leader may create
+        them in the same run, after other shards started.
+        """
+        keys = []
+        for key in self.get_selected_keys():
+            for dependency in self.get_dependencies(key, recursive=True):
+                if not self._entities[dependency].SHARDED and dependency not in keys:
+                    keys.append(dependency)
+        if not keys:
+            return
+
+        deadline = time.monotonic() + self.shard_timeout
+        while True:
+            self.registry.cache(select=keys)
+            missing = [
+                f"{key} {name}"
+                for key in keys
+                for name in sorted(
+                    self.get_config_objects(self._entities[key]).keys()
+                    - self.get_metabase_objects(self._entities[key]).keys()
+                )
+            ]
+            if not missing:
+                return
+            if time.monotonic() >= deadline:
+                raise NotFoundError(
+                    f"Waited {self.shard_timeout:.0f}s for shard 0 to create "
+                    f"{', '.join(missing)}, which could not be found in Metabase."
+                )
+
+            time.sleep(poll)
+
+    def get_entities_to_manage(self) -> List[Type[Entity]]:
+        return [self._entities[key] for key in self.get_selected_keys()]
+
     def parse_config(self, paths: List[str]):
         self.config = MetabaseParser.from_paths(paths)
 
     def cache_metabase(self):
-        self.registry = MetabaseRegistry(client=self.client)
-        self.registry.cache(self.select, self.exclude)
+        if self.registry is None:
+            # the same registry is refreshed by later syncs, keeping its indexes
+            self.registry = MetabaseRegistry(client=self.client)
+        if keys := self.get_selected_keys():
+            # the registry caches every key if none is given
+            self.registry.cache(keys, self.exclude)
+            self._fresh.update(set(keys).difference(self.exclude))
+
+        if self.config is not None:
+            # members declared on groups are matched against the users of Metabase
+            self.config.expand_members(self.registry)
+
+    def refresh_metabase(self, *objs: Type[Entity]):
+        """
+        Re-fetch the Metabase objects required to manage Entities. The objects they depend
+        on (i.e. groups for users), even if those are not selected, are only fetched if they
+        were never listed, or were changed since by a sync.
+        """
+        keys = []
+        for obj in objs:
+            key = self.get_key(obj)
+            dependencies = [
+                k
+                for k in self.get_dependencies(key, recursive=True)
+                if k in self._stale or not self.registry.is_cached(k)
+            ]
+            for k in [key] + dependencies:
+                # objects already listed by this sync aren't listed again
+                if k not in keys and k not in self._fresh:
+                    keys.append(k)
+        if not keys:
+            return
+
+        self.registry.cache(select=keys)
+        self._stale.difference_update(keys)
+        self._fresh.update(keys)
+
+        if "users" in keys and self.config is not None:
+            # members declared on groups are matched against the users listed again
+            self.config.expand_members(self.registry)
+
+    def schedule(
+        self, func: Callable[[Type[Entity]], Any], max_workers: int = None
+    ) -> Iterator[Tuple[Type[Entity], Any]]:
+        """
+        Call `func` for every Entity to manage, and yield (Entity, result) as each completes.
+        Entities are processed concurrently, except that an Entity only starts once all the
+        selected Entities it depends on have completed.
+        """
+        keys = self.get_selected_keys()
+        waiting = {
+            key: set(self.get_dependencies(key, recursive=True)).intersection(keys)
+            for key in keys
+        }
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(keys) or 1) as pool:
+            running = {}
+            while waiting or running:
+                for key in [key for key, deps in waiting.items() if not deps]:
+                    del waiting[key]
+                    running[pool.submit(func, self._entities[key])] = key
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    for deps in waiting.values():
+                        deps.discard(key)
+
+                    yield self._entities[key], future.result()
 
     def get_metabase_objects(self, obj: Type[Entity]) -> Dict[str, Resource]:
+        config = self.get_config_objects(obj)
+
         metabase = {}
         for instance in self.registry.get_instances_for_object(obj.METABASE):
             key = obj.get_key_from_metabase_instance(instance)
+            # i.e. cards declared with their entity id rather than their name
+            key = next(
+                (k for k in obj.get_alternate_keys(instance) if k in config), key
+            )
+
+            if not self.in_shard(obj, key):
+                continue
 
             if key in metabase:
                 raise DuplicateKeyError()
 
             metabase[key] = instance
 
+        for key, entity in config.items():
+            if key in metabase:
+                continue
+            # i.e. cards declared with an entity id that Metabase didn't keep when
+            # creating them are matched by their name, rather than created again
+            for fallback in entity.get_fallback_keys():
+                if fallback in metabase and fallback not in config:
+                    metabase[key] = metabase.pop(fallback)
+                    break
+
         return metabase
 
     def get_config_objects(self, obj: Type[Entity]) -> Dict[str, Entity]:
         config = {}
         for instance in self.config.get_instances_for_object(obj):
+            if not self.in_shard(obj, instance.key):
+                continue
+
             if instance.key in config:
                 raise DuplicateKeyError()
 
@@ -75,6 +382,15 @@ class MetabaseManager:
 
         return config
 
+    def is_journaled(self, obj: Type[Entity], key: str, *actions: str) -> bool:
+        """Whether any of the given actions was completed by a previous, resumed sync."""
+        if self.journal is None:
+            return False
+
+        return any(
+            self.journal.contains(self.get_key(obj), key, action) for action in actions
+        )
+
     def find_objects_to_create(self, obj: Type[Entity]) -> List[Entity]:
         config = self.get_config_objects(obj)
         metabase = self.get_metabase_objects(obj)
@@ -93,6 +409,10 @@ class MetabaseManager:
 
         entities = []
         for key in metabase.keys() & config.keys():
+            if self.is_journaled(obj, key, "create", "update"):
+                # the resource exists, which is all there is to verify
+                continue
+
             entity = config[key]
             entity.registry = self.registry
             if not entity.is_equal(metabase[key]):
@@ -102,20 +422,385 @@ class MetabaseManager:
         return entities
 
     def find_objects_to_delete(self, obj: Type[Entity]) -> List[Entity]:
+        if obj is Database and not self.delete_databases:
+            # deleting a connection also deletes every question using it
+            return []
+        if obj.EXPLICIT_DELETE and self.get_key(obj) not in self.get_explicit_keys():
+            return []
+
         config = self.get_config_objects(obj)
         metabase = self.get_metabase_objects(obj)
 
+        owned = set()
+        if obj is CachePolicy:
+            # the cache TTL of declared databases is synced along with them
+            owned = {f"database:{database.name}" for database in self.config.databases}
+
         return [
             obj.from_resource(resource=metabase[key])
-            for key in metabase.keys() - config.keys()
+            for key in metabase.keys() - config.keys() - owned
             if obj.can_delete(metabase[key])
         ]
 
+    def plan_columnar(self, delete: bool = True) -> Plan:
+        """
+        Find the changes required to sync users with a UserDiff, which produces the same
+        Plan as the find_objects_to_* methods in a fraction of the time for many users.
+        """
+        config = self.get_config_objects(User)
+        metabase = self.get_metabase_objects(User)
+        diff = UserDiff.compute(
+            UserColumns.from_config(config.values(), self.registry),
+            UserColumns.from_metabase(metabase.values()),
+        )
+
+        plan = Plan(obj=User)
+        for key in diff.create:
+            config[key].registry = self.registry
+            plan.create.append(config[key])
+
+        for key in diff.update:
+            if self.is_journaled(User, key, "create", "update"):
+                continue
+            config[key].registry = self.registry
+            config[key].resource = metabase[key]
+            plan.update.append(config[key])
+
+        if delete:
+            plan.delete = [
+                User.from_resource(resource=metabase[key])
+                for key in diff.delete
+                if User.can_delete(metabase[key])
+            ]
+
+        return plan
+
+    def plan(self, obj: Type[Entity], delete: bool = True) -> Plan:
+        """Find the changes required to sync an Entity, based on the current registry."""
+        started = time.monotonic()
+        if self.columnar and obj is User:
+            plan = self.plan_columnar(delete=delete)
+        else:
+            plan = Plan(
+                obj=obj,
+                create=self.find_objects_to_create(obj),
+                update=self.find_objects_to_update(obj),
+                delete=self.find_objects_to_delete(obj) if delete else [],
+            )
+
+        key = self.get_key(obj)
+        metrics = self.client.metrics
+        metrics.observe(
+            "metabase_manager_plan_seconds", time.monotonic() - started, type=key
+        )
+        for action in ("create", "update", "delete"):
+            metrics.set(
+                "metabase_manager_drift",
+                len(getattr(plan, action)),
+                type=key,
+                action=action,
+            )
+
+        return plan
+
+    def estimate_duration(self, requests: int) -> Optional[float]:
+        """
+        Estimate the number of seconds required to send a number of requests, based on
+        the latency of the most recent requests to Metabase and the number of concurrent
+        requests the limiter currently allows, rather than its ceiling.
+        """
+        limiter = self.client.limiter
+        if limiter.recent_latency is None:
+            return None
+
+        duration = requests * limiter.recent_latency / int(limiter.limit)
+        if self.max_rps:
+            duration = max(duration, requests / self.max_rps)
+        return duration
+
+    @staticmethod
+    def check_budget(plans: List[Plan], max_requests: int):
+        """Raise BudgetExceededError if applying Plans would exceed `max_requests`."""
+        requests = sum(plan.requests for plan in plans)
+        if requests > max_requests:
+            raise BudgetExceededError(
+                f"Applying these changes requires an estimated {requests} requests, "
+                f"more than the maximum of {max_requests}."
+            )
+
+    def map(self, func: Callable[[Entity], Any], entities: List[Entity]) -> List[Any]:
+        """
+        Call `func` on every Entity concurrently. The client's AdaptiveLimiter decides how
+        many requests are actually in flight, up to `max_concurrency`.
+        """
+        if not entities:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(entities))
+        ) as pool:
+            return list(pool.map(func, entities))
+
+    def apply(self, plan: Plan):
+        """Apply the changes in a Plan, all at once for Entities that support it."""
+        if not plan.obj.BULK:
+            for action in ("create", "update", "delete"):
+                for batch in plan.obj.batch(getattr(plan, action), action):
+                    self.map(getattr(self, action), batch)
+            return
+
+        if plan:
+            changes = {id(entity): self.get_changes(entity) for entity in plan.update}
+            started = time.monotonic()
+            try:
+                plan.obj.apply_many(
+                    using=self.client,
+                    create=plan.create,
+                    update=plan.update,
+                    delete=plan.delete,
+                )
+            except Exception as e:
+                for action in ("create", "update", "delete"):
+                    for entity in getattr(plan, action):
+                        self.report(
+                            entity,
+                            action,
+                            "failed",
+                            changes=changes.get(id(entity)),
+                            started=started,
+                            error=e,
+                        )
+                if self.stop_on_error:
+                    raise
+                return
+
+            for action in ("create", "update", "delete"):
+                for entity in getattr(plan, action):
+                    self.record(entity, action)
+                    self.report(
+                        entity,
+                        action,
+                        "done",
+                        changes=changes.get(id(entity)),
+                        started=started,
+                    )
+
     def create(self, entity: Entity):
-        entity.create(using=self.client)
+        self.run(entity, "create", lambda: entity.create(using=self.client))
 
     def update(self, entity: Entity):
-        entity.update()
+        self.run(entity, "update", entity.update, changes=self.get_changes(entity))
 
     def delete(self, entity: Entity):
-        entity.delete()
+        self.run(entity, "delete", entity.delete)
+
+    def run(
+        self,
+        entity: Entity,
+        action: str,
+        func: Callable[[], Any],
+        changes: List[str] = None,
+    ):
+        """Apply an action on an Entity, then record and report it."""
+        started = time.monotonic()
+        try:
+            func()
+        except Exception as e:
+            self.report(entity, action, "failed", changes, started=started, error=e)
+            if self.stop_on_error:
+                raise
+            return
+
+        self.record(entity, action)
+        self.report(entity, action, "done", changes, started=started)
+
+    def get_changes(self, entity: Entity) -> Optional[List[str]]:
+        """Get the attributes an update changes, if the reporter lists them."""
+        if self.reporter is None or not self.reporter.CHANGES:
+            return None
+        return entity.get_changes()
+
+    def report(
+        self,
+        entity: Entity,
+        action: str,
+        status: str,
+        changes: List[str] = None,
+        started: float = None,
+        error: Exception = None,
+    ):
+        """
+        Report an action planned, or applied since `started`, to the reporter if any,
+        and to the caller of iter_sync().
+        """
+        type_ = self.get_key(type(entity))
+        if started is not None:
+            self.client.metrics.inc(
+                "metabase_manager_actions_total",
+                type=type_,
+                action=action,
+                status=status,
+            )
+            self.client.metrics.observe(
+                "metabase_manager_action_seconds",
+                time.monotonic() - started,
+                type=type_,
+                action=action,
+            )
+
+        if self.reporter is None and self._events is None:
+            return
+
+        event = Event(
+            type=type_,
+            key=entity.key,
+            action=action,
+            status=status,
+            changes=changes or [],
+            duration=time.monotonic() - started if started is not None else None,
+            error=str(error) if error is not None else None,
+            started=started,
+            entity=entity,
+        )
+        if self.reporter is not None:
+            self.reporter.report(event)
+        if self._events is not None:
+            self._events.put(event)
+
+    def log(self, message: str):
+        """Log a message that isn't about an object to the reporter, if any."""
+        if self.reporter is not None:
+            self.reporter.log(message)
+
+    def iter_sync(
+        self,
+        paths: List[str] = None,
+        delete: bool = True,
+        dry_run: bool = False,
+        max_requests: int = None,
+        progress: Callable[[Type[Entity]], Any] = None,
+    ) -> Iterator[Event]:
+        """
+        Sync the config to Metabase, yielding an Event for every action as it is applied
+        (or planned, with `dry_run`). The config is parsed from `paths` if given, otherwise
+        the config already parsed is synced again. `progress` is called with every Entity
+        whose changes are all applied.
+        """
+        events = Queue()
+        errors = []
+
+        def run():
+            try:
+                self.run_sync(paths, delete, dry_run, max_requests, progress)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                events.put(None)
+
+        self._events = events
+        thread = Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            while (event := events.get()) is not None:
+                yield event
+        finally:
+            thread.join()
+            self._events = None
+
+        if errors:
+            raise errors[0]
+
+    def sync(
+        self,
+        paths: List[str] = None,
+        delete: bool = True,
+        dry_run: bool = False,
+        max_requests: int = None,
+        progress: Callable[[Type[Entity]], Any] = None,
+    ) -> SyncResult:
+        """Sync the config to Metabase, see iter_sync(), and get the outcome."""
+        result = SyncResult()
+        started, requests = time.monotonic(), self.client.limiter.requests
+
+        for event in self.iter_sync(paths, delete, dry_run, max_requests, progress):
+            result.add(event)
+
+        result.duration = time.monotonic() - started
+        result.requests = self.client.limiter.requests - requests
+
+        self.client.metrics.observe("metabase_manager_sync_seconds", result.duration)
+        self.client.metrics.set(
+            "metabase_manager_last_sync_timestamp_seconds", time.time()
+        )
+        return result
+
+    def run_sync(
+        self,
+        paths: Optional[List[str]],
+        delete: bool,
+        dry_run: bool,
+        max_requests: Optional[int],
+        progress: Optional[Callable[[Type[Entity]], Any]],
+    ):
+        if paths is not None:
+            self.parse_config(paths)
+        self._fresh = set()
+        if self.registry is None:
+            self.cache_metabase()
+        # otherwise, objects are listed again as they are synced (see refresh_metabase)
+
+        if self.shard is not None and not self.shard.is_leader and not dry_run:
+            self.wait_for_leader()
+
+        plans = {}
+        if dry_run or max_requests is not None:
+            # plan everything up front to estimate the cost of the whole sync
+            self.refresh_metabase(*self.get_entities_to_manage())
+            for obj in self.get_entities_to_manage():
+                plans[obj] = self.plan(obj, delete=delete)
+
+            requests = sum(plan.requests for plan in plans.values())
+            estimate = f"[ESTIMATE] {requests} requests"
+            if (duration := self.estimate_duration(requests)) is not None:
+                estimate += f" (~{duration:.1f}s)"
+            self.log(estimate)
+
+            if max_requests is not None:
+                self.check_budget(list(plans.values()), max_requests)
+
+        def sync_entity(obj: Type[Entity]):
+            if not dry_run:
+                # objects it depends on may have changed since the start of the sync
+                self.refresh_metabase(obj)
+                # actions are reported as they are applied
+                plan = self.plan(obj, delete=delete)
+                self.apply(plan)
+                if plan:
+                    # objects depending on these list them again, see refresh_metabase()
+                    key = self.get_key(obj)
+                    self._stale.add(key)
+                    # objects listed before may refer to these, i.e. permissions to groups
+                    self._fresh.difference_update(
+                        [key] + self.get_dependents(key, recursive=True)
+                    )
+                return
+
+            for action in ("create", "update", "delete"):
+                for entity in getattr(plans[obj], action):
+                    changes = self.get_changes(entity) if action == "update" else []
+                    self.report(entity, action, "planned", changes=changes)
+
+        # entities that don't depend on each other are synced concurrently
+        for obj, _ in self.schedule(sync_entity):
+            if progress is not None:
+                progress(obj)
+
+    def record(self, entity: Entity, action: str):
+        """Record a completed action in the journal, if any."""
+        if self.journal is not None:
+            self.journal.record(
+                object_type=self.get_key(type(entity)),
+                key=entity.key,
+                action=action,
+                resource_id=getattr(entity.resource, "id", None),
+            )
@@ -0,0 +1,122 @@
+import hashlib
+import json
+from typing import Any, Set
+
+# legacy field references, equivalent to ["field", id, None]
+LEGACY_FIELD_CLAUSES = ("field-id", "field-literal")
+
+# fmt: off
+# names of MBQL clauses, as normalized by normalize_token()
+CLAUSES = {
+    # references
+    "field", "field-id", "field-literal", "fk->", "joined-field", "datetime-field",
+    "binning-strategy", "expression", "aggregation", "value", "relative-datetime",
+    "absolute-datetime", "interval", "asc", "desc", "metric", "segment",
+    # aggregations
+    "count", "cum-count", "sum", "cum-sum", "distinct", "avg", "min", "max", "stddev",
+    "var", "median", "percentile", "share", "count-where", "sum-where",
+    "distinct-where", "aggregation-options", "offset",
+    # filters
+    "and", "or", "not", "between", "inside", "is-null", "not-null", "is-empty",
+    "not-empty", "starts-with", "ends-with", "contains", "does-not-contain",
+    "time-interval", "relative-time-interval", "during", "in", "not-in",
+    # expressions
+    "case", "if", "coalesce", "concat", "substring", "trim", "ltrim", "rtrim", "upper",
+    "lower", "length", "replace", "regex-match-first", "split-part", "abs", "ceil",
+    "floor", "round", "sqrt", "power", "exp", "log", "datetime-add",
+    "datetime-subtract", "datetime-diff", "temporal-extract", "convert-timezone",
+    "now", "get-year", "get-quarter", "get-month", "get-week", "get-day",
+    "get-day-of-week", "get-hour", "get-minute", "get-second", "month-name",
+    "quarter-name", "day-name", "host", "domain", "subdomain", "path", "text",
+    "integer", "date",
+}
+
+# keys of MBQL queries and of the options of clauses, as normalized by normalize_token()
+OPTIONS = {
+    # queries
+    "database", "type", "query", "native", "source-table", "source-query",
+    "aggregation", "breakout", "filter", "limit", "order-by", "fields", "expressions",
+    "joins", "page", "items", "condition", "alias", "strategy", "template-tags",
+    "parameters", "collection",
+    # options of clauses
+    "temporal-unit", "binning", "num-bins", "bin-width", "join-alias", "base-type",
+    "effective-type", "source-field", "include-current", "case-sensitive", "name",
+    "display-name",
+    # template tags
+    "id", "dimension", "widget-type", "default", "required", "card-id", "snippet-id",
+    "snippet-name",
+}
+# fmt: on
+
+# the keys of these options are chosen by users (i.e. names of expressions), and kept as is
+NAMED_OPTIONS = ("expressions", "template-tags")
+
+
+def normalize_token(token: str, known: Set[str]) -> str:
+    """
+    Normalize a key or clause name known to MBQL, i.e. ':source_table' -> 'source-table'.
+    Other tokens (i.e. names chosen by users) are kept as is.
+    """
+    normalized = token.lstrip(":").replace("_", "-").lower()
+    return normalized if normalized in known else token
+
+
+def normalize(definition: Any, named: bool = False) -> Any:
+    """
+    Normalize an MBQL definition, so that equivalent definitions are equal regardless of
+    how they were written: keys and clause names known to MBQL are normalized, legacy
+    field references are rewritten, and empty options are removed. The keys of `named`
+    definitions are names chosen by users, and are not normalized.
+    """
+    if isinstance(definition, dict):
+        normalized = {}
+        for key, value in definition.items():
+            if value is None or value == {} or value == []:
+                continue
+            if not named:
+                key = normalize_token(key, OPTIONS)
+            normalized[key] = normalize(value, named=not named and key in NAMED_OPTIONS)
+        return normalized
+
+    if isinstance(definition, list):
+        if not definition or not isinstance(definition[0], str):
+            return [normalize(value) for value in definition]
+
+        clause, *args = definition
+        clause = normalize_token(clause, CLAUSES)
+        args = [normalize(arg) for arg in args]
+
+        if clause in LEGACY_FIELD_CLAUSES:
+            clause = "field"
+        if clause == "field":
+            # ["field", 1] and ["field", 1, {}] are both ["field", 1, None]
+            args = args[:1] + [args[1] if len(args) > 1 and args[1] else None]
+
+        return [clause] + args
+
+    return definition
+
+
+def hash_definition(definition: Any) -> str:
+    """Hash the normalized form of an MBQL definition, to compare definitions cheaply."""
+    return hash_content(normalize(definition))
+
+
+def hash_content(content: Any) -> str:
+    """Hash a JSON-serializable value, regardless of the order of its keys."""
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize the text of a native query, so that formatting differences that don't change
+    the query are ignored: line endings, trailing whitespace and surrounding blank lines.
+    """
+    lines = (sql or "").replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def hash_sql(sql: str) -> str:
+    """Hash the normalized text of a native query."""
+    return hashlib.sha256(normalize_sql(sql).encode()).hexdigest()
@@ -0,0 +1,78 @@
+import re
+from dataclasses import dataclass, field
+from fnmatch import translate
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+
+@dataclass
+class Membership:
+    """
+    Members of groups, declared as emails or as patterns of emails (i.e. *@example.com),
+    inverted to find the groups of an email. Patterns are compiled once, and only the
+    patterns of the domain of an email (or of no domain in particular) are matched.
+    """
+
+    # groups of every email declared as is
+    _emails: Dict[str, Set[str]] = field(default_factory=dict, repr=False)
+    # groups of every domain declared as *@<domain>
+    _domains: Dict[str, Set[str]] = field(default_factory=dict, repr=False)
+    # other patterns by their domain (None if it's a pattern), compiled per group
+    _patterns: Dict[Optional[str], List[Tuple[Pattern, str]]] = field(
+        default_factory=dict, repr=False
+    )
+
+    @staticmethod
+    def is_pattern(member: str) -> bool:
+        return any(c in member for c in "*?[")
+
+    @classmethod
+    def from_members(cls, members: Dict[str, Iterable[str]]) -> "Membership":
+        """Index the members of groups, given by group name, in a single pass."""
+        membership = cls()
+        patterns: Dict[Optional[str], Dict[str, List[str]]] = {}
+
+        for group, emails in members.items():
+            for member in emails:
+                member = member.lower()
+                domain = member.rpartition("@")[2] if "@" in member else None
+                if domain is not None and cls.is_pattern(domain):
+                    domain = None
+
+                if not cls.is_pattern(member):
+                    membership._emails.setdefault(member, set()).add(group)
+                elif domain is not None and member == f"*@{domain}":
+                    membership._domains.setdefault(domain, set()).add(group)
+                else:
+                    patterns.setdefault(domain, {}).setdefault(group, []).append(
+                        translate(member)
+                    )
+
+        membership._patterns = {
+            domain: [
+                (re.compile("|".join(expressions)), group)
+                for group, expressions in groups.items()
+            ]
+            for domain, groups in patterns.items()
+        }
+        return membership
+
+    def __bool__(self) -> bool:
+        return bool(self._emails or self._domains or self._patterns)
+
+    def get_groups(self, email: str) -> Set[str]:
+        """Get the names of the groups an email is a member of."""
+        email = email.lower()
+        groups = set(self._emails.get(email, ()))
+        domain = email.rpartition("@")[2]
+        groups.update(self._domains.get(domain, ()))
+        for patterns in (self._patterns.get(domain, ()), self._patterns.get(None, ())):
+            groups.update(group for pattern, group in patterns if pattern.match(email))
+        return groups
+
+    def expand(self, emails: Iterable[str]) -> Dict[str, Set[str]]:
+        """Get the groups of every email that is a member of at least one group."""
+        index = {}
+        for email in emails:
+            if groups := self.get_groups(email):
+                index[email] = groups
+        return index
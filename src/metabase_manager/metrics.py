@@ -0,0 +1,159 @@
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Tuple, Union
+
+# upper bounds of the buckets of histograms, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# type and description of every metric, by name
+METRICS = {
+    "metabase_manager_fetch_seconds": (
+        "histogram",
+        "Time taken to list the objects of a type from Metabase.",
+    ),
+    "metabase_manager_plan_seconds": (
+        "histogram",
+        "Time taken to find the changes required to sync a type of object.",
+    ),
+    "metabase_manager_action_seconds": (
+        "histogram",
+        "Time taken to create, update or delete an object.",
+    ),
+    "metabase_manager_actions_total": (
+        "counter",
+        "Number of objects created, updated or deleted.",
+    ),
+    "metabase_manager_drift": (
+        "gauge",
+        "Number of objects that differed from the config when last planned.",
+    ),
+    "metabase_manager_http_responses_total": (
+        "counter",
+        "Number of responses from Metabase, by status code.",
+    ),
+    "metabase_manager_http_retries_total": (
+        "counter",
+        "Number of requests retried because Metabase was overloaded.",
+    ),
+    "metabase_manager_sync_seconds": (
+        "histogram",
+        "Time taken by a whole sync.",
+    ),
+    "metabase_manager_last_sync_timestamp_seconds": (
+        "gauge",
+        "Time at which the last sync completed, in seconds since the epoch.",
+    ),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class Metrics:
+    """
+    Counters, gauges and histograms of syncs, written in the text format of Prometheus
+    (i.e. to a file read by the textfile collector of node_exporter).
+    """
+
+    _values: Dict[str, Dict[Labels, Union[float, List[float]]]] = field(
+        default_factory=dict, repr=False
+    )
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @staticmethod
+    def get_labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Increment a counter."""
+        key = self.get_labels(labels)
+        with self._lock:
+            values = self._values.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """Set the value of a gauge."""
+        with self._lock:
+            self._values.setdefault(name, {})[self.get_labels(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Add an observation to a histogram."""
+        key = self.get_labels(labels)
+        with self._lock:
+            values = self._values.setdefault(name, {})
+            # count of every bucket, then the sum and count of observations
+            histogram = values.setdefault(key, [0] * (len(BUCKETS) + 2))
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    histogram[i] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def get(self, name: str, **labels) -> Union[float, List[float], None]:
+        with self._lock:
+            return self._values.get(name, {}).get(self.get_labels(labels))
+
+    @staticmethod
+    def format_labels(labels: Labels) -> str:
+        if not labels:
+            return ""
+
+        def escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+    @staticmethod
+    def format_value(value: float) -> str:
+        # timestamps keep their precision, unlike with a fixed number of digits
+        value = float(value)
+        return str(int(value)) if value.is_integer() else repr(value)
+
+    def render(self) -> str:
+        """Get every metric that has a value, in the text format of Prometheus."""
+        lines = []
+        with self._lock:
+            for name, (kind, description) in METRICS.items():
+                if not self._values.get(name):
+                    continue
+
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in sorted(self._values[name].items()):
+                    if kind != "histogram":
+                        lines.append(
+                            f"{name}{self.format_labels(labels)} "
+                            f"{self.format_value(value)}"
+                        )
+                        continue
+
+                    for bound, count in zip(
+                        BUCKETS + ("+Inf",), value[:-2] + [value[-1]]
+                    ):
+                        bucket = self.format_labels(labels + (("le", str(bound)),))
+                        lines.append(f"{name}_bucket{bucket} {count}")
+                    lines.append(
+                        f"{name}_sum{self.format_labels(labels)} "
+                        f"{self.format_value(value[-2])}"
+                    )
+                    lines.append(
+                        f"{name}_count{self.format_labels(labels)} {value[-1]}"
+                    )
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def write(self, path: Union[str, Path]):
+        """
+        Write every metric to a file, replaced at once so that collectors never read
+        a partially written file.
+        """
+        path = Path(path)
+        fd, temporary = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        with os.fdopen(fd, "w") as f:
+            f.write(self.render())
+        # readable by collectors running as another user
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
@@ -1,19 +1,80 @@
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Type, Union
+from typing import Dict, List, Set, Type, Union
 
 import yaml
 
-from metabase_manager.entities import Entity, Group, User
+from metabase_manager.entities import (
+    CachePolicy,
+    Card,
+    Collection,
+    CollectionPermission,
+    Dashboard,
+    Database,
+    Entity,
+    Field,
+    Group,
+    Metric,
+    Permission,
+    Sandbox,
+    Segment,
+    Setting,
+    Snippet,
+    Subscription,
+    Table,
+    User,
+)
 from metabase_manager.exceptions import InvalidConfigError
+from metabase_manager.membership import Membership
+from metabase_manager.registry import MetabaseRegistry
 
 
 @dataclass
 class MetabaseParser:
     _users: Dict[str, User] = field(default_factory=dict)
     _groups: Dict[str, Group] = field(default_factory=dict)
+    _databases: Dict[str, Database] = field(default_factory=dict)
+    _permissions: Dict[str, Permission] = field(default_factory=dict)
+    _collections: Dict[str, Collection] = field(default_factory=dict)
+    _collection_permissions: Dict[str, CollectionPermission] = field(
+        default_factory=dict
+    )
+    _tables: Dict[str, Table] = field(default_factory=dict)
+    _fields: Dict[str, Field] = field(default_factory=dict)
+    _segments: Dict[str, Segment] = field(default_factory=dict)
+    _metrics: Dict[str, Metric] = field(default_factory=dict)
+    _cards: Dict[str, Card] = field(default_factory=dict)
+    _dashboards: Dict[str, Dashboard] = field(default_factory=dict)
+    _settings: Dict[str, Setting] = field(default_factory=dict)
+    _caching: Dict[str, CachePolicy] = field(default_factory=dict)
+    _sandboxes: Dict[str, Sandbox] = field(default_factory=dict)
+    _subscriptions: Dict[str, Subscription] = field(default_factory=dict)
+    _snippets: Dict[str, Snippet] = field(default_factory=dict)
 
-    _entities = {"users": User, "groups": Group}
+    # users only declared as members of groups, see expand_members()
+    _members: Set[str] = field(default_factory=set, repr=False)
+    # keys found in config files, even without any object (i.e. `users: []`)
+    _declared: Set[str] = field(default_factory=set, repr=False)
+
+    _entities = {
+        "users": User,
+        "groups": Group,
+        "databases": Database,
+        "permissions": Permission,
+        "collections": Collection,
+        "collection_permissions": CollectionPermission,
+        "tables": Table,
+        "fields": Field,
+        "segments": Segment,
+        "metrics": Metric,
+        "cards": Card,
+        "dashboards": Dashboard,
+        "settings": Setting,
+        "caching": CachePolicy,
+        "sandboxes": Sandbox,
+        "subscriptions": Subscription,
+        "snippets": Snippet,
+    }
 
     @property
     def users(self) -> List[User]:
@@ -23,20 +84,80 @@ class MetabaseParser:
     def groups(self) -> List[Group]:
         return list(self._groups.values())
 
+    @property
+    def databases(self) -> List[Database]:
+        return list(self._databases.values())
+
+    @property
+    def permissions(self) -> List[Permission]:
+        return list(self._permissions.values())
+
+    @property
+    def collections(self) -> List[Collection]:
+        return list(self._collections.values())
+
+    @property
+    def collection_permissions(self) -> List[CollectionPermission]:
+        return list(self._collection_permissions.values())
+
+    @property
+    def tables(self) -> List[Table]:
+        return list(self._tables.values())
+
+    @property
+    def fields(self) -> List[Field]:
+        return list(self._fields.values())
+
+    @property
+    def segments(self) -> List[Segment]:
+        return list(self._segments.values())
+
+    @property
+    def metrics(self) -> List[Metric]:
+        return list(self._metrics.values())
+
+    @property
+    def cards(self) -> List[Card]:
+        return list(self._cards.values())
+
+    @property
+    def dashboards(self) -> List[Dashboard]:
+        return list(self._dashboards.values())
+
+    @property
+    def settings(self) -> List[Setting]:
+        return list(self._settings.values())
+
+    @property
+    def caching(self) -> List[CachePolicy]:
+        return list(self._caching.values())
+
+    @property
+    def sandboxes(self) -> List[Sandbox]:
+        return list(self._sandboxes.values())
+
+    @property
+    def subscriptions(self) -> List[Subscription]:
+        return list(self._subscriptions.values())
+
+    @property
+    def snippets(self) -> List[Snippet]:
+        return list(self._snippets.values())
+
     @classmethod
     def from_paths(cls, paths: List[str]) -> "MetabaseParser":
         config = cls()
         for file in paths:
             loaded = config.load_yaml(file)
             config.parse_yaml(loaded)
+        config.validate()
 
         return config
 
     def get_instances_for_object(self, obj: Type[Entity]) -> List[Entity]:
-        if obj == User:
-            return self.users
-        if obj == Group:
-            return self.groups
+        for key, entity in self._entities.items():
+            if obj == entity:
+                return getattr(self, key)
 
     @staticmethod
     def load_yaml(filepath: Union[str, Path]) -> dict:
@@ -52,6 +173,77 @@ class MetabaseParser:
 
             # load every object defined this key (i.e. users, groups, etc.)
             self.register_objects(yaml[key], key)
+            self._declared.add(key)
+
+    def validate(self):
+        """
+        Raise InvalidConfigError if objects declared in different keys (or files) set the
+        same attribute in Metabase, as each sync would overwrite the other.
+        """
+        for policy in self.caching:
+            database = self._databases.get(policy.name)
+            if (
+                policy.model == "database"
+                and database is not None
+                and database.cache_ttl is not None
+            ):
+                raise InvalidConfigError(
+                    f"The cache TTL of database {policy.name} is declared both in "
+                    f"databases and in caching, declare it in only one of them."
+                )
+
+    def get_declared_keys(self) -> Set[str]:
+        """
+        Get the keys of the objects declared in the config. Users that are only members
+        of groups don't declare users, see expand_members().
+        """
+        declared = set(self._declared)
+        for key in self._entities:
+            objects = getattr(self, "_" + key).keys()
+            if key == "users":
+                objects = objects - self._members
+            if objects:
+                declared.add(key)
+
+        return declared
+
+    def get_membership(self) -> Membership:
+        """Index the members declared on groups, by email."""
+        return Membership.from_members(
+            {group.name: group.members for group in self.groups if group.members}
+        )
+
+    def expand_members(self, registry: MetabaseRegistry):
+        """
+        Add groups whose members are declared on the group to the groups of users. Users of
+        Metabase that are only declared as members of a group are managed as they are,
+        with the groups they are a member of.
+        """
+        # expanded again against the current users when a config is synced again
+        for email in self._members:
+            self._users.pop(email, None)
+        self._members.clear()
+
+        membership = self.get_membership()
+        if not membership:
+            return
+
+        for user in registry.users:
+            if user.email not in self._users and membership.get_groups(user.email):
+                self._members.add(user.email)
+                self.register_object(
+                    User(
+                        first_name=user.first_name,
+                        last_name=user.last_name,
+                        email=user.email,
+                    ),
+                    "users",
+                )
+
+        for email, groups in membership.expand(self._users).items():
+            user = self._users[email]
+            declared = {group.name for group in user.groups}
+            user.groups.extend(Group(name=name) for name in sorted(groups - declared))
 
     def register_objects(self, objects: List[dict], instance_key: str):
         cls = self._entities[instance_key]
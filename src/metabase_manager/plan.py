@@ -0,0 +1,22 @@
+from dataclasses import dataclass, field
+from typing import List, Type
+
+from metabase_manager.entities import Entity
+
+
+@dataclass
+class Plan:
+    """Changes required to sync one type of Entity to Metabase."""
+
+    obj: Type[Entity]
+    create: List[Entity] = field(default_factory=list)
+    update: List[Entity] = field(default_factory=list)
+    delete: List[Entity] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.create) + len(self.update) + len(self.delete)
+
+    @property
+    def requests(self) -> int:
+        """Estimated number of HTTP requests required to apply the Plan."""
+        return self.obj.estimate_requests_many(self.create, self.update, self.delete)
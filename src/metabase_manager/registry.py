@@ -1,20 +1,29 @@
+import time
 from dataclasses import dataclass, field
-from typing import List, Optional, Type
+from threading import Lock
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
 
 import metabase
-from metabase import (
-    Database,
-    Field,
-    Metabase,
-    Metric,
-    PermissionGroup,
-    Segment,
-    Table,
-    User,
-)
+from metabase import Database, Metabase, PermissionGroup, User
 from metabase.resource import Resource
 
 from metabase_manager.exceptions import DuplicateKeyError
+from metabase_manager.resources import (
+    CachePolicy,
+    Card,
+    Collection,
+    CollectionPermission,
+    Dashboard,
+    DataPermission,
+    FieldMetadata,
+    Metric,
+    Sandbox,
+    Segment,
+    Setting,
+    Snippet,
+    Subscription,
+    TableMetadata,
+)
 
 
 @dataclass
@@ -22,18 +31,63 @@ class MetabaseRegistry:
     client: Metabase
 
     databases: List[Database] = field(default_factory=list)
-    tables: List[Table] = field(default_factory=list)
+    tables: List[TableMetadata] = field(default_factory=list)
     users: List[User] = field(default_factory=list)
     groups: List[PermissionGroup] = field(default_factory=list)
-    fields: List[Field] = field(default_factory=list)
+    fields: List[FieldMetadata] = field(default_factory=list)
     metrics: List[Metric] = field(default_factory=list)
     segments: List[Segment] = field(default_factory=list)
+    permissions: List[DataPermission] = field(default_factory=list)
+    collections: List[Collection] = field(default_factory=list)
+    collection_permissions: List[CollectionPermission] = field(default_factory=list)
+    cards: List[Card] = field(default_factory=list)
+    dashboards: List[Dashboard] = field(default_factory=list)
+    settings: List[Setting] = field(default_factory=list)
+    caching: List[CachePolicy] = field(default_factory=list)
+    sandboxes: List[Sandbox] = field(default_factory=list)
+    subscriptions: List[Subscription] = field(default_factory=list)
+    snippets: List[Snippet] = field(default_factory=list)
+
+    # indexes of instances by attribute, along with the list they were built from
+    _indexes: Dict[Tuple[str, str], Tuple[List[Resource], Dict[Any, Resource]]] = field(
+        default_factory=dict, repr=False
+    )
+    # emails of the members of every group by group id, along with the users they were built from
+    _members: Tuple[Optional[List[Resource]], Dict[int, Set[str]]] = field(
+        default=(None, None), repr=False
+    )
+    # emails of deactivated users, along with the active users they were fetched with
+    _deactivated: Tuple[Optional[List[Resource]], Set[str]] = field(
+        default=(None, None), repr=False
+    )
+    # keys whose instances were listed from Metabase at least once
+    _cached: Set[str] = field(default_factory=set, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
 
     _REGISTRY = {
         "groups": PermissionGroup,
         "users": User,
+        "databases": Database,
+        "permissions": DataPermission,
+        "collections": Collection,
+        "collection_permissions": CollectionPermission,
+        "tables": TableMetadata,
+        "fields": FieldMetadata,
+        "segments": Segment,
+        "metrics": Metric,
+        "cards": Card,
+        "dashboards": Dashboard,
+        "settings": Setting,
+        "caching": CachePolicy,
+        "sandboxes": Sandbox,
+        "subscriptions": Subscription,
+        "snippets": Snippet,
     }
 
+    # keys whose instances are read along with the instances of another key,
+    # i.e. fields are read from the metadata of their tables
+    _NESTED = {"fields": "tables"}
+
     @classmethod
     def get_registry_keys(cls) -> List[str]:
         return list(cls._REGISTRY.keys())
@@ -45,16 +99,108 @@ class MetabaseRegistry:
         if exclude is None:
             exclude = {}
 
-        for key in set(select).difference(set(exclude)):
+        keys = set(select).difference(set(exclude))
+        for key in self.get_registry_keys():
+            if key not in keys:
+                continue
+
+            if self._NESTED.get(key) in keys:
+                # already read along with their parents, don't fetch them again
+                parents = getattr(self, self._NESTED[key])
+                setattr(self, key, [i for p in parents for i in getattr(p, key)])
+                self._cached.add(key)
+                continue
+
             # call .list() method on objects in self._MAPPING for every
             # key in `select` not in `exclude, and set attribute
+            started = time.monotonic()
             setattr(self, key, self._REGISTRY[key].list(using=self.client))
+            self._cached.add(key)
+
+            if (metrics := getattr(self.client, "metrics", None)) is not None:
+                metrics.observe(
+                    "metabase_manager_fetch_seconds",
+                    time.monotonic() - started,
+                    type=key,
+                )
+
+    def is_cached(self, key: str) -> bool:
+        """Whether the instances of a key were listed from Metabase."""
+        return key in self._cached
 
     def get_instances_for_object(self, obj: Type[Resource]) -> List[Resource]:
-        if obj == User:
-            return self.users
-        if obj == PermissionGroup:
-            return self.groups
+        for key, resource in self._REGISTRY.items():
+            if obj == resource:
+                return getattr(self, key)
+
+    def get_index(self, key: str, attribute: str) -> Dict[Any, Resource]:
+        """
+        Get the instances of a key indexed by one of their attributes, for O(1) lookups.
+        Indexes are rebuilt whenever the instances of the key are replaced.
+        """
+        with self._lock:
+            instances = getattr(self, key)
+            indexed, index = self._indexes.get((key, attribute), (None, None))
+
+            if indexed is not instances:
+                index = {
+                    getattr(instance, attribute): instance for instance in instances
+                }
+                self._indexes[(key, attribute)] = (instances, index)
+
+            return index
+
+    def add(self, key: str, instance: Resource):
+        """Add an instance created in Metabase, without fetching every instance again."""
+        with self._lock:
+            getattr(self, key).append(instance)
+
+            for (indexed_key, attribute), (_, index) in self._indexes.items():
+                if indexed_key == key:
+                    index[getattr(instance, attribute)] = instance
+
+            if key == "users":
+                self._members = (None, None)
+
+    def get_members(self) -> Dict[int, Set[str]]:
+        """
+        Get the emails of the members of every group by group id, built in a single pass
+        over the users. Rebuilt whenever the users are replaced.
+        """
+        with self._lock:
+            indexed, members = self._members
+
+            if indexed is not self.users:
+                members = {}
+                for user in self.users:
+                    for group_id in getattr(user, "group_ids", None) or []:
+                        members.setdefault(group_id, set()).add(user.email)
+                self._members = (self.users, members)
+
+            return members
+
+    def get_deactivated_emails(self) -> Set[str]:
+        """
+        Get the emails of deactivated users, which are only listed the first time they
+        are needed. Fetched again whenever the users are replaced.
+        """
+        with self._lock:
+            indexed, emails = self._deactivated
+
+            if indexed is not self.users:
+                emails = {
+                    user.email
+                    for user in User.list(using=self.client, status="deactivated")
+                }
+                self._deactivated = (self.users, emails)
+
+            return emails
+
+    def get_collection_by_path(self, path: str) -> Optional[Collection]:
+        return self.get_index("collections", "path").get(path)
+
+    def get_table_by_key(self, key: str) -> Optional[TableMetadata]:
+        return self.get_index("tables", "key").get(key)
 
     def get_group_by_name(self, name: str) -> Optional[metabase.PermissionGroup]:
         groups = list(filter(lambda g: g.name == name, self.groups))
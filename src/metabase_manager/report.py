@@ -0,0 +1,200 @@
+import json
+import sys
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import ClassVar, Dict, List, Optional, TextIO, Tuple
+
+import click
+
+from metabase_manager.entities import Entity
+
+
+@dataclass
+class Event:
+    """An action on an object of Metabase, planned or applied by a sync."""
+
+    # key of the type of object (i.e. users)
+    type: str
+    key: str
+    action: str
+    # planned (by a dry-run), done or failed
+    status: str
+    # names of the attributes that differ, for updates
+    changes: List[str] = field(default_factory=list)
+    # seconds taken to apply the action, since `started` (a time.monotonic() value)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    started: Optional[float] = field(default=None, repr=False)
+
+    entity: Entity = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        return {
+            "type": self.type,
+            "key": self.key,
+            "action": self.action,
+            "status": self.status,
+            "changes": self.changes,
+            "duration": self.duration,
+            "error": self.error,
+        }
+
+
+@dataclass
+class SyncResult:
+    """Outcome of a sync: the number of actions, the time they took, and failures."""
+
+    # number of actions by type of object and action (i.e. {"users": {"create": 2}})
+    counts: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # seconds elapsed from the first action on each type of object to the end of the last
+    # one, as actions run concurrently
+    timings: Dict[str, float] = field(default_factory=dict)
+    errors: List[Event] = field(default_factory=list)
+    # seconds taken by the whole sync, and number of requests sent to Metabase
+    duration: float = 0.0
+    requests: int = 0
+
+    # start of the first action and end of the last one, by type of object
+    _spans: Dict[str, Tuple[float, float]] = field(default_factory=dict, repr=False)
+
+    def add(self, event: Event):
+        counts = self.counts.setdefault(event.type, {})
+        counts[event.action] = counts.get(event.action, 0) + 1
+
+        if event.started is not None and event.duration is not None:
+            started, finished = event.started, event.started + event.duration
+            if event.type in self._spans:
+                first, last = self._spans[event.type]
+                started, finished = min(first, started), max(last, finished)
+            self._spans[event.type] = (started, finished)
+            self.timings[event.type] = finished - started
+        if event.status == "failed":
+            self.errors.append(event)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+@dataclass
+class Reporter:
+    """
+    Write the events of a sync to a stream. Lines are buffered and written
+    `buffer_size` at a time, so that writing never slows down a sync.
+    """
+
+    # whether events list the attributes that changed, which is costly for many updates
+    CHANGES: ClassVar[bool] = False
+
+    stream: TextIO = None
+    buffer_size: int = 1000
+
+    _buffer: List[str] = field(default_factory=list, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    def __post_init__(self):
+        if self.stream is None:
+            self.stream = sys.stdout
+
+    def write(self, line: str):
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_size:
+                self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            # colors are stripped when the stream isn't a terminal
+            click.echo("\n".join(self._buffer), file=self.stream)
+            self._buffer.clear()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def report(self, event: Event):
+        raise NotImplementedError
+
+    def log(self, message: str):
+        """Write a message that isn't about an object (i.e. an estimate)."""
+        self.write(message)
+
+    def close(self):
+        self.flush()
+
+
+@dataclass
+class HumanReporter(Reporter):
+    """Write every action on a line of its own, colored by action."""
+
+    COLORS: ClassVar = {"create": "green", "update": "yellow", "delete": "red"}
+
+    def report(self, event: Event):
+        line = f"[{event.action.upper()}] {event.entity}"
+        if event.status == "failed":
+            self.write(click.style(f"[FAILED] {line}: {event.error}", fg="red"))
+        else:
+            self.write(click.style(line, fg=self.COLORS[event.action]))
+
+
+@dataclass
+class CompactReporter(Reporter):
+    """Write the number of actions per type of object once the sync completes."""
+
+    _counts: Dict[Tuple[str, str, str], int] = field(default_factory=dict, repr=False)
+
+    def report(self, event: Event):
+        with self._lock:
+            key = (event.type, event.action, event.status)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def get_summary(self) -> List[str]:
+        types = []
+        for key, _, _ in self._counts:
+            if key not in types:
+                types.append(key)
+
+        lines = []
+        for key in types:
+            counts = []
+            for action in ("create", "update", "delete", "failed"):
+                # failed actions are only counted as failed, so that counts add up
+                count = sum(
+                    n
+                    for (k, a, s), n in self._counts.items()
+                    if k == key and ("failed" if s == "failed" else a) == action
+                )
+                if count or action != "failed":
+                    counts.append(f"{action}={count}")
+
+            lines.append(f"{key}: {' '.join(counts)}")
+
+        return lines
+
+    def close(self):
+        for line in self.get_summary():
+            self.write(line)
+        super().close()
+
+
+@dataclass
+class JsonReporter(Reporter):
+    """
+    Write one JSON object per event and per line, for other tools to consume. Other
+    messages are written to stderr, so that the stream only contains events.
+    """
+
+    CHANGES: ClassVar[bool] = True
+
+    def report(self, event: Event):
+        self.write(json.dumps(event.to_dict()))
+
+    def log(self, message: str):
+        click.echo(message, err=True)
+
+
+REPORTERS = {
+    "human": HumanReporter,
+    "compact": CompactReporter,
+    "jsonl": JsonReporter,
+}
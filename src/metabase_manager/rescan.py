@@ -0,0 +1,178 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import metabase
+from requests import HTTPError
+
+from metabase_manager.exceptions import NotFoundError
+from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.resources import TableMetadata
+
+
+@dataclass
+class RescanResult:
+    """Outcome of the schema sync and field values rescan of a database."""
+
+    database: str
+    # number of tables rescanned, or None if the whole database was
+    tables: Optional[int]
+    duration: float
+    error: Optional[str] = None
+
+
+@dataclass
+class Rescan:
+    """
+    Sync the schema and rescan the field values of databases, with at most
+    `max_concurrency` databases in progress at once.
+    """
+
+    registry: MetabaseRegistry
+    # database[.schema[.table]], every database if empty
+    select: List[str] = field(default_factory=list)
+    sync_schema: bool = True
+    rescan_values: bool = True
+    max_concurrency: int = 2
+    poll_interval: float = 5.0
+    timeout: float = 3600.0
+
+    # tasks recorded by Metabase in its task history when a database operation completes
+    TASKS = {"sync_schema": "sync-metadata", "rescan_values": "cache-field-values"}
+    # number of tasks read from the task history at each poll
+    TASK_HISTORY_LIMIT = 100
+
+    @staticmethod
+    def parse_selector(selector: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """Split a selector into database, schema and table names."""
+        parts = selector.split(".", 2)
+        if not all(parts):
+            raise ValueError(
+                f"Invalid selector '{selector}', expected database[.schema[.table]]."
+            )
+
+        return tuple(parts + [None] * (3 - len(parts)))
+
+    def get_targets(
+        self,
+    ) -> List[Tuple[metabase.Database, Optional[List[TableMetadata]]]]:
+        """
+        Get the databases to rescan, along with the tables to rescan in each,
+        or None to rescan the whole database.
+        """
+        selectors = [self.parse_selector(s) for s in self.select]
+        scoped = any(schema is not None for _, schema, _ in selectors)
+        self.registry.cache(select=["databases", "tables"] if scoped else ["databases"])
+
+        databases = self.registry.get_index("databases", "name")
+        if not selectors:
+            return [(database, None) for database in databases.values()]
+
+        targets: Dict[str, Optional[List[TableMetadata]]] = {}
+        for name, schema, table in selectors:
+            if name not in databases:
+                raise NotFoundError(f"Database {name} could not be found in Metabase.")
+
+            if schema is None or name in targets and targets[name] is None:
+                targets[name] = None
+                continue
+
+            tables = [
+                t
+                for t in self.registry.tables
+                if t.database == name
+                and t.schema == schema
+                and (table is None or t.name == table)
+            ]
+            if not tables:
+                raise NotFoundError(
+                    f"No table matching {'.'.join(filter(None, [name, schema, table]))} "
+                    "could be found in Metabase."
+                )
+            selected = targets.setdefault(name, [])
+            selected.extend(t for t in tables if t not in selected)
+
+        return [(databases[name], tables) for name, tables in targets.items()]
+
+    def trigger(self, endpoint: str):
+        """Trigger an operation, which Metabase runs in the background."""
+        response = self.registry.client.post(endpoint)
+
+        if response.status_code not in (200, 202, 204):
+            raise HTTPError(response.content.decode())
+
+    def get_last_task_id(self, database: metabase.Database, task: str) -> int:
+        """Get the id of the most recent task of a database in the task history."""
+        response = self.registry.client.get(
+            "/api/task", params={"limit": self.TASK_HISTORY_LIMIT}
+        )
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        ids = [
+            t["id"]
+            for t in response.json().get("data", [])
+            if t.get("db_id") == database.id and t.get("task") == task
+        ]
+        return max(ids, default=0)
+
+    def wait(self, database: metabase.Database, task: str, after: int, deadline: float):
+        """Wait until a task of a database more recent than `after` completes."""
+        while self.get_last_task_id(database, task) <= after:
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"Task {task} of database {database.name} did not complete in time."
+                )
+            time.sleep(self.poll_interval)
+
+    def run_database(
+        self, database: metabase.Database, tables: Optional[List[TableMetadata]]
+    ) -> RescanResult:
+        started = time.monotonic()
+        deadline = started + self.timeout
+
+        try:
+            if tables is not None:
+                # Metabase doesn't record tasks for tables, they complete once triggered
+                for table in tables:
+                    for action in ("sync_schema", "rescan_values"):
+                        if getattr(self, action):
+                            self.trigger(f"/api/table/{table.id}/{action}")
+            else:
+                # field values are rescanned once the schema is synced
+                for action in ("sync_schema", "rescan_values"):
+                    if getattr(self, action):
+                        after = self.get_last_task_id(database, self.TASKS[action])
+                        self.trigger(f"/api/database/{database.id}/{action}")
+                        self.wait(database, self.TASKS[action], after, deadline)
+        except (HTTPError, TimeoutError) as e:
+            return RescanResult(
+                database=database.name,
+                tables=len(tables) if tables is not None else None,
+                duration=time.monotonic() - started,
+                error=str(e),
+            )
+
+        return RescanResult(
+            database=database.name,
+            tables=len(tables) if tables is not None else None,
+            duration=time.monotonic() - started,
+        )
+
+    def run(self) -> Iterator[RescanResult]:
+        """Rescan every selected database, yielding results as databases complete."""
+        targets = self.get_targets()
+        if not targets:
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(targets))
+        ) as pool:
+            futures = [
+                pool.submit(self.run_database, database, tables)
+                for database, tables in targets
+            ]
+            for future in as_completed(futures):
+                yield future.result()
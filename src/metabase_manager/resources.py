@@ -0,0 +1,960 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Union
+
+import metabase
+from metabase import Database, Field, Metabase, PermissionGroup, Table
+from metabase.resource import (
+    CreateResource,
+    DeleteResource,
+    ListResource,
+    Resource,
+    UpdateResource,
+)
+from requests import HTTPError
+
+from metabase_manager.mbql import hash_content, hash_definition, hash_sql
+
+# permissions of a group on the schemas of a database, i.e. "all", "none",
+# or {schema: "all" | "none" | {table: "all" | "none" | {...}}}
+SchemasPermission = Union[str, Dict[str, Union[str, Dict[str, Any]]]]
+
+
+class PermissionsGraph(Resource):
+    """Data permissions of every group on every database, with the revision it was read at."""
+
+    ENDPOINT = "/api/permissions/graph"
+    PRIMARY_KEY = None
+
+    revision: int
+    groups: Dict[str, Dict[str, Dict[str, Any]]]
+
+    @classmethod
+    def get(cls, using: Metabase) -> PermissionsGraph:
+        """Fetch the permissions graph."""
+        response = using.get(cls.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        return cls(_using=using, **response.json())
+
+    def update(self, groups: Dict[str, Dict[str, Dict[str, Any]]]) -> None:
+        """
+        Update the permissions graph. Only the groups, databases, schemas and tables
+        in `groups` are changed, the rest of the graph is left untouched.
+        """
+        response = self._using.put(
+            self.ENDPOINT, json={"revision": self.revision, "groups": groups}
+        )
+
+        if response.status_code not in (200, 202):
+            raise HTTPError(response.content.decode())
+
+        self.revision = response.json().get("revision", self.revision)
+
+
+class DataPermission(Resource):
+    """
+    Data permissions of a group on a database, read from the PermissionsGraph.
+    Tables are referred to by name rather than by id so they can be compared with the config.
+    """
+
+    ENDPOINT = None
+    PRIMARY_KEY = None
+
+    group_id: int
+    group: str
+    database_id: int
+    database: str
+    native: str
+    schemas: SchemasPermission
+    graph: PermissionsGraph
+    table_ids: Dict[str, Dict[str, int]]
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[DataPermission]:
+        """
+        List the permissions of every group on every database, from a single read of
+        the permissions graph. Databases without permissions for a group are listed as "none".
+        """
+        graph = PermissionsGraph.get(using=using)
+        groups = PermissionGroup.list(using=using)
+        databases = Database.list(using=using)
+
+        table_ids: Dict[int, Dict[str, Dict[str, int]]] = {}
+        for table in Table.list(using=using):
+            schema = table_ids.setdefault(table.db_id, {}).setdefault(table.schema, {})
+            schema[table.name] = table.id
+
+        records = []
+        for group in groups:
+            for database in databases:
+                data = (
+                    graph.groups.get(str(group.id), {})
+                    .get(str(database.id), {})
+                    .get("data", {})
+                )
+                ids = table_ids.get(database.id, {})
+                records.append(
+                    cls(
+                        _using=using,
+                        group_id=group.id,
+                        group=group.name,
+                        database_id=database.id,
+                        database=database.name,
+                        native=data.get("native", "none"),
+                        schemas=cls.rename_tables(data.get("schemas", "none"), ids),
+                        graph=graph,
+                        table_ids=ids,
+                    )
+                )
+
+        return records
+
+    @staticmethod
+    def rename_tables(
+        schemas: SchemasPermission, table_ids: Dict[str, Dict[str, int]]
+    ) -> SchemasPermission:
+        """Replace table ids by table names in the permissions of a database."""
+        if not isinstance(schemas, dict):
+            return schemas
+
+        renamed = {}
+        for schema, tables in schemas.items():
+            if isinstance(tables, dict):
+                names = {str(i): name for name, i in table_ids.get(schema, {}).items()}
+                tables = {names.get(str(t), str(t)): p for t, p in tables.items()}
+            renamed[schema] = tables
+
+        return renamed
+
+    def get_table_id(self, schema: str, table: str) -> Optional[int]:
+        return self.table_ids.get(schema, {}).get(table)
+
+
+class Collection(ListResource, CreateResource, UpdateResource):
+    """A collection, identified by its path (i.e. /Finance/Reports)."""
+
+    ENDPOINT = "/api/collection"
+
+    id: int
+    name: str
+    path: str
+    parent_id: Optional[int]
+    description: str
+    color: str
+    archived: bool
+    personal_owner_id: Optional[int]
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Collection]:
+        """
+        List every collection, including archived ones, from a single read of the
+        collection tree. Personal collections are not included.
+        """
+        response = using.get(cls.ENDPOINT + "/tree")
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        records = []
+        nodes = [(node, "", None) for node in response.json()]
+        while nodes:
+            node, parent_path, parent_id = nodes.pop()
+            if node.get("personal_owner_id") is not None:
+                continue
+
+            path = f"{parent_path}/{node['name']}"
+            records.append(
+                cls(
+                    _using=using,
+                    id=node["id"],
+                    name=node["name"],
+                    path=path,
+                    parent_id=parent_id,
+                    description=node.get("description"),
+                    color=node.get("color"),
+                    archived=node.get("archived", False),
+                    personal_owner_id=None,
+                )
+            )
+            nodes.extend(
+                (child, path, node["id"]) for child in node.get("children", [])
+            )
+
+        return records
+
+    @classmethod
+    def create(
+        cls,
+        using: Metabase,
+        name: str,
+        color: str,
+        parent_id: int = None,
+        description: str = None,
+        **kwargs,
+    ) -> Collection:
+        return super(Collection, cls).create(
+            using=using,
+            name=name,
+            color=color,
+            parent_id=parent_id,
+            description=description,
+            **kwargs,
+        )
+
+    def archive(self):
+        """Archive a collection, along with everything it contains."""
+        return self.update(archived=True)
+
+
+class CollectionGraph(Resource):
+    """Permissions of every group on every collection, with the revision it was read at."""
+
+    ENDPOINT = "/api/collection/graph"
+    PRIMARY_KEY = None
+
+    revision: int
+    groups: Dict[str, Dict[str, str]]
+
+    @classmethod
+    def get(cls, using: Metabase) -> CollectionGraph:
+        """Fetch the collection permissions graph."""
+        response = using.get(cls.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        return cls(_using=using, **response.json())
+
+    def update(self, groups: Dict[str, Dict[str, str]]) -> None:
+        """
+        Update the collection permissions graph. Only the groups and collections
+        in `groups` are changed, the rest of the graph is left untouched.
+        """
+        response = self._using.put(
+            self.ENDPOINT, json={"revision": self.revision, "groups": groups}
+        )
+
+        if response.status_code not in (200, 202):
+            raise HTTPError(response.content.decode())
+
+        self.revision = response.json().get("revision", self.revision)
+
+
+class CollectionPermission(Resource):
+    """
+    Permissions of a group on a collection, read from the CollectionGraph.
+    Only permissions other than "none" are listed.
+    """
+
+    ENDPOINT = None
+    PRIMARY_KEY = None
+
+    # path of the root collection, which has no id in the collection graph
+    ROOT = "/"
+
+    group_id: int
+    group: str
+    collection_id: Union[int, str]
+    collection: str
+    access: str
+    graph: CollectionGraph
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[CollectionPermission]:
+        graph = CollectionGraph.get(using=using)
+        groups = {str(group.id): group for group in PermissionGroup.list(using=using)}
+        paths = {str(c.id): c.path for c in Collection.list(using=using)}
+        paths["root"] = cls.ROOT
+
+        records = []
+        for group_id, collections in graph.groups.items():
+            for collection_id, access in collections.items():
+                if access == "none" or group_id not in groups:
+                    continue
+                if collection_id not in paths:
+                    # i.e. personal collections
+                    continue
+
+                records.append(
+                    cls(
+                        _using=using,
+                        group_id=groups[group_id].id,
+                        group=groups[group_id].name,
+                        collection_id=collection_id,
+                        collection=paths[collection_id],
+                        access=access,
+                        graph=graph,
+                    )
+                )
+
+        return records
+
+
+class TableMetadata(Table):
+    """A table, along with its fields, read from the metadata of its database."""
+
+    # maximum number of databases whose metadata is fetched concurrently
+    MAX_WORKERS = 8
+
+    database: str
+    fields: List[FieldMetadata]
+
+    @property
+    def key(self) -> str:
+        """Name of the table, including its database and schema (i.e. Warehouse.public.orders)."""
+        return f"{self.database}.{self.schema}.{self.name}"
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[TableMetadata]:
+        """
+        List every table of every database, including hidden ones. The metadata of each
+        database is read in a single request, and databases are read concurrently.
+        """
+        databases = Database.list(using=using)
+        if not databases:
+            return []
+
+        with ThreadPoolExecutor(
+            max_workers=min(cls.MAX_WORKERS, len(databases))
+        ) as pool:
+            metadata = pool.map(
+                lambda database: cls.get_metadata(database.id, using=using), databases
+            )
+
+        return [
+            cls.from_metadata(table, database=database["name"], using=using)
+            for database in metadata
+            for table in database.get("tables", [])
+        ]
+
+    @staticmethod
+    def get_metadata(database_id: int, using: Metabase) -> Dict[str, Any]:
+        response = using.get(
+            f"/api/database/{database_id}/metadata", params={"include_hidden": "true"}
+        )
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        return response.json()
+
+    @classmethod
+    def from_metadata(
+        cls, table: Dict[str, Any], database: str, using: Metabase
+    ) -> TableMetadata:
+        table = {**table, "database": database}
+        table["fields"] = [
+            FieldMetadata(
+                _using=using,
+                **{
+                    **field,
+                    "database": database,
+                    "schema": table.get("schema"),
+                    "table": table["name"],
+                },
+            )
+            for field in table.get("fields", [])
+        ]
+
+        return cls(_using=using, **table)
+
+    @classmethod
+    def update_many(cls, using: Metabase, ids: List[int], **kwargs) -> None:
+        """Apply the same changes to several tables in a single request."""
+        response = using.put(cls.ENDPOINT, json={"ids": ids, **kwargs})
+
+        if response.status_code not in (200, 202):
+            raise HTTPError(response.content.decode())
+
+
+class FieldMetadata(Field):
+    """A field, read from the metadata of its database. See TableMetadata."""
+
+    database: str
+    schema: Optional[str]
+    table: str
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[FieldMetadata]:
+        return [field for table in TableMetadata.list(using) for field in table.fields]
+
+    def update(self, **kwargs) -> None:
+        """Update only the given attributes of a field."""
+        return super(Field, self).update(**kwargs)
+
+
+class TableDefinition(ListResource):
+    """
+    Base class for definitions on a table, i.e. segments and metrics. Definitions are listed
+    along with the name of their table, and the hash of their normalized definition.
+    """
+
+    table: str
+    definition_hash: str
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[TableDefinition]:
+        """List every definition in a single request, and every table in another."""
+        tables = {
+            table.id: f"{table.db['name']}.{table.schema}.{table.name}"
+            for table in Table.list(using=using)
+        }
+
+        records = super(TableDefinition, cls).list(using=using)
+        for record in records:
+            record.table = tables.get(record.table_id)
+            record.definition_hash = cls.hash_definition(record.definition)
+
+        return records
+
+    @staticmethod
+    def hash_definition(definition: Dict[str, Any]) -> str:
+        # the table is already part of the key of a definition
+        definition = {
+            k: v
+            for k, v in (definition or {}).items()
+            if k not in ("source-table", "source_table")
+        }
+        return hash_definition(definition)
+
+
+class Segment(TableDefinition, metabase.Segment):
+    """A segment, identified by its table and name."""
+
+
+class Metric(TableDefinition, metabase.Metric):
+    """A metric, identified by its table and name."""
+
+
+class Card(metabase.Card):
+    """A card (question), identified by its collection and name, or by its entity id."""
+
+    collection_path: Optional[str]
+    content_hash: str
+    # only returned by versions of Metabase that support serialization
+    entity_id: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Path of the collection of the card, and its name (i.e. /Finance:Revenue)."""
+        return f"{self.collection_path}:{self.name}"
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Card]:
+        """
+        List every card that isn't archived in a single request, along with the path of
+        its collection, and hash its content. Cards in personal collections have no path.
+        """
+        paths = {c.id: c.path for c in Collection.list(using=using)}
+        paths[None] = CollectionPermission.ROOT
+
+        records = super(Card, cls).list(using=using)
+        for record in records:
+            record.collection_path = paths.get(record.collection_id)
+            record.content_hash = cls.hash_content(
+                name=record.name,
+                collection=record.collection_path,
+                description=record.description,
+                display=record.display,
+                dataset_query=record.dataset_query,
+                visualization_settings=record.visualization_settings,
+            )
+
+        return records
+
+    @staticmethod
+    def hash_content(
+        name: str,
+        collection: Optional[str],
+        description: Optional[str],
+        display: str,
+        dataset_query: Dict[str, Any],
+        visualization_settings: Dict[str, Any],
+    ) -> str:
+        """Hash everything that is managed about a card, with its query normalized."""
+        return hash_content(
+            {
+                "name": name,
+                "collection": collection,
+                "description": description,
+                "display": display,
+                "dataset_query": hash_definition(dataset_query),
+                "visualization_settings": visualization_settings,
+            }
+        )
+
+    def update(self, **kwargs) -> None:
+        """Update only the given attributes of a card."""
+        return super(metabase.Card, self).update(**kwargs)
+
+    def archive(self):
+        return self.update(archived=True)
+
+
+class Dashboard(ListResource, CreateResource, UpdateResource):
+    """A dashboard, identified by its collection and name, or by its entity id."""
+
+    ENDPOINT = "/api/dashboard"
+    # maximum number of dashboards whose cards are fetched concurrently
+    MAX_WORKERS = 8
+    # attributes of the cards of a dashboard that are managed
+    DASHCARD_ATTRIBUTES = (
+        "card_id",
+        "row",
+        "col",
+        "size_x",
+        "size_y",
+        "parameter_mappings",
+        "visualization_settings",
+    )
+
+    id: int
+    name: str
+    description: Optional[str]
+    collection_id: Optional[int]
+    collection_path: Optional[str]
+    parameters: List[Dict[str, Any]]
+    dashcards: List[Dict[str, Any]]
+    archived: bool
+    content_hash: str
+    dashcards_hash: str
+
+    @property
+    def key(self) -> str:
+        """Path of the collection of the dashboard, and its name (i.e. /Finance:Revenue)."""
+        return f"{self.collection_path}:{self.name}"
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Dashboard]:
+        """
+        List every dashboard that isn't archived, along with its cards. Metabase only
+        returns the cards of a dashboard one dashboard at a time, so dashboards are
+        fetched concurrently.
+        """
+        paths = {c.id: c.path for c in Collection.list(using=using)}
+        paths[None] = CollectionPermission.ROOT
+
+        response = using.get(cls.ENDPOINT)
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        ids = [d["id"] for d in response.json() if not d.get("archived")]
+        if not ids:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(cls.MAX_WORKERS, len(ids))) as pool:
+            records = list(pool.map(lambda i: cls.get(i, using=using), ids))
+
+        for record in records:
+            record.collection_path = paths.get(record.collection_id)
+            record.content_hash = cls.hash_content(
+                name=record.name,
+                collection=record.collection_path,
+                description=record.description,
+                parameters=record.parameters,
+            )
+            record.dashcards_hash = cls.hash_dashcards(record.dashcards)
+
+        return records
+
+    @classmethod
+    def get(cls, id: int, using: Metabase) -> Dashboard:
+        response = using.get(cls.ENDPOINT + f"/{id}")
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        dashboard = response.json()
+        # older versions of Metabase call them ordered_cards
+        dashboard.setdefault("dashcards", dashboard.pop("ordered_cards", []))
+        return cls(_using=using, **dashboard)
+
+    @staticmethod
+    def hash_content(
+        name: str,
+        collection: Optional[str],
+        description: Optional[str],
+        parameters: List[Dict[str, Any]],
+    ) -> str:
+        return hash_content(
+            {
+                "name": name,
+                "collection": collection,
+                "description": description,
+                "parameters": parameters,
+            }
+        )
+
+    @classmethod
+    def hash_dashcards(cls, dashcards: List[Dict[str, Any]]) -> str:
+        """Hash the cards of a dashboard, regardless of their order."""
+        return hash_content(
+            sorted(
+                (
+                    {k: dashcard.get(k) for k in cls.DASHCARD_ATTRIBUTES}
+                    for dashcard in dashcards
+                ),
+                key=lambda d: (d["row"] or 0, d["col"] or 0, d["card_id"] or 0),
+            )
+        )
+
+    def update(self, **kwargs) -> None:
+        """Update only the given attributes of a dashboard."""
+        return super(Dashboard, self).update(**kwargs)
+
+    def update_dashcards(self, dashcards: List[Dict[str, Any]]) -> None:
+        """
+        Replace the cards of a dashboard in a single request. Cards of the dashboard are
+        reused by card, new ones are given negative ids.
+        """
+        existing = {}
+        for dashcard in self.dashcards:
+            existing.setdefault(dashcard["card_id"], []).append(dashcard["id"])
+
+        cards = []
+        for i, dashcard in enumerate(dashcards, start=1):
+            ids = existing.get(dashcard["card_id"])
+            cards.append({"id": ids.pop(0) if ids else -i, **dashcard})
+
+        response = self._using.put(
+            self.ENDPOINT + f"/{self.id}/cards", json={"cards": cards}
+        )
+
+        if response.status_code not in (200, 202):
+            raise HTTPError(response.content.decode())
+
+        self.dashcards = cards
+
+    def archive(self):
+        return self.update(archived=True)
+
+
+class Setting(ListResource):
+    """A site setting (i.e. site-name), identified by its key."""
+
+    ENDPOINT = "/api/setting"
+    PRIMARY_KEY = "key"
+
+    # prefix of the values of sensitive settings (i.e. passwords), obfuscated by Metabase
+    OBFUSCATED = "**********"
+
+    key: str
+    value: Any
+    default: Any
+    is_env_setting: bool
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Setting]:
+        """List every setting in a single request."""
+        response = using.get(cls.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        return [cls(_using=using, **record) for record in response.json()]
+
+    @classmethod
+    def update_many(cls, using: Metabase, values: Dict[str, Any]) -> None:
+        """Update several settings in a single request."""
+        response = using.put(cls.ENDPOINT, json=values)
+
+        if response.status_code not in (200, 204):
+            raise HTTPError(response.content.decode())
+
+    @property
+    def is_redacted(self) -> bool:
+        """Whether the value is obfuscated by Metabase, and can't be compared."""
+        return isinstance(self.value, str) and self.value.startswith(self.OBFUSCATED)
+
+
+class CachePolicy(Resource):
+    """
+    Query caching policy of the whole instance (root), or the cache TTL of a database,
+    dashboard or card, identified by its model and name.
+    """
+
+    ENDPOINT = None
+    PRIMARY_KEY = None
+
+    # settings of the root policy, by attribute
+    ROOT_SETTINGS = {
+        "enabled": "enable-query-caching",
+        "ttl_ratio": "query-caching-ttl-ratio",
+        "min_duration": "query-caching-min-ttl",
+        "max_kb": "query-caching-max-kb",
+        "max_ttl": "query-caching-max-ttl",
+    }
+    # endpoints of the objects with a cache TTL, by model
+    ENDPOINTS = {
+        "database": "/api/database",
+        "dashboard": "/api/dashboard",
+        "card": "/api/card",
+    }
+
+    model: str
+    model_id: Optional[int]
+    # name of the database, or collection path and name of the dashboard or card
+    name: Optional[str]
+    # hours
+    ttl: Optional[int]
+    enabled: Optional[bool]
+    ttl_ratio: Optional[int]
+    min_duration: Optional[int]
+    max_kb: Optional[int]
+    max_ttl: Optional[int]
+
+    @property
+    def key(self) -> str:
+        return self.model if self.model == "root" else f"{self.model}:{self.name}"
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[CachePolicy]:
+        """
+        List the root policy, and the policy of every database, dashboard and card,
+        with a single request per model. Objects without a cache TTL have a ttl of None.
+        """
+        settings = {s.key: s for s in Setting.list(using=using)}
+        root = {
+            attribute: settings[key].value
+            if settings[key].value is not None
+            else settings[key].default
+            for attribute, key in cls.ROOT_SETTINGS.items()
+            if key in settings
+        }
+        records = [
+            cls(_using=using, model="root", model_id=None, name=None, ttl=None, **root)
+        ]
+
+        records.extend(
+            cls(
+                _using=using,
+                model="database",
+                model_id=database.id,
+                name=database.name,
+                ttl=getattr(database, "cache_ttl", None),
+            )
+            for database in Database.list(using=using)
+        )
+
+        paths = {c.id: c.path for c in Collection.list(using=using)}
+        paths[None] = CollectionPermission.ROOT
+        for model in ("dashboard", "card"):
+            response = using.get(cls.ENDPOINTS[model])
+
+            if response.status_code != 200:
+                raise HTTPError(response.content.decode())
+
+            records.extend(
+                cls(
+                    _using=using,
+                    model=model,
+                    model_id=record["id"],
+                    name=f"{paths[record.get('collection_id')]}:{record['name']}",
+                    ttl=record.get("cache_ttl"),
+                )
+                for record in response.json()
+                # objects in personal collections can't be declared
+                if not record.get("archived") and record.get("collection_id") in paths
+            )
+
+        return records
+
+    def update(self, **kwargs) -> None:
+        """Update the settings of the root policy, or the cache TTL of an object."""
+        if self.model == "root":
+            Setting.update_many(
+                using=self._using,
+                values={self.ROOT_SETTINGS[k]: v for k, v in kwargs.items()},
+            )
+        else:
+            response = self._using.put(
+                self.ENDPOINTS[self.model] + f"/{self.model_id}",
+                json={"cache_ttl": kwargs["ttl"]},
+            )
+
+            if response.status_code not in (200, 202):
+                raise HTTPError(response.content.decode())
+
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+
+
+class Sandbox(ListResource, CreateResource, UpdateResource, DeleteResource):
+    """
+    A sandbox (group table access policy), restricting the rows of a table a group can see,
+    identified by its group and table.
+    """
+
+    ENDPOINT = "/api/mt/gtap"
+
+    id: int
+    group_id: int
+    group: Optional[str]
+    table_id: int
+    table: Optional[str]
+    card_id: Optional[int]
+    # user attribute -> target, i.e. {"region": ["dimension", ["field", 10, None]]}
+    attribute_remappings: Dict[str, Any]
+
+    @property
+    def key(self) -> str:
+        """Name of the group and key of the table (i.e. Finance:Warehouse.public.orders)."""
+        return f"{self.group}:{self.table}"
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Sandbox]:
+        """List every sandbox in a single request, along with the names of their group and table."""
+        groups = {g.id: g.name for g in PermissionGroup.list(using=using)}
+        tables = {
+            table.id: f"{table.db['name']}.{table.schema}.{table.name}"
+            for table in Table.list(using=using)
+        }
+
+        response = using.get(cls.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        records = [cls(_using=using, **record) for record in response.json()]
+        for record in records:
+            record.group = groups.get(record.group_id)
+            record.table = tables.get(record.table_id)
+            record.attribute_remappings = record.attribute_remappings or {}
+
+        return records
+
+    def update(self, **kwargs) -> None:
+        """Update only the given attributes of a sandbox."""
+        return super(Sandbox, self).update(**kwargs)
+
+
+class Subscription(ListResource, CreateResource, UpdateResource):
+    """
+    A dashboard subscription (pulse) sent by email, identified by its dashboard and name.
+    Subscriptions are read along with the key of their dashboard, and their recipients and schedule.
+    """
+
+    ENDPOINT = "/api/pulse"
+    # attributes of the schedule of a channel
+    SCHEDULE_ATTRIBUTES = (
+        "schedule_type",
+        "schedule_hour",
+        "schedule_day",
+        "schedule_frame",
+    )
+
+    id: int
+    name: str
+    dashboard_id: int
+    dashboard: Optional[str]
+    channels: List[Dict[str, Any]]
+    archived: bool
+    recipients: Set[str]
+    schedule: Dict[str, Any]
+
+    @property
+    def key(self) -> str:
+        """Key of the dashboard, and name of the subscription (i.e. /Finance:Revenue:Weekly)."""
+        return f"{self.dashboard}:{self.name}"
+
+    @property
+    def channel(self) -> Optional[Dict[str, Any]]:
+        """The email channel of the subscription, if any."""
+        return next(
+            (c for c in self.channels if c.get("channel_type") == "email"), None
+        )
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Subscription]:
+        """
+        List every dashboard subscription that isn't archived in a single request,
+        and the dashboards they belong to in another.
+        """
+        paths = {c.id: c.path for c in Collection.list(using=using)}
+        paths[None] = CollectionPermission.ROOT
+
+        response = using.get(Dashboard.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        dashboards = {
+            d["id"]: f"{paths.get(d.get('collection_id'))}:{d['name']}"
+            for d in response.json()
+        }
+
+        response = using.get(cls.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        records = []
+        for record in response.json():
+            # alerts on cards don't belong to a dashboard
+            if record.get("dashboard_id") is None or record.get("archived"):
+                continue
+
+            subscription = cls(_using=using, **record)
+            subscription.dashboard = dashboards.get(subscription.dashboard_id)
+            channel = subscription.channel or {}
+            subscription.recipients = {
+                r["email"].lower() for r in channel.get("recipients", [])
+            }
+            subscription.schedule = {k: channel.get(k) for k in cls.SCHEDULE_ATTRIBUTES}
+            records.append(subscription)
+
+        return records
+
+    def update(self, **kwargs) -> None:
+        """Update only the given attributes of a subscription."""
+        return super(Subscription, self).update(**kwargs)
+
+    def archive(self):
+        return self.update(archived=True)
+
+
+class Snippet(ListResource, CreateResource, UpdateResource):
+    """A snippet of native query, identified by its name."""
+
+    ENDPOINT = "/api/native-query-snippet"
+
+    id: int
+    name: str
+    content: str
+    description: Optional[str]
+    archived: bool
+    content_hash: str
+
+    @classmethod
+    def list(cls, using: Metabase) -> List[Snippet]:
+        """
+        List every snippet once, and hash their content. Archived snippets are listed as
+        well (in a second request), since their names can't be reused.
+        """
+        response = using.get(cls.ENDPOINT, params={"archived": "true"})
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+        archived = response.json()
+
+        response = using.get(cls.ENDPOINT)
+
+        if response.status_code != 200:
+            raise HTTPError(response.content.decode())
+
+        records = [cls(_using=using, **record) for record in response.json() + archived]
+        for record in records:
+            record.content_hash = hash_sql(record.content)
+
+        return records
+
+    def update(self, **kwargs) -> None:
+        """Update only the given attributes of a snippet."""
+        return super(Snippet, self).update(**kwargs)
+
+    def archive(self):
+        return self.update(archived=True)
@@ -0,0 +1,255 @@
+import json
+import time
+from copy import deepcopy
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import yaml
+
+from metabase_manager.exceptions import InvalidConfigError
+from metabase_manager.manager import MetabaseManager
+from metabase_manager.parser import MetabaseParser
+
+# errors of files that can't be read (i.e. while being replaced) or parsed (i.e.
+# unexpected keys or attributes)
+CONFIG_ERRORS = (InvalidConfigError, KeyError, OSError, TypeError, yaml.YAMLError)
+
+
+@dataclass
+class Reconciler:
+    """
+    Keep Metabase in sync with config files. The manager (and so its client and registry)
+    is kept across syncs, and files are read again only once they change. A change syncs
+    the keys that changed along with the keys depending on them, while every selected
+    key is synced every `interval` seconds to correct drift.
+    """
+
+    manager: MetabaseManager
+    paths: List[str]
+    # seconds between syncs of every selected key
+    interval: float = 300.0
+    # seconds between checks for changed files
+    poll: float = 0.5
+    delete: bool = True
+
+    # (modification time, size) and content of every file last parsed
+    _files: Dict[str, Tuple[Tuple[int, int], dict]] = field(
+        default_factory=dict, repr=False
+    )
+    # (modification time, size) of files that couldn't be parsed, None if not found
+    _invalid: Dict[str, Optional[Tuple[int, int]]] = field(default=None, repr=False)
+    _lock: Lock = field(default_factory=Lock, repr=False)
+    _trigger: Event = field(default_factory=Event, repr=False)
+    _stop: Event = field(default_factory=Event, repr=False)
+    _status: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        # exclusions of the manager, extended while syncing changed keys
+        self.exclude = list(self.manager.exclude)
+        self._status = {"running": False, "last": None}
+
+    @property
+    def status(self) -> Dict[str, Any]:
+        """Whether a sync is running, and the outcome of the last one."""
+        return dict(self._status)
+
+    def load(self) -> Optional[Set[str]]:
+        """
+        Parse the config again if any file changed, reading only the files that changed.
+        Returns the keys whose objects changed, or None if no file changed.
+        """
+        versions = {}
+        for path in self.paths:
+            try:
+                stat = Path(path).stat()
+                versions[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                # i.e. deleted or renamed, reported once when reading it below
+                versions[path] = None
+
+        if versions == {p: v for p, (v, _) in self._files.items()}:
+            return None
+        if versions == self._invalid:
+            # already reported, wait for the next change
+            return None
+
+        config = MetabaseParser()
+        try:
+            files = {
+                path: self._files[path]
+                if path in self._files and self._files[path][0] == version
+                else (version, MetabaseParser.load_yaml(path) or {})
+                for path, version in versions.items()
+            }
+            for _, loaded in files.values():
+                # entities may consume their definition, which is kept to be compared
+                config.parse_yaml(deepcopy(loaded))
+            config.validate()
+        except CONFIG_ERRORS:
+            self._invalid = versions
+            raise
+
+        keys = set()
+        for path in set(files) | set(self._files):
+            old = self._files.get(path, (None, {}))[1]
+            new = files.get(path, (None, {}))[1]
+            keys.update(k for k in set(old) | set(new) if old.get(k) != new.get(k))
+
+        self._files, self._invalid = files, None
+        self.manager.config = config
+        return keys
+
+    def get_keys(self, changed: Optional[Set[str]] = None) -> List[str]:
+        """
+        Get the selected keys to sync, restricted to the keys that changed and the keys
+        depending on them (i.e. users when members of groups change), if given.
+        """
+        keys = self.manager.get_selected_keys()
+
+        if changed is None:
+            return keys
+
+        affected = set()
+        for key in changed & set(keys):
+            affected.update(self.manager.resolve_selector(f"{key}+"))
+        return [key for key in keys if key in affected]
+
+    def reconcile(self, changed: Optional[Set[str]] = None, trigger: str = "interval"):
+        """Sync the keys that changed, or every selected key."""
+        with self._lock:
+            keys = self.get_keys(changed)
+            if not keys:
+                return None
+
+            self.log(f"[SYNC] {', '.join(keys)} ({trigger})")
+            # other keys are excluded, so that selectors keep their meaning (i.e. explicit
+            # selections, see MetabaseManager.get_explicit_keys())
+            skipped = [key for key in self.get_keys() if key not in keys]
+            self.manager.exclude = self.exclude + skipped
+            self._status["running"] = True
+
+            started = time.time()
+            result, error = None, None
+            try:
+                result = self.manager.sync(delete=self.delete)
+            except Exception as e:
+                error = str(e)
+                self.log(f"[ERROR] {error}")
+            finally:
+                self.manager.exclude = self.exclude
+                if self.manager.reporter is not None:
+                    self.manager.reporter.flush()
+
+            self._status = {
+                "running": False,
+                "last": {
+                    "trigger": trigger,
+                    "keys": keys,
+                    "started": started,
+                    "duration": time.time() - started,
+                    "counts": result.counts if result else {},
+                    "requests": result.requests if result else 0,
+                    "errors": [
+                        {
+                            "type": e.type,
+                            "key": e.key,
+                            "action": e.action,
+                            "error": e.error,
+                        }
+                        for e in (result.errors if result else [])
+                    ],
+                    "error": error,
+                },
+            }
+            return result
+
+    def log(self, message: str):
+        self.manager.log(message)
+        if self.manager.reporter is not None:
+            self.manager.reporter.flush()
+
+    def trigger(self):
+        """Sync every selected key as soon as possible."""
+        self._trigger.set()
+
+    def stop(self):
+        self._stop.set()
+        self._trigger.set()
+
+    def run(self):
+        """Sync every selected key, then on every change and every `interval` seconds."""
+        self.load()
+        self.reconcile(trigger="start")
+        deadline = time.monotonic() + self.interval
+
+        while not self._stop.is_set():
+            triggered = self._trigger.wait(timeout=self.poll)
+            if self._stop.is_set():
+                return
+
+            try:
+                changed = self.load()
+            except CONFIG_ERRORS as e:
+                self.log(f"[ERROR] Invalid config, not synced: {e}")
+                changed = None
+
+            if triggered or time.monotonic() >= deadline:
+                self._trigger.clear()
+                self.reconcile(trigger="request" if triggered else "interval")
+                deadline = time.monotonic() + self.interval
+            elif changed:
+                self.reconcile(changed, trigger="change")
+
+    def serve(self, address: str = "127.0.0.1", port: int = 8080):
+        """Run, along with an HTTP server to trigger syncs and read their status."""
+        server = ThreadingHTTPServer((address, port), StatusHandler)
+        server.reconciler = self
+
+        thread = Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            self.run()
+        finally:
+            server.shutdown()
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """
+    GET /status returns the outcome of the last sync, GET /metrics the metrics of
+    every sync, and POST /sync syncs every selected key as soon as possible.
+    """
+
+    def send_json(self, status: int, body: dict):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            metrics = self.server.reconciler.manager.client.metrics
+            content = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        elif self.path == "/status":
+            self.send_json(200, self.server.reconciler.status)
+        else:
+            self.send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != "/sync":
+            return self.send_json(404, {"error": "Not found"})
+        self.server.reconciler.trigger()
+        self.send_json(202, {"triggered": True})
+
+    def log_message(self, format, *args):
+        # requests aren't logged along with syncs
+        pass
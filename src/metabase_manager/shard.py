@@ -0,0 +1,37 @@
+import zlib
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Shard:
+    """One of `count` partitions of the objects to sync, identified by its `index`."""
+
+    index: int
+    count: int
+
+    def __post_init__(self):
+        if self.count < 1 or not 0 <= self.index < self.count:
+            raise ValueError(
+                f"Invalid shard {self.index}/{self.count}, expected 0 <= i < N."
+            )
+
+    @classmethod
+    def parse(cls, value: str) -> "Shard":
+        """Create a Shard from a string formatted as 'i/N' (i.e. 0/4)."""
+        try:
+            index, count = value.split("/")
+            return cls(index=int(index), count=int(count))
+        except ValueError as e:
+            raise ValueError(f"Invalid shard '{value}', expected format 'i/N'.") from e
+
+    @property
+    def is_leader(self) -> bool:
+        """The first shard also syncs objects that are not partitioned (i.e. groups)."""
+        return self.index == 0
+
+    def contains(self, key: str) -> bool:
+        """
+        Whether an object belongs to this shard. Uses a stable hash of its key so that
+        every process assigns the same objects to the same shard.
+        """
+        return zlib.crc32(key.encode("utf-8")) % self.count == self.index
@@ -0,0 +1,111 @@
+import time
+from dataclasses import dataclass, field
+from threading import Condition
+from typing import Optional
+
+
+@dataclass
+class AdaptiveLimiter:
+    """
+    Limit the number of concurrent requests to a Metabase host using AIMD (additive increase,
+    multiplicative decrease): the limit grows by one request per window of successful requests,
+    and is halved when Metabase responds slowly or asks clients to back off (429, 503).
+    """
+
+    CONGESTION_STATUS_CODES = (429, 502, 503, 504)
+
+    # maximum number of concurrent requests
+    ceiling: int = 8
+    # maximum number of requests started per second, unlimited if None
+    max_rps: Optional[float] = None
+    # responses slower than this many seconds are treated as a sign of congestion, never if
+    # None (i.e. for queries that are expected to be slow)
+    latency_threshold: Optional[float] = 2.0
+    # number of concurrent requests allowed before any response is received
+    initial_limit: float = 1.0
+
+    limit: float = field(default=1.0, init=False)
+    in_flight: int = field(default=0, init=False)
+    requests: int = field(default=0, init=False)
+    throttled: int = field(default=0, init=False)
+    total_latency: float = field(default=0.0, init=False)
+    # exponentially weighted moving average of the latency of recent requests
+    recent_latency: Optional[float] = field(default=None, init=False)
+
+    _condition: Condition = field(default_factory=Condition, init=False, repr=False)
+    _next_start: float = field(default=0.0, init=False, repr=False)
+    _last_decrease: float = field(default=0.0, init=False, repr=False)
+    _first_start: Optional[float] = field(default=None, init=False, repr=False)
+    _last_end: Optional[float] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.limit = float(min(self.initial_limit, self.ceiling))
+
+    @property
+    def mean_latency(self) -> Optional[float]:
+        """Mean latency of the requests completed so far, in seconds."""
+        if not self.requests:
+            return None
+        return self.total_latency / self.requests
+
+    @property
+    def rate(self) -> float:
+        """Average number of requests per second since the first request."""
+        if not self.requests or self._last_end == self._first_start:
+            return 0.0
+        return self.requests / (self._last_end - self._first_start)
+
+    def acquire(self) -> float:
+        """Wait until a request can be sent, and return the time it started at."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            if self.max_rps:
+                self._next_start = start + 1 / self.max_rps
+
+        if start > now:
+            time.sleep(start - now)
+
+        with self._condition:
+            if self._first_start is None:
+                self._first_start = start
+
+        return start
+
+    def release(self, started: float, status_code: Optional[int]):
+        """Record the outcome of a request started with acquire() and adjust the limit."""
+        now = time.monotonic()
+        latency = now - started
+
+        with self._condition:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_latency += latency
+            if self.recent_latency is None:
+                self.recent_latency = latency
+            else:
+                self.recent_latency = 0.8 * self.recent_latency + 0.2 * latency
+            self._last_end = now
+
+            if (
+                status_code is None
+                or status_code in self.CONGESTION_STATUS_CODES
+                or (
+                    self.latency_threshold is not None
+                    and latency > self.latency_threshold
+                )
+            ):
+                if status_code in (429, 503):
+                    self.throttled += 1
+                # requests that were already in flight at the last decrease don't count
+                if started > self._last_decrease:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.ceiling), self.limit + 1 / int(self.limit))
+
+            self._condition.notify_all()
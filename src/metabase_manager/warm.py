@@ -0,0 +1,182 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from threading import Lock, Semaphore
+from typing import Dict, Iterator, List, Optional
+
+from requests import HTTPError
+
+from metabase_manager.exceptions import NotFoundError
+from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.resources import Card
+from metabase_manager.throttle import AdaptiveLimiter
+
+
+@dataclass
+class WarmResult:
+    """Outcome of running the query of a card."""
+
+    card: str
+    duration: float
+    error: Optional[str] = None
+    # whether the card was skipped because the time budget ran out
+    skipped: bool = False
+
+
+@dataclass
+class Warm:
+    """
+    Run the queries of cards so that their results are cached, with at most `max_concurrency`
+    queries in progress at once and `max_per_database` on any database.
+    """
+
+    registry: MetabaseRegistry
+    # collection paths (i.e. /Finance), or keys of cards or dashboards (i.e. /Finance:Revenue)
+    select: List[str] = field(default_factory=list)
+    max_concurrency: int = 4
+    max_per_database: int = 2
+    # seconds after which queries that haven't started are skipped, if any
+    budget: Optional[float] = None
+
+    _semaphores: Dict[Optional[int], Semaphore] = field(
+        default_factory=dict, repr=False
+    )
+    _lock: Lock = field(default_factory=Lock, repr=False)
+
+    @staticmethod
+    def is_path(selector: str) -> bool:
+        """Whether a selector is a collection path rather than the key of a card or dashboard."""
+        return ":" not in selector
+
+    def get_targets(self) -> List[Card]:
+        """Get the cards to warm, in the order they were selected."""
+        keys = [s for s in self.select if not self.is_path(s)]
+
+        self.registry.cache(select=["cards"])
+        cards = self.registry.get_index("cards", "key")
+        if any(key not in cards for key in keys):
+            # only dashboards are read one by one, so they are only read when selected
+            self.registry.cache(select=["dashboards"])
+        dashboards = self.registry.get_index("dashboards", "key")
+        ids = self.registry.get_index("cards", "id")
+
+        targets = []
+        for selector in self.select:
+            if self.is_path(selector):
+                path = selector.rstrip("/")
+                selected = [
+                    card
+                    for card in self.registry.cards
+                    if card.collection_path is not None
+                    and (card.collection_path + "/").startswith(path + "/")
+                ]
+            elif selector in cards:
+                selected = [cards[selector]]
+            elif selector in dashboards:
+                selected = [
+                    ids[dashcard["card_id"]]
+                    for dashcard in dashboards[selector].dashcards
+                    if dashcard.get("card_id") in ids
+                ]
+            else:
+                raise NotFoundError(
+                    f"No card or dashboard {selector} could be found in Metabase."
+                )
+
+            targets.extend(card for card in selected if card not in targets)
+
+        return targets
+
+    @staticmethod
+    def get_database_id(card: Card) -> Optional[int]:
+        return getattr(card, "database_id", None) or (card.dataset_query or {}).get(
+            "database"
+        )
+
+    @classmethod
+    def interleave(cls, cards: List[Card]) -> List[Card]:
+        """
+        Alternate between databases, so that workers aren't all waiting on the same
+        database while queries could run on others.
+        """
+        databases: Dict[Optional[int], List[Card]] = {}
+        for card in cards:
+            databases.setdefault(cls.get_database_id(card), []).append(card)
+
+        return [
+            card
+            for row in zip_longest(*databases.values())
+            for card in row
+            if card is not None
+        ]
+
+    def get_semaphore(self, database_id: Optional[int]) -> Semaphore:
+        with self._lock:
+            return self._semaphores.setdefault(
+                database_id, Semaphore(self.max_per_database)
+            )
+
+    @staticmethod
+    def get_limiter(max_concurrency: int) -> AdaptiveLimiter:
+        """
+        Get a limiter for a client running queries: queries are slow by nature, so slow
+        responses aren't taken as congestion, and every worker can send a query at once.
+        """
+        return AdaptiveLimiter(
+            ceiling=max_concurrency,
+            latency_threshold=None,
+            initial_limit=max_concurrency,
+        )
+
+    def query(self, card: Card) -> float:
+        """
+        Run the query of a card, through the cache if Metabase caches its results, and get
+        the seconds it took once sent.
+        """
+        response = self.registry.client.post(f"/api/card/{card.id}/query")
+
+        if response.status_code not in (200, 202):
+            raise HTTPError(response.content.decode(), response=response)
+
+        # failed queries are returned with a success status
+        if response.json().get("status") == "failed":
+            raise HTTPError(
+                response.json().get("error", "Query failed."), response=response
+            )
+
+        return response.latency
+
+    def run_card(self, card: Card, deadline: Optional[float]) -> WarmResult:
+        with self.get_semaphore(self.get_database_id(card)):
+            if deadline is not None and time.monotonic() > deadline:
+                return WarmResult(card=card.key, duration=0.0, skipped=True)
+
+            try:
+                duration = self.query(card)
+            except HTTPError as e:
+                return WarmResult(
+                    card=card.key, duration=e.response.latency, error=str(e)
+                )
+
+            return WarmResult(card=card.key, duration=duration)
+
+    def run(self) -> Iterator[WarmResult]:
+        """Warm every selected card, yielding results as queries complete."""
+        targets = self.get_targets()
+        if not targets:
+            return
+
+        deadline = None
+        if self.budget is not None:
+            deadline = time.monotonic() + self.budget
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(targets))
+        ) as pool:
+            futures = [
+                pool.submit(self.run_card, card, deadline)
+                for card in self.interleave(targets)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,83 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from metabase_manager.client import MetabaseClient
+from metabase_manager.throttle import AdaptiveLimiter
+
+
+class MetabaseClientTests(TestCase):
+    def setUp(self) -> None:
+        self.client = MetabaseClient(
+            host="https://example.com",
+            user=None,
+            password=None,
+            token="token",
+            limiter=AdaptiveLimiter(ceiling=4),
+        )
+
+    @staticmethod
+    def response(status_code: int, headers: dict = None) -> Mock:
+        return Mock(status_code=status_code, headers=headers or {})
+
+    def test_request(self):
+        """Ensure MetabaseClient sends requests through its AdaptiveLimiter."""
+        with patch("requests.request", return_value=self.response(200)) as request:
+            response = self.client.get("/api/user", params={"query": "foo"})
+
+            self.assertEqual(200, response.status_code)
+            self.assertIsNone(
+                request.assert_called_once_with(
+                    "get",
+                    "https://example.com/api/user",
+                    headers={"X-Metabase-Session": "token"},
+                    params={"query": "foo"},
+                )
+            )
+            self.assertEqual(1, self.client.limiter.requests)
+
+    def test_request_retries(self):
+        """Ensure MetabaseClient retries requests rejected with 429 or 503."""
+        responses = [
+            self.response(429, {"Retry-After": "0"}),
+            self.response(503, {"Retry-After": "0"}),
+            self.response(200),
+        ]
+
+        with patch("requests.request", side_effect=responses) as request:
+            response = self.client.put("/api/user/1", json={})
+
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(3, request.call_count)
+            self.assertEqual(2, self.client.limiter.throttled)
+
+            metrics = self.client.metrics
+            self.assertEqual(
+                1, metrics.get("metabase_manager_http_retries_total", status=429)
+            )
+            self.assertEqual(
+                1,
+                metrics.get(
+                    "metabase_manager_http_responses_total", method="PUT", status=200
+                ),
+            )
+
+    def test_request_gives_up(self):
+        """Ensure MetabaseClient returns the last response after max_retries."""
+        self.client.max_retries = 1
+
+        with patch(
+            "requests.request", return_value=self.response(429, {"Retry-After": "0"})
+        ) as request:
+            response = self.client.delete("/api/user/1")
+
+            self.assertEqual(429, response.status_code)
+            self.assertEqual(2, request.call_count)
+
+    def test_get_retry_delay(self):
+        """Ensure MetabaseClient.get_retry_delay() honors Retry-After, or backs off."""
+        self.assertEqual(
+            3,
+            MetabaseClient.get_retry_delay(self.response(429, {"Retry-After": "3"}), 0),
+        )
+        self.assertEqual(0.5, MetabaseClient.get_retry_delay(self.response(503), 0))
+        self.assertEqual(2, MetabaseClient.get_retry_delay(self.response(503), 2))
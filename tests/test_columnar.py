@@ -0,0 +1,92 @@
+from unittest import TestCase
+
+import metabase
+
+from metabase_manager.columnar import UserColumns, UserDiff, from_bitset, to_bitset
+from metabase_manager.entities import Group, User
+from metabase_manager.manager import MetabaseManager
+from metabase_manager.parser import MetabaseParser
+from metabase_manager.registry import MetabaseRegistry
+
+
+class ColumnarTests(TestCase):
+    def setUp(self) -> None:
+        self.registry = MetabaseRegistry(
+            client=None,
+            groups=[
+                metabase.PermissionGroup(_using=None, id=1, name="All Users"),
+                metabase.PermissionGroup(_using=None, id=3, name="Finance"),
+                metabase.PermissionGroup(_using=None, id=4, name="Sales"),
+            ],
+            users=[
+                metabase.User(
+                    _using=None,
+                    email=f"{name}@example.com",
+                    first_name=name.title(),
+                    last_name="Doe",
+                    group_ids=group_ids,
+                )
+                for name, group_ids in [
+                    ("jane", [1, 3]),
+                    ("john", [1, 3]),
+                    ("jack", [1]),
+                    ("gone", [1]),
+                ]
+            ],
+        )
+        self.config = MetabaseParser()
+        for name, groups, last_name in [
+            ("jane", ["Finance"], "Doe"),
+            ("john", ["Sales", "New"], "Doe"),
+            ("jack", [], "Smith"),
+            ("new", [], "Doe"),
+        ]:
+            self.config.register_object(
+                User(
+                    first_name=name.title(),
+                    last_name=last_name,
+                    email=f"{name}@example.com",
+                    groups=[Group(name=g) for g in groups],
+                ),
+                "users",
+            )
+
+    def test_bitset(self):
+        """Ensure groups that don't exist yet (id -1) are stored in the first bit."""
+        self.assertEqual(0b11010, to_bitset([1, 3, 4]))
+        self.assertEqual(0b11, to_bitset([-1, 1]))
+        self.assertListEqual([-1, 1, 4], from_bitset(to_bitset([4, 1, -1])))
+
+    def test_compute(self):
+        """Ensure users are created, updated and deleted, with their membership deltas."""
+        diff = UserDiff.compute(
+            UserColumns.from_config(self.config.users, self.registry),
+            UserColumns.from_metabase(self.registry.users),
+        )
+
+        self.assertListEqual(["new@example.com"], diff.create)
+        self.assertListEqual(["john@example.com", "jack@example.com"], diff.update)
+        self.assertListEqual(["gone@example.com"], diff.delete)
+        self.assertListEqual([-1, 4], from_bitset(diff.added["john@example.com"]))
+        self.assertListEqual([3], from_bitset(diff.removed["john@example.com"]))
+        self.assertNotIn("jack@example.com", diff.added)
+
+    def test_plan_columnar(self):
+        """Ensure MetabaseManager.plan_columnar() plans the same changes as objects do."""
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+        manager.registry = self.registry
+        manager.config = self.config
+
+        expected = manager.plan(User)
+        manager.columnar = True
+        plan = manager.plan(User)
+
+        for action in ("create", "update", "delete"):
+            self.assertSetEqual(
+                {entity.key for entity in getattr(expected, action)},
+                {entity.key for entity in getattr(plan, action)},
+            )
+        self.assertTrue(all(entity.resource for entity in plan.update))
+        self.assertListEqual([], manager.plan_columnar(delete=False).delete)
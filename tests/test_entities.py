@@ -1,14 +1,40 @@
-from dataclasses import dataclass
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
 from random import random
 from unittest import TestCase
 from unittest.mock import PropertyMock, patch
 
 import metabase
 from metabase import PermissionGroup
-
-from metabase_manager.entities import Entity, Group, User
-from metabase_manager.exceptions import NotFoundError
+from metabase.resource import UpdateResource
+
+from metabase_manager import resources
+from metabase_manager.entities import (
+    CachePolicy,
+    Card,
+    Collection,
+    CollectionPermission,
+    Dashboard,
+    Database,
+    Entity,
+    Field,
+    Group,
+    Metric,
+    Permission,
+    Sandbox,
+    Segment,
+    Setting,
+    Snippet,
+    Subscription,
+    Table,
+    User,
+)
+from metabase_manager.exceptions import InvalidConfigError, NotFoundError
+from metabase_manager.mbql import hash_sql
 from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.resources import DataPermission, PermissionsGraph
 from tests.helpers import IntegrationTestCase
 
 
@@ -58,6 +84,26 @@ class EntityTests(TestCase):
         entity = Entity()
         self.assertTrue(entity.can_delete(resource=None))
 
+    def test_can_export(self):
+        entity = Entity()
+        self.assertTrue(entity.can_export(resource=None))
+
+    def test_dump(self):
+        """Ensure Entity.dump() omits private attributes and attributes left to their default."""
+
+        @dataclass
+        class MockEntity(Entity):
+            name: str
+            description: str = None
+            tags: list = field(default_factory=list)
+            _resource: str = None
+
+        entity = MockEntity(name="my_name", _resource="resource")
+        self.assertDictEqual({"name": "my_name"}, entity.dump())
+
+        entity.tags = ["a"]
+        self.assertDictEqual({"name": "my_name", "tags": ["a"]}, entity.dump())
+
     def test_is_equal_raises_error(self):
         with self.assertRaises(NotImplementedError):
             entity = Entity()
@@ -556,3 +602,1326 @@ class UserTests(IntegrationTestCase):
                 ]
                 group_ids.return_value = [1, -1, 3]
                 user.validate_groups()
+
+
+class UserDeltaTests(TestCase):
+    def setUp(self) -> None:
+        self.registry = MetabaseRegistry(
+            client=None,
+            groups=[
+                PermissionGroup(_using=None, id=1, name="All Users"),
+                PermissionGroup(_using=None, id=3, name="Finance"),
+            ],
+        )
+        self.resource = metabase.User(
+            _using=None,
+            id=10,
+            first_name="Jane",
+            last_name="Doe",
+            email="jane@example.com",
+            group_ids=[1, 3],
+            login_attributes={"region": "EU"},
+        )
+
+    def test_get_delta(self):
+        """Ensure only the attributes that differ are returned, login attributes only if declared."""
+        user = User(
+            first_name="Jane",
+            last_name="Doe",
+            email="jane@example.com",
+            groups=[Group(name="Finance")],
+            registry=self.registry,
+        )
+        self.assertDictEqual({}, user.get_delta(self.resource))
+
+        user.login_attributes = {"region": "US"}
+        self.assertDictEqual(
+            {"login_attributes": {"region": "US"}}, user.get_delta(self.resource)
+        )
+
+        user.groups = []
+        self.assertDictEqual(
+            {"group_ids": [1], "login_attributes": {"region": "US"}},
+            user.get_delta(self.resource),
+        )
+
+    def test_update(self):
+        """Ensure a change of login attributes is sent without the rest of the user."""
+        user = User(
+            first_name="Jane",
+            last_name="Doe",
+            email="jane@example.com",
+            groups=[Group(name="Finance")],
+            login_attributes={"region": "US"},
+            registry=self.registry,
+        )
+        user.resource = self.resource
+
+        with patch.object(UpdateResource, "update") as update:
+            user.update()
+
+            self.assertIsNone(
+                update.assert_called_once_with(login_attributes={"region": "US"})
+            )
+
+
+class PermissionTests(TestCase):
+    def setUp(self) -> None:
+        self.graph = PermissionsGraph(_using=None, revision=3, groups={})
+        self.resource = DataPermission(
+            _using=None,
+            group_id=4,
+            group="Finance",
+            database_id=2,
+            database="Warehouse",
+            native="none",
+            schemas={"public": "all", "finance": {"orders": "all", "refunds": "none"}},
+            graph=self.graph,
+            table_ids={"finance": {"orders": 10, "refunds": 11, "invoices": 12}},
+        )
+
+    def test_key(self):
+        """Ensure Permission.key is the group and database names."""
+        permission = Permission(group="Finance", database="Warehouse")
+
+        self.assertEqual("Finance/Warehouse", permission.key)
+        self.assertEqual(
+            "Finance/Warehouse",
+            Permission.get_key_from_metabase_instance(self.resource),
+        )
+
+    def test_from_resource(self):
+        """Ensure Permission.from_resource() returns a Permission with the same permissions."""
+        permission = Permission.from_resource(self.resource)
+
+        self.assertEqual("none", permission.native)
+        self.assertEqual(self.resource.schemas, permission.schemas)
+        self.assertEqual(self.resource, permission.resource)
+
+    def test_can_delete(self):
+        """Ensure Permission.can_delete() is False for administrators or empty permissions."""
+        self.assertTrue(Permission.can_delete(self.resource))
+
+        self.resource.group = "Administrators"
+        self.assertFalse(Permission.can_delete(self.resource))
+
+        self.resource.group = "Finance"
+        self.resource.schemas = "none"
+        self.assertFalse(Permission.can_delete(self.resource))
+
+    def test_diff(self):
+        """Ensure Permission.diff() returns the smallest value to send."""
+        self.assertIsNone(Permission.diff("all", "all"))
+        self.assertEqual("none", Permission.diff("all", "none"))
+        self.assertEqual({"public": "all"}, Permission.diff("all", {"public": "all"}))
+        self.assertIsNone(
+            Permission.diff({"public": "all"}, {"public": "all", "other": "none"})
+        )
+        self.assertEqual(
+            {"other": "none"},
+            Permission.diff({"public": "all", "other": "all"}, {"public": "all"}),
+        )
+        self.assertEqual(
+            {"public": {"b": "all"}},
+            Permission.diff(
+                {"public": {"a": "all", "b": "none"}},
+                {"public": {"a": "all", "b": "all"}},
+            ),
+        )
+        # permissions of a table are compared as a whole
+        self.assertEqual(
+            {"public": {"a": {"query": "segmented", "read": "all"}}},
+            Permission.diff(
+                {"public": {"a": {"query": "all", "read": "all"}}},
+                {"public": {"a": {"query": "segmented", "read": "all"}}},
+            ),
+        )
+
+    def test_is_equal(self):
+        """Ensure Permission.is_equal() compares native and schemas permissions."""
+        permission = Permission.from_resource(self.resource)
+        self.assertTrue(permission.is_equal(self.resource))
+
+        permission.native = "write"
+        self.assertFalse(permission.is_equal(self.resource))
+        self.assertDictEqual({"native": "write"}, permission.get_delta(self.resource))
+
+    def test_to_graph(self):
+        """Ensure Permission.to_graph() replaces table names by table ids."""
+        permission = Permission(group="Finance", database="Warehouse")
+        permission.resource = self.resource
+
+        self.assertDictEqual(
+            {"data": {"schemas": {"public": "all", "finance": {"12": "all"}}}},
+            permission.to_graph(
+                {"schemas": {"public": "all", "finance": {"invoices": "all"}}}
+            ),
+        )
+
+        with self.assertRaises(NotFoundError):
+            permission.to_graph({"schemas": {"finance": {"unknown": "all"}}})
+
+    def test_apply_many(self):
+        """Ensure Permission.apply_many() sends a single sparse update of the graph."""
+        update = Permission(
+            group="Finance",
+            database="Warehouse",
+            native="write",
+            schemas={"public": "all", "finance": {"orders": "all", "invoices": "all"}},
+        )
+        update.resource = self.resource
+        delete = Permission.from_resource(
+            DataPermission(
+                _using=None,
+                group_id=5,
+                group="Marketing",
+                database_id=2,
+                database="Warehouse",
+                native="write",
+                schemas="all",
+                graph=self.graph,
+                table_ids={},
+            )
+        )
+
+        with patch.object(PermissionsGraph, "update") as graph_update:
+            Permission.apply_many(
+                using=None, create=[], update=[update], delete=[delete]
+            )
+
+            self.assertIsNone(
+                graph_update.assert_called_once_with(
+                    {
+                        "4": {
+                            "2": {
+                                "data": {
+                                    "native": "write",
+                                    "schemas": {"finance": {"12": "all"}},
+                                }
+                            }
+                        },
+                        "5": {"2": {"data": {"native": "none", "schemas": "none"}}},
+                    }
+                )
+            )
+
+        with patch.object(PermissionsGraph, "update") as graph_update:
+            Permission.apply_many(using=None, create=[], update=[], delete=[])
+            self.assertFalse(graph_update.called)
+
+        with self.assertRaises(NotFoundError):
+            Permission.apply_many(using=None, create=[update], update=[], delete=[])
+
+    def test_estimate_requests_many(self):
+        """Ensure all Permission changes are estimated to a single request."""
+        permission = Permission(group="Finance", database="Warehouse")
+
+        self.assertEqual(0, Permission.estimate_requests_many([], [], []))
+        self.assertEqual(
+            1, Permission.estimate_requests_many([], [permission] * 10, [permission])
+        )
+
+
+class CollectionTests(TestCase):
+    def test_path(self):
+        """Ensure Collection paths are normalized and split into name, parent and ancestors."""
+        collection = Collection(path="Finance/Reports/2022/")
+
+        self.assertEqual("/Finance/Reports/2022", collection.key)
+        self.assertEqual("2022", collection.name)
+        self.assertEqual("/Finance/Reports", collection.parent_path)
+        self.assertListEqual(["/Finance", "/Finance/Reports"], collection.ancestors)
+        self.assertIsNone(Collection(path="/Finance").parent_path)
+
+    def test_is_equal(self):
+        """Ensure Collection.is_equal() ignores undeclared descriptions."""
+        resource = resources.Collection(
+            _using=None, id=1, path="/Finance", description="Money", archived=False
+        )
+
+        self.assertTrue(Collection(path="/Finance").is_equal(resource))
+        self.assertTrue(
+            Collection(path="/Finance", description="Money").is_equal(resource)
+        )
+        self.assertFalse(Collection(path="/Finance", description="").is_equal(resource))
+        self.assertFalse(Collection(path="/Finance", archived=True).is_equal(resource))
+
+    def test_batch(self):
+        """
+        Ensure collections are created one depth at a time, and children of
+        archived collections are not archived again.
+        """
+        finance = Collection(path="/Finance")
+        reports = Collection(path="/Finance/Reports")
+        archive = Collection(path="/Finance/Reports/Archive")
+        marketing = Collection(path="/Marketing")
+        collections = [archive, finance, reports, marketing]
+
+        self.assertListEqual(
+            [[finance, marketing], [reports], [archive]],
+            Collection.batch(collections, "create"),
+        )
+        self.assertListEqual(
+            [[archive, marketing]],
+            Collection.batch([archive, marketing], "delete"),
+        )
+        self.assertListEqual(
+            [[finance, marketing]], Collection.batch(collections, "delete")
+        )
+        self.assertListEqual([collections], Collection.batch(collections, "update"))
+
+    def test_create(self):
+        """Ensure Collection.create() creates the collection in its parent and registers it."""
+        registry = MetabaseRegistry(client=None)
+        registry.collections = [
+            resources.Collection(_using=None, id=7, path="/Finance", archived=False)
+        ]
+        created = resources.Collection(_using=None, id=8, name="Reports")
+        collection = Collection(path="/Finance/Reports", registry=registry)
+
+        with patch.object(
+            resources.Collection, "create", return_value=created
+        ) as create:
+            collection.create(using=None)
+
+            self.assertIsNone(
+                create.assert_called_once_with(
+                    using=None,
+                    name="Reports",
+                    color=Collection.DEFAULT_COLOR,
+                    parent_id=7,
+                    description=None,
+                )
+            )
+
+        self.assertEqual(created, collection.resource)
+        self.assertEqual(created, registry.get_collection_by_path("/Finance/Reports"))
+
+        with self.assertRaises(NotFoundError):
+            Collection(path="/Unknown/Reports", registry=registry).create(using=None)
+
+    def test_delete(self):
+        """Ensure Collection.delete() archives the collection."""
+        resource = resources.Collection(
+            _using=None, id=7, path="/Finance", description=None, archived=False
+        )
+        collection = Collection.from_resource(resource)
+
+        with patch.object(resources.Collection, "update") as update:
+            collection.delete()
+            self.assertIsNone(update.assert_called_once_with(archived=True))
+
+
+class CollectionPermissionTests(TestCase):
+    def setUp(self) -> None:
+        self.graph = resources.CollectionGraph(_using=None, revision=2, groups={})
+        self.registry = MetabaseRegistry(client=None)
+        self.registry.groups = [PermissionGroup(_using=None, id=4, name="Finance")]
+        self.registry.collections = [
+            resources.Collection(_using=None, id=7, path="/Finance")
+        ]
+
+    def test_key(self):
+        """Ensure CollectionPermission.key is the group name and collection path."""
+        permission = CollectionPermission(group="Finance", collection="Finance/")
+
+        self.assertEqual("Finance:/Finance", permission.key)
+
+    def test_get_ids(self):
+        """Ensure CollectionPermission.get_ids() looks up ids in the registry."""
+        permission = CollectionPermission(
+            group="Finance", collection="/Finance", registry=self.registry
+        )
+        self.assertTupleEqual(("4", "7"), permission.get_ids())
+
+        permission.collection = "/"
+        self.assertTupleEqual(("4", "root"), permission.get_ids())
+
+        permission.collection = "/Unknown"
+        with self.assertRaises(NotFoundError):
+            permission.get_ids()
+
+    def test_apply_many(self):
+        """Ensure CollectionPermission.apply_many() sends a single sparse update of the graph."""
+        create = CollectionPermission(
+            group="Finance",
+            collection="/Finance",
+            access="write",
+            registry=self.registry,
+        )
+        delete = CollectionPermission.from_resource(
+            resources.CollectionPermission(
+                _using=None,
+                group_id=5,
+                group="Marketing",
+                collection_id="root",
+                collection="/",
+                access="read",
+                graph=self.graph,
+            )
+        )
+
+        with patch.object(resources.CollectionGraph, "update") as graph_update:
+            CollectionPermission.apply_many(
+                using=None, create=[create], update=[], delete=[delete]
+            )
+
+            self.assertIsNone(
+                graph_update.assert_called_once_with(
+                    {"4": {"7": "write"}, "5": {"root": "none"}}
+                )
+            )
+
+        with patch.object(
+            resources.CollectionGraph, "get", return_value=self.graph
+        ) as get, patch.object(resources.CollectionGraph, "update"):
+            CollectionPermission.apply_many(
+                using=None, create=[create], update=[], delete=[]
+            )
+            self.assertTrue(get.called)
+
+
+class TableTests(TestCase):
+    def setUp(self) -> None:
+        self.resources = [
+            resources.TableMetadata(
+                _using=None,
+                id=i,
+                database="Warehouse",
+                schema="public",
+                name=f"table{i}",
+                display_name=f"Table{i}",
+                description=None,
+                visibility_type=None,
+            )
+            for i in range(3)
+        ]
+
+    def test_key(self):
+        """Ensure Table.key is the database, schema and table names."""
+        table = Table(database="Warehouse", schema="public", name="table0")
+
+        self.assertEqual("Warehouse.public.table0", table.key)
+        self.assertEqual(
+            table.key, Table.get_key_from_metabase_instance(self.resources[0])
+        )
+
+    def test_get_delta(self):
+        """Ensure Table.get_delta() only compares declared attributes."""
+        table = Table(database="Warehouse", schema="public", name="table0")
+        self.assertTrue(table.is_equal(self.resources[0]))
+
+        table.description = "Orders"
+        table.visibility_type = "normal"
+        self.assertDictEqual(
+            {"description": "Orders"}, table.get_delta(self.resources[0])
+        )
+
+        self.resources[0].visibility_type = "hidden"
+        self.assertDictEqual(
+            {"description": "Orders", "visibility_type": None},
+            table.get_delta(self.resources[0]),
+        )
+
+    def test_can_delete(self):
+        """Ensure tables are never deleted."""
+        self.assertFalse(Table.can_delete(self.resources[0]))
+
+    def test_apply_many(self):
+        """Ensure tables with the same changes are updated in a single request."""
+        tables = []
+        for resource, description in zip(self.resources, [None, None, "Orders"]):
+            table = Table(
+                database="Warehouse",
+                schema="public",
+                name=resource.name,
+                description=description,
+                visibility_type="hidden",
+            )
+            table.resource = resource
+            tables.append(table)
+
+        self.assertEqual(2, Table.estimate_requests_many([], tables, []))
+
+        with patch.object(resources.TableMetadata, "update_many") as update_many:
+            Table.apply_many(using=None, create=[], update=tables, delete=[])
+
+            self.assertEqual(2, update_many.call_count)
+            self.assertIsNone(
+                update_many.assert_any_call(
+                    using=None, ids=[0, 1], visibility_type="hidden"
+                )
+            )
+            self.assertIsNone(
+                update_many.assert_any_call(
+                    using=None, ids=[2], description="Orders", visibility_type="hidden"
+                )
+            )
+
+        with self.assertRaises(NotFoundError):
+            Table.apply_many(using=None, create=tables[:1], update=[], delete=[])
+
+
+class FieldTests(TestCase):
+    def test_update(self):
+        """Ensure Field.update() only sends the declared attributes that changed."""
+        resource = resources.FieldMetadata(
+            _using=None,
+            id=100,
+            database="Warehouse",
+            schema="public",
+            table="orders",
+            name="id",
+            display_name="ID",
+            description=None,
+            visibility_type="normal",
+            semantic_type="type/PK",
+        )
+        field = Field(
+            database="Warehouse",
+            schema="public",
+            table="orders",
+            name="id",
+            display_name="ID",
+            description="Order id",
+        )
+        field.resource = resource
+
+        self.assertEqual("Warehouse.public.orders.id", field.key)
+        self.assertFalse(field.is_equal(resource))
+
+        with patch.object(resources.FieldMetadata, "update") as update:
+            field.update()
+            self.assertIsNone(update.assert_called_once_with(description="Order id"))
+
+
+class DatabaseTests(TestCase):
+    def setUp(self) -> None:
+        self.resource = metabase.Database(
+            _using=None,
+            id=2,
+            name="Warehouse",
+            engine="postgres",
+            description=None,
+            details={
+                "host": "db.example.com",
+                "port": 5432,
+                "user": "metabase",
+                "password": Database.REDACTED,
+                "ssl": True,
+            },
+            auto_run_queries=True,
+            schedules={"metadata_sync": {"schedule_type": "hourly"}},
+        )
+
+    def test_is_equal(self):
+        """Ensure Database.is_equal() ignores redacted secrets and undeclared attributes."""
+        database = Database(
+            name="Warehouse",
+            engine="postgres",
+            details={"host": "db.example.com", "password": "secret"},
+            schedules={"metadata_sync": {"schedule_type": "hourly"}},
+        )
+
+        self.assertTrue(database.is_equal(self.resource))
+
+        database.auto_run_queries = False
+        self.assertDictEqual(
+            {"auto_run_queries": False}, database.get_delta(self.resource)
+        )
+
+    def test_get_delta_details(self):
+        """Ensure changed details are sent along with the current ones."""
+        database = Database(
+            name="Warehouse", engine="postgres", details={"host": "replica.example.com"}
+        )
+
+        self.assertDictEqual(
+            {
+                "details": {
+                    "host": "replica.example.com",
+                    "port": 5432,
+                    "user": "metabase",
+                    "password": Database.REDACTED,
+                    "ssl": True,
+                }
+            },
+            database.get_delta(self.resource),
+        )
+
+    def test_get_schedules(self):
+        """Ensure schedules are only fetched when they're not already known."""
+        self.resource.schedules = None
+        database = Database(
+            name="Warehouse",
+            engine="postgres",
+            schedules={"metadata_sync": {"schedule_type": "daily"}},
+        )
+
+        with patch.object(
+            metabase.Database,
+            "get",
+            return_value=metabase.Database(
+                _using=None, schedules={"metadata_sync": {"schedule_type": "hourly"}}
+            ),
+        ) as get:
+            self.assertIn("schedules", database.get_delta(self.resource))
+            self.assertIn("schedules", database.get_delta(self.resource))
+            self.assertEqual(1, get.call_count)
+
+    def test_update(self):
+        """Ensure the schema is only synced when connection details change."""
+        database = Database(name="Warehouse", engine="postgres", cache_ttl=24)
+        database.resource = self.resource
+
+        with patch.object(metabase.Database, "update") as update, patch.object(
+            metabase.Database, "sync_schema"
+        ) as sync_schema, patch.object(
+            metabase.Database, "rescan_values"
+        ) as rescan_values:
+            self.assertEqual(1, database.estimate_requests("update"))
+            database.update()
+
+            self.assertIsNone(update.assert_called_once_with(cache_ttl=24))
+            self.assertFalse(sync_schema.called)
+            self.assertFalse(rescan_values.called)
+
+        database.details = {"port": 5433}
+        with patch.object(metabase.Database, "update") as update, patch.object(
+            metabase.Database, "sync_schema"
+        ) as sync_schema, patch.object(
+            metabase.Database, "rescan_values"
+        ) as rescan_values:
+            self.assertEqual(3, database.estimate_requests("update"))
+            database.update()
+
+            self.assertTrue(sync_schema.called)
+            self.assertTrue(rescan_values.called)
+
+    def test_create(self):
+        """Ensure every declared attribute is sent when creating a database."""
+        database = Database(
+            name="Warehouse",
+            engine="postgres",
+            description="Analytics",
+            refingerprint=True,
+        )
+
+        with patch.object(
+            metabase.Database, "create", return_value=self.resource
+        ) as create:
+            database.create(using=None)
+
+        self.assertEqual("Analytics", create.call_args.kwargs["description"])
+        self.assertTrue(create.call_args.kwargs["refingerprint"])
+
+
+class SegmentTests(TestCase):
+    def setUp(self) -> None:
+        self.definition = {"filter": ["=", ["field", 1, None], "paid"]}
+        self.resource = resources.Segment(
+            _using=None,
+            id=1,
+            name="Paid",
+            table_id=10,
+            table="Warehouse.public.orders",
+            description="Paid orders",
+            definition={"source-table": 10, **self.definition},
+            archived=False,
+        )
+        self.resource.definition_hash = resources.Segment.hash_definition(
+            self.resource.definition
+        )
+
+    def test_key(self):
+        """Ensure Segment.key is the table and name of the segment."""
+        segment = Segment(
+            table="Warehouse.public.orders", name="Paid", definition=self.definition
+        )
+
+        self.assertEqual("Warehouse.public.orders:Paid", segment.key)
+        self.assertEqual(
+            segment.key, Segment.get_key_from_metabase_instance(self.resource)
+        )
+
+    def test_is_equal(self):
+        """Ensure segments are compared by their normalized definition."""
+        segment = Segment(
+            table="Warehouse.public.orders",
+            name="Paid",
+            definition={":filter": ["=", ["field-id", 1], "paid"]},
+        )
+        self.assertTrue(segment.is_equal(self.resource))
+
+        segment = Segment(
+            table="Warehouse.public.orders",
+            name="Paid",
+            definition={"filter": ["=", ["field", 1, None], "refunded"]},
+            description="Refunded orders",
+        )
+        self.assertDictEqual(
+            {
+                "definition": {
+                    "filter": ["=", ["field", 1, None], "refunded"],
+                    "source-table": 10,
+                },
+                "description": "Refunded orders",
+            },
+            segment.get_delta(self.resource),
+        )
+
+    def test_create(self):
+        """Ensure Segment.create() looks up the id of its table in the registry."""
+        registry = MetabaseRegistry(client=None)
+        registry.tables = [
+            resources.TableMetadata(
+                _using=None, id=10, database="Warehouse", schema="public", name="orders"
+            )
+        ]
+        segment = Segment(
+            table="Warehouse.public.orders",
+            name="Paid",
+            definition=self.definition,
+            registry=registry,
+        )
+
+        with patch.object(
+            resources.Segment, "create", return_value=self.resource
+        ) as create:
+            segment.create(using=None)
+
+            self.assertIsNone(
+                create.assert_called_once_with(
+                    using=None,
+                    name="Paid",
+                    table_id=10,
+                    definition={"source-table": 10, **self.definition},
+                    description=None,
+                )
+            )
+
+        segment.table = "Warehouse.public.unknown"
+        with self.assertRaises(NotFoundError):
+            segment.create(using=None)
+
+    def test_delete(self):
+        """Ensure metrics and segments are archived rather than deleted."""
+        self.assertTrue(Metric.can_delete(self.resource))
+
+        with patch.object(resources.Segment, "archive") as archive:
+            Segment.from_resource(self.resource).delete()
+            self.assertTrue(archive.called)
+
+
+class CardTests(TestCase):
+    def setUp(self) -> None:
+        self.query = {"type": "query", "database": 2, "query": {"source-table": 10}}
+        self.resource = resources.Card(
+            _using=None,
+            id=3,
+            name="Orders",
+            collection_id=7,
+            collection_path="/Finance",
+            description=None,
+            display="table",
+            dataset_query=self.query,
+            visualization_settings={},
+            entity_id="Vx8qRt",
+        )
+        self.resource.content_hash = resources.Card.hash_content(
+            name="Orders",
+            collection="/Finance",
+            description=None,
+            display="table",
+            dataset_query={
+                "type": "query",
+                "database": 2,
+                "query": {"source_table": 10, "limit": None},
+            },
+            visualization_settings={},
+        )
+
+    def test_key(self):
+        """Ensure cards are keyed by collection and name, or by their entity id."""
+        card = Card(name="Orders", collection="Finance", dataset_query=self.query)
+
+        self.assertEqual("/Finance:Orders", card.key)
+        self.assertEqual(
+            "/Finance:Orders", Card.get_key_from_metabase_instance(self.resource)
+        )
+
+        card.entity_id = "Vx8qRt"
+        self.assertEqual("Vx8qRt", card.key)
+        self.assertListEqual(["Vx8qRt"], Card.get_alternate_keys(self.resource))
+
+        # the resource of a card declared by entity id can be renamed
+        card.resource = self.resource
+
+    def test_is_equal(self):
+        """Ensure cards are compared by the hash of their normalized content."""
+        card = Card(name="Orders", collection="/Finance", dataset_query=self.query)
+        self.assertTrue(card.is_equal(self.resource))
+
+        card = Card(
+            name="Orders",
+            collection="/Finance",
+            dataset_query=self.query,
+            display="bar",
+        )
+        self.assertFalse(card.is_equal(self.resource))
+
+    def test_create(self):
+        """Ensure Card.create() creates the card in its collection and registers it."""
+        registry = MetabaseRegistry(client=None)
+        registry.collections = [
+            resources.Collection(_using=None, id=7, path="/Finance")
+        ]
+        card = Card(
+            name="Orders",
+            collection="/Finance",
+            dataset_query=self.query,
+            registry=registry,
+        )
+
+        with patch.object(
+            resources.Card, "create", return_value=self.resource
+        ) as create:
+            card.create(using=None)
+            self.assertEqual(7, create.call_args.kwargs["collection_id"])
+
+        self.assertEqual(self.resource, registry.get_index("cards", "key")[card.key])
+
+
+class DashboardTests(TestCase):
+    def setUp(self) -> None:
+        self.registry = MetabaseRegistry(client=None)
+        self.registry.cards = [
+            resources.Card(
+                _using=None,
+                id=3,
+                name="Orders",
+                collection_path="/",
+                entity_id="Vx8qRt",
+            ),
+            resources.Card(_using=None, id=4, name="Refunds", collection_path="/"),
+        ]
+        self.resource = resources.Dashboard(
+            _using=None,
+            id=1,
+            name="Sales",
+            collection_path="/",
+            description=None,
+            parameters=[],
+            dashcards=[],
+        )
+        self.resource.content_hash = resources.Dashboard.hash_content(
+            name="Sales", collection="/", description=None, parameters=[]
+        )
+        self.resource.dashcards_hash = resources.Dashboard.hash_dashcards(
+            [
+                {
+                    "card_id": 3,
+                    "row": 0,
+                    "col": 0,
+                    "size_x": 4,
+                    "size_y": 4,
+                    "parameter_mappings": [],
+                    "visualization_settings": {},
+                }
+            ]
+        )
+
+    def test_get_dashcards(self):
+        """Ensure cards of a dashboard are resolved by key or entity id."""
+        dashboard = Dashboard(
+            name="Sales",
+            cards=[{"card": "Vx8qRt"}, {"card": "/:Refunds", "row": 4}],
+            registry=self.registry,
+        )
+
+        self.assertListEqual([3, 4], [c["card_id"] for c in dashboard.get_dashcards()])
+
+    def test_get_dashcards_new_card(self):
+        """
+        Ensure cards that don't exist yet (i.e. created by the same sync) are planned
+        with a placeholder, and only raise once the dashboard is changed.
+        """
+        dashboard = Dashboard(
+            name="Sales",
+            cards=[{"card": "/:Orders"}, {"card": "/:New"}],
+            registry=self.registry,
+        )
+        dashboard.resource = self.resource
+
+        self.assertListEqual([3, -1], [c["card_id"] for c in dashboard.get_dashcards()])
+        self.assertFalse(dashboard.is_equal(self.resource))
+
+        with patch.object(resources.Dashboard, "update_dashcards") as update_dashcards:
+            with self.assertRaises(NotFoundError):
+                dashboard.update()
+            self.assertFalse(update_dashcards.called)
+
+    def test_update(self):
+        """Ensure only the cards of a dashboard are updated, in a single request."""
+        dashboard = Dashboard(
+            name="Sales",
+            cards=[{"card": "/:Orders"}],
+            registry=self.registry,
+        )
+        dashboard.resource = self.resource
+        self.assertTrue(dashboard.is_equal(self.resource))
+
+        dashboard.cards.append({"card": "/:Refunds", "row": 4})
+        self.assertFalse(dashboard.is_equal(self.resource))
+        self.assertEqual(1, dashboard.estimate_requests("update"))
+
+        with patch.object(resources.Dashboard, "update") as update, patch.object(
+            resources.Dashboard, "update_dashcards"
+        ) as update_dashcards:
+            dashboard.update()
+
+            self.assertFalse(update.called)
+            self.assertEqual(1, update_dashcards.call_count)
+
+    def test_export(self):
+        """Ensure the cards of an exported dashboard are referenced by key."""
+        self.resource.dashcards = [
+            {"id": 10, "card_id": 3, "row": 0, "col": 0, "size_x": 4, "size_y": 4},
+            {"id": 11, "card_id": None, "row": 4, "col": 0, "size_x": 4, "size_y": 2},
+        ]
+
+        self.assertDictEqual(
+            {
+                "name": "Sales",
+                "cards": [
+                    {"card": "/:Orders", "row": 0, "col": 0, "size_x": 4, "size_y": 4}
+                ],
+            },
+            Dashboard.export(self.resource, registry=self.registry),
+        )
+
+
+class SettingTests(TestCase):
+    def setUp(self) -> None:
+        self.resource = resources.Setting(
+            _using=None,
+            key="site-name",
+            value=None,
+            default="Metabase",
+            is_env_setting=False,
+        )
+
+    def test_is_equal(self):
+        """Ensure settings are compared with their value, or their default if unset."""
+        self.assertTrue(
+            Setting(name="site-name", value="Metabase").is_equal(self.resource)
+        )
+        self.assertFalse(
+            Setting(name="site-name", value="Acme").is_equal(self.resource)
+        )
+
+        self.resource.value = "Acme"
+        self.assertTrue(Setting(name="site-name", value="Acme").is_equal(self.resource))
+        self.assertFalse(Setting(name="site-name").is_equal(self.resource))
+
+    def test_is_equal_skipped(self):
+        """Ensure secrets and settings set by environment variables are never updated."""
+        self.resource.value = "**********et"
+        self.assertTrue(Setting(name="site-name", value="Acme").is_equal(self.resource))
+
+        self.resource.value = None
+        self.resource.is_env_setting = True
+        self.assertTrue(Setting(name="site-name", value="Acme").is_equal(self.resource))
+        self.assertFalse(Setting.can_export(self.resource))
+
+    def test_apply_many(self):
+        """Ensure changed settings are updated in a single request."""
+        settings = [
+            Setting(name="site-name", value="Acme"),
+            Setting(name="enable-embedding", value=True),
+        ]
+        for setting in settings:
+            setting._resource = self.resource
+
+        self.assertEqual(1, Setting.estimate_requests_many([], settings, []))
+        self.assertEqual(0, Setting.estimate_requests_many([], [], []))
+
+        with patch.object(resources.Setting, "update_many") as update_many:
+            Setting.apply_many(using=None, create=[], update=settings, delete=[])
+
+            self.assertIsNone(
+                update_many.assert_called_once_with(
+                    using=None, values={"site-name": "Acme", "enable-embedding": True}
+                )
+            )
+
+        with self.assertRaises(NotFoundError):
+            Setting.apply_many(
+                using=None, create=[Setting(name="unknown")], update=[], delete=[]
+            )
+
+
+class CachePolicyTests(TestCase):
+    def test_key(self):
+        """Ensure policies are identified by their model and name."""
+        self.assertEqual("root", CachePolicy(model="root").key)
+        self.assertEqual(
+            "card:/Finance:Orders",
+            CachePolicy(model="card", name="/Finance:Orders").key,
+        )
+
+        with self.assertRaises(InvalidConfigError):
+            CachePolicy(model="table", name="orders")
+
+    def test_get_delta(self):
+        """Ensure only declared attributes of the root policy are compared."""
+        root = resources.CachePolicy(
+            _using=None, model="root", enabled=False, ttl_ratio=10, min_duration=60
+        )
+
+        self.assertDictEqual(
+            {"enabled": True},
+            CachePolicy(model="root", enabled=True, ttl_ratio=10).get_delta(root),
+        )
+        self.assertTrue(CachePolicy(model="root").is_equal(root))
+
+        card = resources.CachePolicy(
+            _using=None, model="card", name="/:Orders", ttl=None
+        )
+        self.assertDictEqual(
+            {"ttl": 1},
+            CachePolicy(model="card", name="/:Orders", ttl=1).get_delta(card),
+        )
+        self.assertTrue(CachePolicy(model="card", name="/:Orders").is_equal(card))
+
+    def test_can_delete(self):
+        """Ensure the cache TTL of undeclared objects is removed, but never the root policy."""
+        policy = resources.CachePolicy(
+            _using=None, model="card", name="/:Orders", ttl=1
+        )
+        self.assertTrue(CachePolicy.can_delete(policy))
+
+        policy.ttl = None
+        self.assertFalse(CachePolicy.can_delete(policy))
+        self.assertFalse(
+            CachePolicy.can_delete(
+                resources.CachePolicy(_using=None, model="root", ttl=None)
+            )
+        )
+
+
+class SandboxTests(TestCase):
+    def setUp(self) -> None:
+        self.registry = MetabaseRegistry(
+            client=None,
+            groups=[PermissionGroup(_using=None, id=4, name="Finance")],
+            tables=[
+                resources.TableMetadata(
+                    _using=None,
+                    id=10,
+                    database="Warehouse",
+                    schema="public",
+                    name="orders",
+                    fields=[
+                        resources.FieldMetadata(_using=None, id=100, name="region")
+                    ],
+                )
+            ],
+            cards=[
+                resources.Card(_using=None, id=3, name="Orders", collection_path="/")
+            ],
+        )
+        self.resource = resources.Sandbox(
+            _using=None,
+            id=1,
+            group_id=4,
+            group="Finance",
+            table_id=10,
+            table="Warehouse.public.orders",
+            card_id=None,
+            attribute_remappings={"region": ["dimension", ["field-id", 100]]},
+        )
+
+    def test_is_equal(self):
+        """Ensure field names are resolved, and remappings compared once normalized."""
+        sandbox = Sandbox(
+            group="Finance",
+            table="Warehouse.public.orders",
+            attribute_remappings={"region": "region"},
+            registry=self.registry,
+        )
+        sandbox.resource = self.resource
+
+        self.assertTrue(sandbox.is_equal(self.resource))
+
+        sandbox.card = "/:Orders"
+        self.assertFalse(sandbox.is_equal(self.resource))
+
+    def test_is_equal_placeholders(self):
+        """
+        Ensure cards and tables that can't be found (i.e. created by the same sync) are
+        compared as placeholders, and only raise once the sandbox is changed.
+        """
+        sandbox = Sandbox(
+            group="Finance",
+            table="Warehouse.public.orders",
+            card="/:New",
+            attribute_remappings={"region": "region"},
+            registry=self.registry,
+        )
+        sandbox.resource = self.resource
+        self.assertFalse(sandbox.is_equal(self.resource))
+
+        sandbox.card = None
+        sandbox.table = "Warehouse.public.unknown"
+        self.assertFalse(sandbox.is_equal(self.resource))
+
+        sandbox.table = "Warehouse.public.orders"
+        sandbox.attribute_remappings = {"region": "unknown"}
+        self.assertFalse(sandbox.is_equal(self.resource))
+
+        with patch.object(resources.Sandbox, "update") as update:
+            with self.assertRaises(NotFoundError):
+                sandbox.update()
+            self.assertFalse(update.called)
+
+    def test_create(self):
+        """Ensure sandboxes are created with the ids of their group, table and card."""
+        sandbox = Sandbox(
+            group="Finance",
+            table="Warehouse.public.orders",
+            card="/:Orders",
+            attribute_remappings={"region": ["dimension", ["template-tag", "region"]]},
+            registry=self.registry,
+        )
+
+        with patch.object(
+            resources.Sandbox, "create", return_value=self.resource
+        ) as create:
+            sandbox.create(using=None)
+
+            self.assertIsNone(
+                create.assert_called_once_with(
+                    using=None,
+                    group_id=4,
+                    table_id=10,
+                    card_id=3,
+                    attribute_remappings={
+                        "region": ["dimension", ["template-tag", "region"]]
+                    },
+                )
+            )
+            self.assertEqual(self.resource, sandbox.resource)
+
+
+class SubscriptionTests(TestCase):
+    def setUp(self) -> None:
+        self.registry = MetabaseRegistry(
+            client=None,
+            groups=[PermissionGroup(_using=None, id=3, name="Finance")],
+            users=[
+                metabase.User(
+                    _using=None, id=1, email="a@example.com", group_ids=[1, 3]
+                ),
+                metabase.User(_using=None, id=2, email="b@example.com", group_ids=[1]),
+            ],
+        )
+        self.resource = resources.Subscription(
+            _using=None,
+            id=1,
+            name="Weekly",
+            dashboard="/:Sales",
+            channels=[{"id": 10, "channel_type": "email"}],
+            recipients={"a@example.com", "ext@example.com"},
+            schedule={
+                "schedule_type": "weekly",
+                "schedule_hour": 8,
+                "schedule_day": "mon",
+                "schedule_frame": None,
+            },
+        )
+
+    def test_is_equal(self):
+        """Ensure recipients, including members of groups, are compared as a set."""
+        subscription = Subscription(
+            name="Weekly",
+            dashboard="/:Sales",
+            schedule={
+                "schedule_type": "weekly",
+                "schedule_day": "mon",
+                "schedule_hour": 8,
+            },
+            recipients=["EXT@example.com"],
+            groups=["Finance"],
+            registry=self.registry,
+        )
+        self.assertTrue(subscription.is_equal(self.resource))
+
+        subscription.recipients.append("b@example.com")
+        self.assertFalse(subscription.is_equal(self.resource))
+
+        subscription.recipients.pop()
+        subscription.schedule["schedule_hour"] = 9
+        self.assertFalse(subscription.is_equal(self.resource))
+
+        # Metabase stores an hour for schedules that aren't hourly
+        del subscription.schedule["schedule_hour"]
+        self.assertTrue(subscription.is_equal(self.resource))
+
+        subscription.schedule = {"schedule_type": "hourly"}
+        self.resource.schedule = {
+            "schedule_type": "hourly",
+            "schedule_hour": None,
+            "schedule_day": None,
+            "schedule_frame": None,
+        }
+        self.assertTrue(subscription.is_equal(self.resource))
+
+        # groups created by the same sync have no members yet
+        subscription.groups = ["Unknown"]
+        subscription.recipients.append("a@example.com")
+        self.assertTrue(subscription.is_equal(self.resource))
+
+    def test_update(self):
+        """Ensure only the email channel is sent, with users of Metabase referred to by id."""
+        subscription = Subscription(
+            name="Weekly",
+            dashboard="/:Sales",
+            recipients=["a@example.com", "ext@example.com"],
+            registry=self.registry,
+        )
+        subscription.resource = self.resource
+
+        with patch.object(resources.Subscription, "update") as update:
+            subscription.update()
+
+            self.assertIsNone(
+                update.assert_called_once_with(
+                    channels=[
+                        {
+                            "channel_type": "email",
+                            "enabled": True,
+                            "recipients": [{"id": 1}, {"email": "ext@example.com"}],
+                            "schedule_type": "daily",
+                            "schedule_hour": 8,
+                            "schedule_day": None,
+                            "schedule_frame": None,
+                            "id": 10,
+                        }
+                    ]
+                )
+            )
+
+    def test_update_unknown_group(self):
+        """Ensure groups of recipients are only required to exist once applied."""
+        subscription = Subscription(
+            name="Weekly",
+            dashboard="/:Sales",
+            groups=["Unknown"],
+            registry=self.registry,
+        )
+        subscription.resource = self.resource
+
+        with patch.object(resources.Subscription, "update") as update:
+            with self.assertRaises(NotFoundError):
+                subscription.update()
+            update.assert_not_called()
+
+    def test_get_channel_mixed_case(self):
+        """Ensure users of Metabase whose email isn't in lowercase are referred to by id."""
+        self.registry.users = [
+            metabase.User(_using=None, id=5, email="Jane.Doe@example.com", group_ids=[])
+        ]
+        subscription = Subscription(
+            name="Weekly",
+            dashboard="/:Sales",
+            recipients=["jane.doe@example.com"],
+            registry=self.registry,
+        )
+
+        self.assertListEqual([{"id": 5}], subscription.get_channel()["recipients"])
+
+
+class SnippetTests(TestCase):
+    def setUp(self) -> None:
+        self.resource = resources.Snippet(
+            _using=None,
+            id=1,
+            name="Region",
+            content="region = 'EU'\n",
+            description=None,
+            archived=False,
+            content_hash=hash_sql("region = 'EU'\n"),
+        )
+
+    def test_post_init(self):
+        """Ensure snippets declare exactly one of content or file."""
+        with self.assertRaises(InvalidConfigError):
+            Snippet(name="Region")
+
+        with self.assertRaises(InvalidConfigError):
+            Snippet(name="Region", content="1", file="region.sql")
+
+    def test_is_equal(self):
+        """Ensure snippets are compared by their normalized content, and unarchived."""
+        self.assertTrue(
+            Snippet(name="Region", content="region = 'EU'  \r\n\n").is_equal(
+                self.resource
+            )
+        )
+        self.assertFalse(
+            Snippet(name="Region", content="region = 'US'").is_equal(self.resource)
+        )
+        self.assertFalse(
+            Snippet(
+                name="Region", content="region = 'EU'", description="Europe"
+            ).is_equal(self.resource)
+        )
+
+        # descriptions that aren't declared are left as they are in Metabase
+        self.resource.description = "Europe"
+        self.assertTrue(
+            Snippet(name="Region", content="region = 'EU'").is_equal(self.resource)
+        )
+
+        self.resource.archived = True
+        self.assertFalse(
+            Snippet(name="Region", content="region = 'EU'").is_equal(self.resource)
+        )
+        self.assertFalse(Snippet.can_delete(self.resource))
+
+    def test_update(self):
+        """Ensure the description is only sent when declared."""
+        snippet = Snippet(name="Region", content="region = 'US'")
+        snippet.resource = self.resource
+
+        with patch.object(resources.Snippet, "update") as update:
+            snippet.update()
+            update.assert_called_once_with(content="region = 'US'", archived=False)
+
+            snippet.description = "Europe"
+            snippet.update()
+            update.assert_called_with(
+                content="region = 'US'", archived=False, description="Europe"
+            )
+
+    def test_file(self):
+        """Ensure the content of files is read once, and again when they change."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "region.sql")
+            with open(path, "w") as f:
+                f.write("region = 'EU'")
+
+            snippet = Snippet(name="Region", file=path)
+            self.assertTrue(snippet.is_equal(self.resource))
+
+            with patch.object(Path, "read_text") as read:
+                self.assertTrue(snippet.is_equal(self.resource))
+                self.assertFalse(read.called)
+
+            with open(path, "w") as f:
+                f.write("region = 'US' -- changed")
+            os.utime(path, ns=(0, 0))
+
+            self.assertFalse(snippet.is_equal(self.resource))
+            self.assertEqual("region = 'US' -- changed", snippet.get_content())
@@ -0,0 +1,114 @@
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import yaml
+from metabase import PermissionGroup, User
+
+from metabase_manager.entities import Group
+from metabase_manager.entities import User as UserEntity
+from metabase_manager.export import Exporter
+from metabase_manager.parser import MetabaseParser
+from metabase_manager.registry import MetabaseRegistry
+
+
+class ExporterTests(TestCase):
+    def setUp(self) -> None:
+        self.client = Mock()
+        self.registry = MetabaseRegistry(client=self.client)
+        self.groups = [
+            PermissionGroup(_using=None, id=1, name="All Users"),
+            PermissionGroup(_using=None, id=2, name="Administrators"),
+            PermissionGroup(_using=None, id=3, name="Finance"),
+        ]
+        self.users = [
+            User(
+                _using=None,
+                id=i,
+                first_name="Jane",
+                last_name=f"Doe {i}",
+                email=f"jane{i}@example.com",
+                group_ids=[1, 3] if i % 2 else [1],
+            )
+            for i in range(5)
+        ]
+        self.exporter = Exporter(
+            registry=self.registry,
+            entities={"groups": Group, "users": UserEntity},
+            page_size=2,
+        )
+
+    def list_users(self, using, limit, offset):
+        return self.users[offset : offset + limit]
+
+    def test_iter_users(self):
+        """Ensure users are read one page at a time."""
+        with patch.object(User, "list", side_effect=self.list_users) as list_users:
+            self.assertListEqual(self.users, list(self.exporter.iter_users()))
+            self.assertEqual(3, list_users.call_count)
+
+        # versions of Metabase that don't paginate return every user at once
+        with patch.object(User, "list", return_value=self.users) as list_users:
+            self.assertListEqual(self.users, list(self.exporter.iter_users()))
+            self.assertEqual(1, list_users.call_count)
+
+    def test_export(self):
+        """Ensure objects are written as a config, with group names instead of ids."""
+        stream = StringIO()
+
+        with patch.object(
+            PermissionGroup, "list", return_value=self.groups
+        ), patch.object(User, "list", side_effect=self.list_users):
+            counts = self.exporter.export(stream)
+
+        self.assertDictEqual({"groups": 1, "users": 5}, counts)
+
+        config = yaml.safe_load(stream.getvalue())
+        self.assertListEqual([{"name": "Finance"}], config["groups"])
+        self.assertDictEqual(
+            {
+                "first_name": "Jane",
+                "last_name": "Doe 1",
+                "email": "jane1@example.com",
+                "groups": ["Finance"],
+            },
+            config["users"][1],
+        )
+        self.assertNotIn("groups", config["users"][0])
+
+        # the exported config can be parsed
+        parser = MetabaseParser()
+        parser.parse_yaml(config)
+        self.assertEqual(5, len(parser.users))
+
+    def test_export_files(self):
+        """Ensure objects are split into files of at most `max_objects` objects."""
+        with TemporaryDirectory() as directory, patch.object(
+            PermissionGroup, "list", return_value=self.groups
+        ), patch.object(User, "list", side_effect=self.list_users):
+            written = self.exporter.export_files(Path(directory), max_objects=2)
+
+            self.assertListEqual(
+                [
+                    "groups-0001.yml",
+                    "users-0001.yml",
+                    "users-0002.yml",
+                    "users-0003.yml",
+                ],
+                [path.name for path in written],
+            )
+            self.assertListEqual([1, 2, 2, 1], list(written.values()))
+
+            with open(Path(directory) / "users-0003.yml") as f:
+                self.assertEqual(
+                    "jane4@example.com", yaml.safe_load(f)["users"][0]["email"]
+                )
+
+    def test_write(self):
+        """Ensure a key without objects is written as an empty list."""
+        stream = StringIO()
+
+        self.assertEqual(0, Exporter.write(stream, "groups", iter([])))
+        self.assertDictEqual({"groups": []}, yaml.safe_load(stream.getvalue()))
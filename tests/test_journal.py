@@ -0,0 +1,71 @@
+import json
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from metabase_manager.journal import Journal
+from metabase_manager.shard import Shard
+
+
+class JournalTests(TestCase):
+    def setUp(self) -> None:
+        self.directory = TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "journal")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_record(self):
+        """Ensure Journal.record() appends one JSON line per action."""
+        journal = Journal(path=self.path)
+        journal.record("users", "foo@example.com", "create", 3)
+        journal.record("groups", "Developers", "delete", None)
+
+        with open(self.path) as f:
+            entries = [json.loads(line) for line in f]
+
+        self.assertEqual(2, len(entries))
+        self.assertEqual("users", entries[0]["type"])
+        self.assertEqual("foo@example.com", entries[0]["key"])
+        self.assertEqual("create", entries[0]["action"])
+        self.assertEqual(3, entries[0]["resource_id"])
+        self.assertIn("timestamp", entries[0])
+        self.assertTrue(journal.contains("groups", "Developers", "delete"))
+
+    def test_load(self):
+        """Ensure Journal.load() reads actions recorded by a previous Journal."""
+        Journal(path=self.path).record("users", "foo@example.com", "update", 3)
+        with open(self.path, "a") as f:
+            # interrupted while writing
+            f.write('{"type": "users", "key": "bar@exa')
+
+        journal = Journal(path=self.path)
+        self.assertFalse(journal.contains("users", "foo@example.com", "update"))
+
+        journal.load()
+        self.assertTrue(journal.contains("users", "foo@example.com", "update"))
+        self.assertFalse(journal.contains("users", "foo@example.com", "create"))
+
+    def test_load_missing_file(self):
+        """Ensure Journal.load() does nothing when no journal exists."""
+        journal = Journal(path=self.path)
+        journal.load()
+
+        self.assertFalse(journal.contains("users", "foo@example.com", "update"))
+
+    def test_clear(self):
+        """Ensure Journal.clear() discards all recorded actions."""
+        journal = Journal(path=self.path)
+        journal.record("users", "foo@example.com", "update", 3)
+        journal.clear()
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertFalse(journal.contains("users", "foo@example.com", "update"))
+
+    def test_get_default_path(self):
+        """Ensure every shard gets its own journal by default."""
+        self.assertEqual(".metabase-manager.journal", Journal.get_default_path())
+        self.assertEqual(
+            ".metabase-manager.1-of-4.journal",
+            Journal.get_default_path(Shard(index=1, count=4)),
+        )
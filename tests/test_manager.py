@@ -1,13 +1,28 @@
+import os
+from threading import Barrier
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import metabase
 
-from metabase_manager.entities import Group
-from metabase_manager.exceptions import DuplicateKeyError
+from metabase_manager import resources
+from metabase_manager.entities import CachePolicy, Card, Database, Entity, Group
+from metabase_manager.exceptions import (
+    BudgetExceededError,
+    DuplicateKeyError,
+    NotFoundError,
+)
+from metabase_manager.journal import Journal
 from metabase_manager.manager import MetabaseManager
 from metabase_manager.parser import MetabaseParser, User
+from metabase_manager.plan import Plan
 from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.shard import Shard
+
+# restrict the dependency graph to groups and users, regardless of other managed entities
+only_groups_and_users = patch.dict(
+    MetabaseManager._entities, {"groups": Group, "users": User}, clear=True
+)
 
 
 class ManagerTests(TestCase):
@@ -17,8 +32,30 @@ class ManagerTests(TestCase):
             metabase_host=None, metabase_user=None, metabase_password=None
         )
 
-        self.assertListEqual(["groups", "users"], manager.get_allowed_keys())
+        self.assertListEqual(
+            [
+                "groups",
+                "users",
+                "databases",
+                "permissions",
+                "collections",
+                "collection_permissions",
+                "tables",
+                "fields",
+                "segments",
+                "metrics",
+                "cards",
+                "dashboards",
+                "settings",
+                "caching",
+                "sandboxes",
+                "subscriptions",
+                "snippets",
+            ],
+            manager.get_allowed_keys(),
+        )
 
+    @only_groups_and_users
     def test_get_entities_to_manage(self):
         """
         Ensure MetabaseManager.get_entities_to_manage() returns a filtered list of Entity,
@@ -108,6 +145,68 @@ class ManagerTests(TestCase):
 
         self.assertDictEqual({"my_email": user1}, manager.get_metabase_objects(User))
 
+    def test_get_metabase_objects_alternate_keys(self):
+        """
+        Ensure Resources are keyed by one of their alternate keys when an Entity is
+        declared with it, i.e. cards declared with their entity id.
+        """
+        cards = [
+            resources.Card(
+                _using=None,
+                id=i,
+                name=f"Card{i}",
+                collection_path="/",
+                entity_id=f"e{i}",
+            )
+            for i in range(2)
+        ]
+        registry = MetabaseRegistry(client=None, cards=cards)
+        conf = MetabaseParser()
+        conf.register_object(
+            Card(name="Renamed", dataset_query={}, entity_id="e1"), "cards"
+        )
+        manager = MetabaseManager(
+            registry=registry,
+            config=conf,
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+
+        self.assertDictEqual(
+            {"/:Card0": cards[0], "e1": cards[1]}, manager.get_metabase_objects(Card)
+        )
+
+    @patch.object(MetabaseManager, "refresh_metabase")
+    @patch.object(MetabaseManager, "cache_metabase")
+    def test_sync_entity_id_twice(self, *_):
+        """
+        Ensure a card declared with an entity id that Metabase didn't keep is created
+        once, and matched by its name by the next sync rather than created again.
+        """
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+        manager.config = MetabaseParser(
+            _cards={"abc": Card(name="Orders", dataset_query={}, entity_id="abc")}
+        )
+        manager.registry = MetabaseRegistry(client=None)
+
+        def create(using, **kwargs):
+            # Metabase assigns its own entity id
+            return resources.Card(
+                _using=using, id=1, **{**kwargs, "entity_id": "Metabase"}
+            )
+
+        with patch.object(resources.Card, "create", side_effect=create) as created:
+            first = manager.sync()
+            second = manager.sync()
+
+        self.assertDictEqual({"cards": {"create": 1}}, first.counts)
+        self.assertEqual("abc", created.call_args.kwargs["entity_id"])
+        self.assertDictEqual({}, second.counts)
+        self.assertListEqual(["abc"], list(manager.get_metabase_objects(Card)))
+
     def test_get_metabase_objects_raises_duplicate(self):
         """
         Ensure MetabaseManager.get_metabase_objects() raises a DuplicateKeyError when
@@ -317,6 +416,66 @@ class ManagerTests(TestCase):
                 self.assertEqual(1, len(out))
                 self.assertEqual(out[0], User.from_resource(registry["my_email"]))
 
+    def test_find_objects_to_delete_caching(self):
+        """
+        Ensure cache TTLs that aren't declared are only removed when cache policies are
+        selected explicitly, except for databases declared with their own TTL.
+        """
+        registry = MetabaseRegistry(
+            client=None,
+            caching=[
+                resources.CachePolicy(
+                    _using=None, model=model, model_id=1, name=name, ttl=24
+                )
+                for model, name in [("database", "Warehouse"), ("card", "/:Orders")]
+            ],
+        )
+        manager = MetabaseManager(
+            registry=registry,
+            config=MetabaseParser(
+                _databases={
+                    "Warehouse": Database(
+                        name="Warehouse", engine="postgres", cache_ttl=24
+                    )
+                },
+                _caching={"root": CachePolicy(model="root")},
+            ),
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+
+        self.assertListEqual([], manager.find_objects_to_delete(CachePolicy))
+
+        manager.select = ["caching"]
+        self.assertListEqual(
+            ["card:/:Orders"],
+            [e.key for e in manager.find_objects_to_delete(CachePolicy)],
+        )
+
+    def test_find_objects_to_delete_databases(self):
+        """Ensure databases that aren't declared are only deleted when opted in."""
+        registry = {
+            "Warehouse": metabase.Database(_using=None, id=2, name="Warehouse"),
+            "Sample": metabase.Database(
+                _using=None, id=1, name="Sample", is_sample=True
+            ),
+        }
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+
+        with patch.object(
+            MetabaseManager, "get_config_objects", return_value={}
+        ), patch.object(MetabaseManager, "get_metabase_objects", return_value=registry):
+            self.assertListEqual([], manager.find_objects_to_delete(Database))
+
+            manager.delete_databases = True
+            self.assertListEqual(
+                ["Warehouse"],
+                [e.name for e in manager.find_objects_to_delete(Database)],
+            )
+
     def test_create(self):
         """
         Ensure MetabaseManager.create() calls .create() method on a given Entity.
@@ -370,3 +529,581 @@ class ManagerTests(TestCase):
             manager.delete(user)
 
             self.assertTrue(delete.called)
+
+    def test_get_key(self):
+        """Ensure MetabaseManager.get_key() returns the key of an Entity in cls._entities."""
+        self.assertEqual("groups", MetabaseManager.get_key(Group))
+        self.assertEqual("users", MetabaseManager.get_key(User))
+
+        with self.assertRaises(KeyError):
+            MetabaseManager.get_key(Entity)
+
+    @only_groups_and_users
+    def test_get_dependencies(self):
+        """Ensure MetabaseManager.get_dependencies() returns the keys of Entity.DEPENDENCIES."""
+        self.assertListEqual([], MetabaseManager.get_dependencies("groups"))
+        self.assertListEqual(["groups"], MetabaseManager.get_dependencies("users"))
+        self.assertListEqual(["users"], MetabaseManager.get_dependents("groups"))
+        self.assertListEqual([], MetabaseManager.get_dependents("users"))
+
+    def test_get_sorted_keys(self):
+        """Ensure MetabaseManager.get_sorted_keys() sorts keys after their dependencies."""
+        with patch.dict(
+            MetabaseManager._entities, {"users": User, "groups": Group}, clear=True
+        ):
+            self.assertListEqual(["groups", "users"], MetabaseManager.get_sorted_keys())
+
+        with patch.object(Group, "DEPENDENCIES", [User]):
+            with self.assertRaises(ValueError):
+                MetabaseManager.get_sorted_keys()
+
+    @only_groups_and_users
+    def test_resolve_selector(self):
+        """Ensure MetabaseManager.resolve_selector() expands '+' against the dependency graph."""
+        self.assertSetEqual({"users"}, MetabaseManager.resolve_selector("users"))
+        self.assertSetEqual(
+            {"users", "groups"}, MetabaseManager.resolve_selector("+users")
+        )
+        self.assertSetEqual({"users"}, MetabaseManager.resolve_selector("users+"))
+        self.assertSetEqual(
+            {"users", "groups"}, MetabaseManager.resolve_selector("groups+")
+        )
+
+        with self.assertRaises(ValueError):
+            MetabaseManager.resolve_selector("unknown")
+
+    @only_groups_and_users
+    def test_get_entities_to_manage_with_graph_selectors(self):
+        """Ensure MetabaseManager.get_entities_to_manage() resolves graph selectors."""
+        manager = MetabaseManager(
+            select=["+users"],
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        self.assertListEqual([Group, User], manager.get_entities_to_manage())
+
+        manager = MetabaseManager(
+            exclude=["groups+"],
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        self.assertListEqual([], manager.get_entities_to_manage())
+
+    def test_refresh_metabase(self):
+        """Ensure MetabaseManager.refresh_metabase() also caches an Entity's dependencies."""
+        manager = MetabaseManager(
+            select=["users"],
+            registry=MetabaseRegistry(client=None),
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+
+        with patch.object(MetabaseRegistry, "cache") as cache:
+            manager.refresh_metabase(User)
+
+            self.assertIsNone(cache.assert_called_once_with(select=["users", "groups"]))
+
+        # objects listed by the same sync aren't listed again
+        with patch.object(MetabaseRegistry, "cache") as cache:
+            manager.refresh_metabase(User)
+            cache.assert_not_called()
+
+        # by later syncs, dependencies are only listed again once changed
+        manager._fresh.clear()
+        manager.registry._cached.add("groups")
+        with patch.object(MetabaseRegistry, "cache") as cache:
+            manager.refresh_metabase(User)
+            cache.assert_called_with(select=["users"])
+
+            manager._fresh.clear()
+            manager._stale.add("groups")
+            manager.refresh_metabase(User)
+            cache.assert_called_with(select=["users", "groups"])
+            self.assertSetEqual(set(), manager._stale)
+
+    def test_schedule(self):
+        """Ensure MetabaseManager.schedule() only starts an Entity after its dependencies."""
+        manager = MetabaseManager(
+            select=["groups", "users"],
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        events = []
+
+        def func(obj):
+            events.append(("start", obj))
+            events.append(("end", obj))
+            return obj.__name__
+
+        results = list(manager.schedule(func))
+
+        self.assertListEqual([(Group, "Group"), (User, "User")], results)
+        self.assertLess(events.index(("end", Group)), events.index(("start", User)))
+
+    def test_schedule_independent_entities(self):
+        """Ensure MetabaseManager.schedule() runs Entities without dependencies concurrently."""
+        manager = MetabaseManager(
+            select=["groups", "users"],
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        barrier = Barrier(2, timeout=5)
+
+        with patch.object(User, "DEPENDENCIES", []):
+            # would time out if both entities were not running at the same time
+            results = list(manager.schedule(lambda obj: barrier.wait()))
+
+        self.assertEqual(2, len(results))
+
+    @only_groups_and_users
+    def test_get_entities_to_manage_with_shard(self):
+        """Ensure only the leader Shard manages Entities that are not sharded."""
+        manager = MetabaseManager(
+            shard=Shard(index=0, count=2),
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        self.assertListEqual([Group, User], manager.get_entities_to_manage())
+
+        manager.shard = Shard(index=1, count=2)
+        self.assertListEqual([User], manager.get_entities_to_manage())
+
+    def test_wait_for_leader(self):
+        """
+        Ensure other shards wait for the groups created by the leader shard, and raise
+        if they aren't created in time.
+        """
+        manager = MetabaseManager(
+            shard=Shard(index=1, count=2),
+            shard_timeout=1,
+            registry=MetabaseRegistry(client=None),
+            config=MetabaseParser(_groups={"Finance": Group(name="Finance")}),
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        manager.config.register_object(
+            User(first_name="", last_name="", email="jdoe@example.com"), "users"
+        )
+        finance = metabase.PermissionGroup(_using=None, id=2, name="Finance")
+
+        def cache(select):
+            self.assertListEqual(["groups"], select)
+            if cache.calls:
+                manager.registry.groups = [finance]
+            cache.calls += 1
+
+        cache.calls = 0
+        with patch.object(MetabaseRegistry, "cache", side_effect=cache):
+            manager.wait_for_leader(poll=0)
+        self.assertEqual(2, cache.calls)
+
+        manager.shard_timeout = 0
+        manager.registry.groups = []
+        with patch.object(MetabaseRegistry, "cache"):
+            with self.assertRaises(NotFoundError):
+                manager.wait_for_leader(poll=0)
+
+    def test_get_objects_with_shard(self):
+        """
+        Ensure MetabaseManager.get_metabase_objects() and MetabaseManager.get_config_objects()
+        only return the objects in the current Shard.
+        """
+        emails = [f"user{i}@example.com" for i in range(20)]
+        registry = MetabaseRegistry(
+            client=None,
+            users=[
+                metabase.User(id=i, email=email, _using=None)
+                for i, email in enumerate(emails)
+            ],
+        )
+        conf = MetabaseParser(
+            _users={
+                email: User(first_name="", last_name="", email=email)
+                for email in emails
+            }
+        )
+
+        found_metabase, found_config = set(), set()
+        for i in range(2):
+            shard = Shard(index=i, count=2)
+            manager = MetabaseManager(
+                registry=registry,
+                config=conf,
+                shard=shard,
+                metabase_host=None,
+                metabase_user=None,
+                metabase_password=None,
+            )
+            metabase_objects = manager.get_metabase_objects(User)
+            config_objects = manager.get_config_objects(User)
+
+            self.assertTrue(all(shard.contains(key) for key in metabase_objects))
+            self.assertSetEqual(set(metabase_objects), set(config_objects))
+            found_metabase.update(metabase_objects)
+            found_config.update(config_objects)
+
+        self.assertSetEqual(set(emails), found_metabase)
+        self.assertSetEqual(set(emails), found_config)
+
+    def test_create_records_journal(self):
+        """Ensure MetabaseManager.create() records the completed action in the Journal."""
+        with patch.object(User, "create"):
+            user = User(
+                email="my_email",
+                first_name="my_first_name",
+                last_name="my_last_name",
+            )
+            journal = Journal(path="")
+
+            with patch.object(Journal, "record") as record:
+                manager = MetabaseManager(
+                    journal=journal,
+                    metabase_host=None,
+                    metabase_user=None,
+                    metabase_password=None,
+                )
+                manager.create(user)
+
+                self.assertIsNone(
+                    record.assert_called_once_with(
+                        object_type="users",
+                        key="my_email",
+                        action="create",
+                        resource_id=None,
+                    )
+                )
+
+    def test_update_reports_events(self):
+        """Ensure MetabaseManager reports applied actions, and those that failed."""
+        user = User(
+            email="my_email", first_name="my_first_name", last_name="my_last_name"
+        )
+        reporter = Mock(CHANGES=True)
+        manager = MetabaseManager(
+            reporter=reporter,
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+
+        with patch.object(User, "update"), patch.object(
+            User, "get_changes", return_value=["first_name"]
+        ):
+            manager.update(user)
+
+        event = reporter.report.call_args[0][0]
+        self.assertEqual(
+            ("users", "my_email", "update"), (event.type, event.key, event.action)
+        )
+        self.assertEqual("done", event.status)
+        self.assertListEqual(["first_name"], event.changes)
+        self.assertIsNotNone(event.duration)
+
+        with patch.object(User, "delete", side_effect=ValueError("boom")):
+            with self.assertRaises(ValueError):
+                manager.delete(user)
+
+        event = reporter.report.call_args[0][0]
+        self.assertEqual(("failed", "boom"), (event.status, event.error))
+
+        metrics = manager.client.metrics
+        self.assertEqual(
+            1,
+            metrics.get(
+                "metabase_manager_actions_total",
+                type="users",
+                action="delete",
+                status="failed",
+            ),
+        )
+        self.assertEqual(
+            1,
+            metrics.get(
+                "metabase_manager_action_seconds", type="users", action="update"
+            )[-1],
+        )
+
+    def test_find_objects_to_update_skips_journaled(self):
+        """
+        Ensure MetabaseManager.find_objects_to_update() skips objects that were already
+        created or updated according to the Journal.
+        """
+        registry = {
+            "my_email": metabase.User(
+                id=1,
+                email="my_email",
+                first_name="my_first_name",
+                last_name="my_last_name",
+                _using=None,
+            )
+        }
+        config = {
+            "my_email": User(
+                email="my_email",
+                first_name="not_my_first_name",
+                last_name="my_last_name",
+            ),
+        }
+        journal = Journal(path="")
+        journal._entries.add(("users", "my_email", "update"))
+
+        with patch.object(MetabaseManager, "get_config_objects", return_value=config):
+            with patch.object(
+                MetabaseManager, "get_metabase_objects", return_value=registry
+            ):
+                manager = MetabaseManager(
+                    metabase_host=None,
+                    metabase_user=None,
+                    metabase_password=None,
+                    journal=journal,
+                )
+
+                self.assertListEqual([], manager.find_objects_to_update(User))
+
+                journal.clear()
+                self.assertEqual(1, len(manager.find_objects_to_update(User)))
+
+    @only_groups_and_users
+    @patch.object(MetabaseManager, "refresh_metabase")
+    @patch.object(MetabaseManager, "cache_metabase")
+    def test_iter_sync(self, *_):
+        """Ensure MetabaseManager.iter_sync() yields an Event for every planned action."""
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+        manager.config = MetabaseParser(_groups={"Finance": Group(name="Finance")})
+        manager.registry = MetabaseRegistry(client=None)
+        synced = []
+
+        events = list(manager.iter_sync(dry_run=True, progress=synced.append))
+
+        self.assertListEqual(
+            [("groups", "Finance", "create", "planned")],
+            [(e.type, e.key, e.action, e.status) for e in events],
+        )
+        # users aren't declared, so they aren't synced
+        self.assertSetEqual({Group}, set(synced))
+        self.assertIsNone(manager._events)
+
+    @patch.object(MetabaseManager, "refresh_metabase")
+    @patch.object(MetabaseManager, "cache_metabase")
+    def test_iter_sync_declared_keys(self, *_):
+        """
+        Ensure a config that only declares users and groups plans no other actions,
+        unless other keys are selected.
+        """
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+        manager.parse_config(
+            [os.path.join(os.path.dirname(__file__), "fixtures/sync/metabase.yml")]
+        )
+        manager.registry = MetabaseRegistry(
+            client=None,
+            groups=[
+                metabase.PermissionGroup(_using=None, id=1, name="All Users"),
+                metabase.PermissionGroup(_using=None, id=2, name="Administrators"),
+                metabase.PermissionGroup(_using=None, id=3, name="Developers"),
+            ],
+            databases=[metabase.Database(_using=None, id=1, name="Warehouse")],
+            permissions=[
+                resources.DataPermission(
+                    _using=None,
+                    group_id=3,
+                    group="Developers",
+                    database_id=1,
+                    database="Warehouse",
+                    native="write",
+                    schemas="all",
+                )
+            ],
+        )
+
+        with patch.object(
+            MetabaseRegistry, "get_deactivated_emails", return_value=set()
+        ):
+            events = list(manager.iter_sync(dry_run=True))
+
+        self.assertListEqual(["groups", "users"], manager.get_selected_keys())
+        self.assertSetEqual({"groups", "users"}, {event.type for event in events})
+
+        manager.select = ["permissions"]
+        self.assertListEqual(["permissions"], manager.get_selected_keys())
+
+    @only_groups_and_users
+    @patch.object(MetabaseManager, "refresh_metabase")
+    @patch.object(MetabaseManager, "cache_metabase")
+    def test_sync(self, *_):
+        """Ensure MetabaseManager.sync() counts actions, and failures unless they stop it."""
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+        manager.config = MetabaseParser(
+            _groups={"Finance": Group(name="Finance"), "Sales": Group(name="Sales")}
+        )
+        manager.registry = MetabaseRegistry(client=None)
+
+        def create(self, using):
+            if self.name == "Sales":
+                raise ValueError("boom")
+
+        with patch.object(Group, "create", create):
+            with self.assertRaises(ValueError):
+                manager.sync()
+
+            manager.stop_on_error = False
+            result = manager.sync()
+
+        self.assertDictEqual({"groups": {"create": 2}}, result.counts)
+        self.assertFalse(result.ok)
+        self.assertListEqual(["Sales"], [event.key for event in result.errors])
+        self.assertIn("groups", result.timings)
+
+    @only_groups_and_users
+    def test_sync_lists_changed_dependencies(self):
+        """
+        Ensure a reused registry only lists the objects synced, and the objects they depend
+        on once changed.
+        """
+        manager = MetabaseManager(
+            select=["groups", "users"],
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        manager.config = MetabaseParser(_groups={"Finance": Group(name="Finance")})
+        manager.registry = MetabaseRegistry(client=None)
+        manager.registry._cached.update({"groups", "users"})
+
+        listed = []
+
+        def cache(select):
+            listed.extend(select)
+
+        with patch.object(MetabaseRegistry, "cache", side_effect=cache), patch.object(
+            Group, "create"
+        ):
+            # Finance is created, so groups are listed again along with users
+            manager.sync()
+            self.assertListEqual(["groups", "users", "groups"], listed)
+
+            # once Finance exists, groups don't change and users don't list them again
+            manager.registry.groups = [
+                metabase.PermissionGroup(_using=None, id=3, name="Finance")
+            ]
+            listed.clear()
+            manager.sync()
+            self.assertListEqual(["groups", "users"], listed)
+
+    @only_groups_and_users
+    def test_sync_lists_once(self):
+        """
+        Ensure objects listed up front by a first sync aren't listed again, unless objects
+        they depend on changed.
+        """
+        manager = MetabaseManager(
+            select=["groups", "users"],
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        manager.config = MetabaseParser(_groups={"Finance": Group(name="Finance")})
+        listed = []
+
+        def cache(select=None, exclude=None):
+            listed.extend(select)
+
+        with patch.object(MetabaseRegistry, "cache", side_effect=cache), patch.object(
+            Group, "create"
+        ):
+            manager.sync()
+
+        # Finance is created, so users are planned with the groups listed again
+        self.assertListEqual(["groups", "users", "users", "groups"], listed)
+
+    def test_map(self):
+        """Ensure MetabaseManager.map() calls a function on every Entity."""
+        manager = MetabaseManager(
+            max_concurrency=2,
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        users = [
+            User(email=f"{i}", first_name="my_first_name", last_name="my_last_name")
+            for i in range(5)
+        ]
+
+        self.assertListEqual(
+            ["0", "1", "2", "3", "4"], manager.map(lambda u: u.email, users)
+        )
+        self.assertListEqual([], manager.map(lambda u: u.email, []))
+        self.assertEqual(2, manager.client.limiter.ceiling)
+
+    def test_plan(self):
+        """Ensure MetabaseManager.plan() finds objects to create, update, and delete."""
+        manager = MetabaseManager(
+            metabase_host=None, metabase_user=None, metabase_password=None
+        )
+
+        with patch.object(
+            MetabaseManager, "find_objects_to_create", return_value=["c"]
+        ), patch.object(
+            MetabaseManager, "find_objects_to_update", return_value=["u"]
+        ), patch.object(
+            MetabaseManager, "find_objects_to_delete", return_value=["d"]
+        ):
+            plan = manager.plan(User)
+            self.assertEqual(User, plan.obj)
+            self.assertListEqual(["c"], plan.create)
+            self.assertListEqual(["u"], plan.update)
+            self.assertListEqual(["d"], plan.delete)
+
+            plan = manager.plan(User, delete=False)
+            self.assertListEqual([], plan.delete)
+
+    def test_estimate_duration(self):
+        """Ensure MetabaseManager.estimate_duration() uses recently observed latencies."""
+        manager = MetabaseManager(
+            max_concurrency=4,
+            metabase_host=None,
+            metabase_user=None,
+            metabase_password=None,
+        )
+        self.assertIsNone(manager.estimate_duration(100))
+
+        manager.client.limiter.recent_latency = 0.2
+        # the limiter starts with a single request in flight
+        self.assertAlmostEqual(20, manager.estimate_duration(100))
+
+        manager.client.limiter.limit = 4.0
+        self.assertAlmostEqual(5, manager.estimate_duration(100))
+
+        manager.max_rps = 10
+        self.assertAlmostEqual(10, manager.estimate_duration(100))
+
+    def test_check_budget(self):
+        """Ensure MetabaseManager.check_budget() raises when plans require too many requests."""
+        user = User(email="my_email", first_name="", last_name="")
+        plans = [
+            Plan(obj=Group, create=[Group(name="Developers")]),
+            Plan(obj=User, create=[user], update=[user]),
+        ]
+
+        MetabaseManager.check_budget(plans, max_requests=4)
+        with self.assertRaises(BudgetExceededError):
+            MetabaseManager.check_budget(plans, max_requests=3)
+
+        # a deactivated user is reactivated, then updated, once its creation fails
+        user.registry = MetabaseRegistry(client=None, users=[])
+        user.registry._deactivated = (user.registry.users, {"my_email"})
+        MetabaseManager.check_budget(plans, max_requests=6)
+        with self.assertRaises(BudgetExceededError):
+            MetabaseManager.check_budget(plans, max_requests=5)
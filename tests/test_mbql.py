@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+from metabase_manager.mbql import hash_definition, hash_sql, normalize, normalize_sql
+
+
+class MbqlTests(TestCase):
+    def test_normalize(self):
+        """Ensure equivalent MBQL definitions are normalized to the same value."""
+        self.assertDictEqual(
+            {"filter": ["=", ["field", 1, None], "paid"]},
+            normalize({":filter": ["=", ["field-id", 1], "paid"], "limit": None}),
+        )
+        self.assertDictEqual(
+            {"source-table": 2, "aggregation": [["count"]]},
+            normalize({"source_table": 2, "aggregation": [["COUNT"]], "breakout": []}),
+        )
+        self.assertListEqual(
+            ["field", 1, {"temporal-unit": "day"}],
+            normalize(["field", 1, {"temporal_unit": "day"}]),
+        )
+        self.assertListEqual(["field", 1, None], normalize(["field", 1, {}]))
+
+    def test_hash_definition(self):
+        """Ensure definitions hash equally regardless of key order and notation."""
+        self.assertEqual(
+            hash_definition(
+                {
+                    "filter": [
+                        "and",
+                        ["=", ["field", 1, None], 2],
+                        [">", ["field", 3], 4],
+                    ]
+                }
+            ),
+            hash_definition(
+                {
+                    "filter": [
+                        "and",
+                        ["=", ["field-id", 1], 2],
+                        [">", ["field", 3, {}], 4],
+                    ]
+                }
+            ),
+        )
+        self.assertEqual(
+            hash_definition({"a": 1, "b": 2}), hash_definition({"b": 2, "a": 1})
+        )
+        self.assertNotEqual(
+            hash_definition({"filter": ["=", ["field", 1, None], 2]}),
+            hash_definition({"filter": ["=", ["field", 1, None], 3]}),
+        )
+
+    def test_normalize_names(self):
+        """Ensure names chosen by users, and unknown tokens, are kept as they are written."""
+        self.assertDictEqual(
+            {
+                "expressions": {"Net_Total": ["-", ["field", 1, None], 2]},
+                "native": {"template-tags": {"Region_Id": {"display-name": "Region"}}},
+                "aggregation": [["Custom_Thing"]],
+            },
+            normalize(
+                {
+                    "expressions": {"Net_Total": ["-", ["field", 1], 2]},
+                    "native": {
+                        "template_tags": {"Region_Id": {"display_name": "Region"}}
+                    },
+                    "aggregation": [["Custom_Thing"]],
+                }
+            ),
+        )
+        self.assertNotEqual(
+            hash_definition({"expressions": {"Total": ["+", 1, 2]}}),
+            hash_definition({"expressions": {"total": ["+", 1, 2]}}),
+        )
+
+    def test_normalize_sql(self):
+        """Ensure line endings and surrounding whitespace don't change the hash of SQL."""
+        self.assertEqual(
+            "SELECT 1\nFROM t", normalize_sql("\nSELECT 1  \r\nFROM t\n\n")
+        )
+        self.assertEqual(hash_sql("SELECT 1\n"), hash_sql("SELECT 1"))
+        self.assertNotEqual(hash_sql("SELECT 1"), hash_sql("SELECT  1"))
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from metabase_manager.membership import Membership
+
+
+class MembershipTests(TestCase):
+    def setUp(self) -> None:
+        self.membership = Membership.from_members(
+            {
+                "Finance": ["CFO@example.com", "*@finance.example.com"],
+                "Analysts": ["analyst-*@example.com", "*@*.example.com"],
+                "Everyone": ["*@example.com"],
+            }
+        )
+
+    def test_get_groups(self):
+        """Ensure emails match groups by email, domain or pattern, ignoring case."""
+        self.assertSetEqual(
+            {"Finance", "Everyone"}, self.membership.get_groups("cfo@example.com")
+        )
+        self.assertSetEqual(
+            {"Finance", "Analysts"},
+            self.membership.get_groups("Jane@Finance.example.com"),
+        )
+        self.assertSetEqual(
+            {"Analysts", "Everyone"},
+            self.membership.get_groups("analyst-1@example.com"),
+        )
+        self.assertSetEqual(set(), self.membership.get_groups("jane@other.com"))
+
+    def test_expand(self):
+        """Ensure only emails that are members of a group are indexed."""
+        self.assertDictEqual(
+            {"jane@example.com": {"Everyone"}},
+            self.membership.expand(["jane@example.com", "jane@other.com"]),
+        )
+
+    def test_bool(self):
+        """Ensure a Membership without members is falsy."""
+        self.assertFalse(Membership.from_members({}))
+        self.assertTrue(self.membership)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from metabase_manager.metrics import BUCKETS, Metrics
+
+
+class MetricsTests(TestCase):
+    def test_observe(self):
+        """Ensure observations are counted in every bucket they fit in."""
+        metrics = Metrics()
+        metrics.observe("metabase_manager_fetch_seconds", 0.2, type="users")
+        metrics.observe("metabase_manager_fetch_seconds", 1000, type="users")
+
+        histogram = metrics.get("metabase_manager_fetch_seconds", type="users")
+        self.assertEqual(0, histogram[BUCKETS.index(0.1)])
+        self.assertEqual(1, histogram[BUCKETS.index(0.25)])
+        self.assertEqual(1, histogram[len(BUCKETS) - 1])
+        self.assertListEqual([1000.2, 2], histogram[-2:])
+
+    def test_render(self):
+        """Ensure metrics are rendered in the text format of Prometheus."""
+        metrics = Metrics()
+        self.assertEqual("", metrics.render())
+
+        metrics.inc("metabase_manager_actions_total", type="users", action="create")
+        metrics.inc("metabase_manager_actions_total", type="users", action="create")
+        metrics.set("metabase_manager_last_sync_timestamp_seconds", 1650000000.25)
+        metrics.observe("metabase_manager_sync_seconds", 12)
+
+        lines = metrics.render().splitlines()
+        self.assertIn("# TYPE metabase_manager_actions_total counter", lines)
+        self.assertIn(
+            'metabase_manager_actions_total{action="create",type="users"} 2', lines
+        )
+        self.assertIn(
+            "metabase_manager_last_sync_timestamp_seconds 1650000000.25", lines
+        )
+        self.assertIn('metabase_manager_sync_seconds_bucket{le="10"} 0', lines)
+        self.assertIn('metabase_manager_sync_seconds_bucket{le="+Inf"} 1', lines)
+        self.assertIn("metabase_manager_sync_seconds_sum 12", lines)
+
+    def test_format_labels(self):
+        """Ensure values of labels are escaped."""
+        self.assertEqual(
+            '{key="a \\"b\\"\\n"}', Metrics.format_labels((("key", 'a "b"\n'),))
+        )
+
+    def test_write(self):
+        """Ensure metrics are written to a file, replacing the previous one."""
+        metrics = Metrics()
+        metrics.inc("metabase_manager_http_retries_total", status=429)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metabase.prom")
+            with open(path, "w") as f:
+                f.write("previous")
+
+            metrics.write(path)
+
+            with open(path) as f:
+                self.assertEqual(metrics.render(), f.read())
+            self.assertListEqual(["metabase.prom"], os.listdir(directory))
@@ -2,8 +2,11 @@ import os
 from pathlib import Path
 from unittest import TestCase
 
+from metabase import User as MetabaseUser
+
 from metabase_manager.exceptions import InvalidConfigError
-from metabase_manager.parser import Group, MetabaseParser, User
+from metabase_manager.parser import Group, MetabaseParser, Permission, User
+from metabase_manager.registry import MetabaseRegistry
 
 
 class MetabaseParserTests(TestCase):
@@ -60,6 +63,23 @@ class MetabaseParserTests(TestCase):
         with self.assertRaises(InvalidConfigError):
             parser.parse_yaml({"unknown": {"something": ""}})
 
+    def test_validate(self):
+        """Ensure the cache TTL of a database can't be declared in two places."""
+        conf = MetabaseParser()
+        conf.parse_yaml(
+            {
+                "databases": [
+                    {"name": "Warehouse", "engine": "postgres", "cache_ttl": 24}
+                ],
+                "caching": [{"model": "database", "name": "Warehouse", "ttl": 12}],
+            }
+        )
+        with self.assertRaises(InvalidConfigError):
+            conf.validate()
+
+        conf._databases["Warehouse"].cache_ttl = None
+        conf.validate()
+
     def test_register_objects(self):
         """Ensure MetabaseParser.register_objects() registers all objects of the same type in a list of dicts."""
         objects = [{"name": "Administrators"}, {"name": "Developers"}]
@@ -89,3 +109,148 @@ class MetabaseParserTests(TestCase):
 
         with self.assertRaises(KeyError):
             conf.register_object(user, "users")
+
+    def test_parse_yaml_permissions(self):
+        """Ensure MetabaseParser.parse_yaml() registers permissions by group and database."""
+        parser = MetabaseParser()
+        parser.parse_yaml(
+            {
+                "permissions": [
+                    {"group": "Finance", "database": "Warehouse", "schemas": "all"},
+                    {"group": "Finance", "database": "Sample", "native": "write"},
+                ]
+            }
+        )
+
+        self.assertSetEqual(
+            {"Finance/Warehouse", "Finance/Sample"}, set(parser._permissions.keys())
+        )
+        self.assertEqual(
+            parser.permissions, parser.get_instances_for_object(Permission)
+        )
+
+    def test_parse_yaml_collections(self):
+        """Ensure MetabaseParser.parse_yaml() registers collections by path."""
+        parser = MetabaseParser()
+        parser.parse_yaml(
+            {
+                "collections": [{"path": "Finance"}, {"path": "/Finance/Reports/"}],
+                "collection_permissions": [
+                    {"group": "Finance", "collection": "/Finance", "access": "write"}
+                ],
+            }
+        )
+
+        self.assertSetEqual(
+            {"/Finance", "/Finance/Reports"}, set(parser._collections.keys())
+        )
+        self.assertSetEqual(
+            {"Finance:/Finance"}, set(parser._collection_permissions.keys())
+        )
+
+    def test_parse_yaml_metadata(self):
+        """Ensure MetabaseParser.parse_yaml() registers tables and fields by name."""
+        parser = MetabaseParser()
+        parser.parse_yaml(
+            {
+                "tables": [
+                    {"database": "Warehouse", "schema": "public", "name": "orders"}
+                ],
+                "fields": [
+                    {
+                        "database": "Warehouse",
+                        "schema": "public",
+                        "table": "orders",
+                        "name": "id",
+                        "description": "Order id",
+                    }
+                ],
+            }
+        )
+
+        self.assertListEqual(["Warehouse.public.orders"], list(parser._tables))
+        self.assertListEqual(["Warehouse.public.orders.id"], list(parser._fields))
+
+    def test_expand_members(self):
+        """
+        Ensure members declared on groups are added to the groups of users, and users
+        of Metabase that are only members of a group are managed.
+        """
+        parser = MetabaseParser()
+        parser.parse_yaml(
+            {
+                "groups": [
+                    {"name": "Finance", "members": ["*@finance.example.com"]},
+                    {"name": "Developers", "members": ["dev@example.com"]},
+                ],
+                "users": [
+                    {
+                        "first_name": "Dev",
+                        "last_name": "Eloper",
+                        "email": "dev@example.com",
+                        "groups": ["Developers"],
+                    }
+                ],
+            }
+        )
+        registry = MetabaseRegistry(
+            client=None,
+            users=[
+                MetabaseUser(
+                    _using=None,
+                    first_name="Jane",
+                    last_name="Doe",
+                    email="jane@finance.example.com",
+                ),
+                MetabaseUser(
+                    _using=None,
+                    first_name="John",
+                    last_name="Doe",
+                    email="john@example.com",
+                ),
+            ],
+        )
+
+        parser.expand_members(registry)
+        parser.expand_members(registry)
+
+        self.assertSetEqual(
+            {"dev@example.com", "jane@finance.example.com"}, set(parser._users.keys())
+        )
+        self.assertListEqual(
+            ["Developers"], [g.name for g in parser._users["dev@example.com"].groups]
+        )
+        self.assertListEqual(
+            ["Finance"],
+            [g.name for g in parser._users["jane@finance.example.com"].groups],
+        )
+
+    def test_get_declared_keys(self):
+        """
+        Ensure keys found in the config are declared even without objects, unlike users
+        that are only members of groups.
+        """
+        parser = MetabaseParser()
+        parser.parse_yaml(
+            {
+                "groups": [{"name": "Finance", "members": ["*@example.com"]}],
+                "caching": [],
+            }
+        )
+        registry = MetabaseRegistry(
+            client=None,
+            users=[
+                MetabaseUser(
+                    _using=None, first_name="J", last_name="D", email="j@example.com"
+                )
+            ],
+        )
+        parser.expand_members(registry)
+
+        self.assertSetEqual({"groups", "caching"}, parser.get_declared_keys())
+        self.assertSetEqual(
+            {"permissions"},
+            MetabaseParser(
+                _permissions={"g/d": Permission(group="g", database="d")}
+            ).get_declared_keys(),
+        )
@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from metabase_manager.entities import Group, User
+from metabase_manager.plan import Plan
+
+
+class PlanTests(TestCase):
+    def test_len(self):
+        """Ensure len(Plan) is the number of changes in the Plan."""
+        plan = Plan(
+            obj=Group,
+            create=[Group(name="a")],
+            update=[Group(name="b")],
+            delete=[Group(name="c"), Group(name="d")],
+        )
+
+        self.assertEqual(4, len(plan))
+        self.assertEqual(0, len(Plan(obj=Group)))
+
+    def test_requests(self):
+        """Ensure Plan.requests sums the estimated requests of every change."""
+        users = [User(email=f"{i}", first_name="", last_name="") for i in range(3)]
+        plan = Plan(obj=User, create=users[:2], update=users[2:], delete=users)
+
+        # 2 * (create + invite) + 1 update + 3 deletes
+        self.assertEqual(8, plan.requests)
+
+        groups = [Group(name="a"), Group(name="b")]
+        plan = Plan(obj=Group, create=groups, update=groups, delete=groups[:1])
+
+        # groups are never updated
+        self.assertEqual(3, plan.requests)
@@ -1,9 +1,26 @@
+from unittest import TestCase
 from unittest.mock import patch
 
-from metabase import PermissionGroup, User
+from metabase import Database, PermissionGroup, User
 
 from metabase_manager.exceptions import DuplicateKeyError
 from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.resources import (
+    CachePolicy,
+    Card,
+    Collection,
+    CollectionPermission,
+    Dashboard,
+    DataPermission,
+    FieldMetadata,
+    Metric,
+    Sandbox,
+    Segment,
+    Setting,
+    Snippet,
+    Subscription,
+    TableMetadata,
+)
 from tests.helpers import IntegrationTestCase
 
 
@@ -12,9 +29,44 @@ class MetabaseRegistryTests(IntegrationTestCase):
         """Ensure MetabaseRegistry.get_registry_keys() returns all keys in cls._REGISTRY."""
         registry = MetabaseRegistry(client=None)
 
-        self.assertListEqual(["groups", "users"], registry.get_registry_keys())
-
-    def test_cache(self):
+        self.assertListEqual(
+            [
+                "groups",
+                "users",
+                "databases",
+                "permissions",
+                "collections",
+                "collection_permissions",
+                "tables",
+                "fields",
+                "segments",
+                "metrics",
+                "cards",
+                "dashboards",
+                "settings",
+                "caching",
+                "sandboxes",
+                "subscriptions",
+                "snippets",
+            ],
+            registry.get_registry_keys(),
+        )
+
+    @patch.object(Snippet, "list", return_value=[])
+    @patch.object(Subscription, "list", return_value=[])
+    @patch.object(Sandbox, "list", return_value=[])
+    @patch.object(CachePolicy, "list", return_value=[])
+    @patch.object(Setting, "list", return_value=[])
+    @patch.object(Dashboard, "list", return_value=[])
+    @patch.object(Card, "list", return_value=[])
+    @patch.object(Metric, "list", return_value=[])
+    @patch.object(Segment, "list", return_value=[])
+    @patch.object(TableMetadata, "list", return_value=[])
+    @patch.object(Database, "list", return_value=[])
+    @patch.object(CollectionPermission, "list", return_value=[])
+    @patch.object(Collection, "list", return_value=[])
+    @patch.object(DataPermission, "list", return_value=[])
+    def test_cache(self, *_):
         """Ensure MetabaseRegistry.cache() sets all a"""
         registry = MetabaseRegistry(client=None)
 
@@ -106,3 +158,65 @@ class MetabaseRegistryTests(IntegrationTestCase):
 
         with self.assertRaises(DuplicateKeyError):
             registry.get_group_by_name("Administrators")
+
+
+class MetabaseRegistryCacheTests(TestCase):
+    def test_get_members(self):
+        """Ensure members of groups are indexed once, and again when users change."""
+        registry = MetabaseRegistry(
+            client=None,
+            users=[
+                User(_using=None, id=1, email="a@example.com", group_ids=[1, 3]),
+                User(_using=None, id=2, email="b@example.com", group_ids=[1]),
+            ],
+        )
+
+        members = registry.get_members()
+        self.assertDictEqual(
+            {1: {"a@example.com", "b@example.com"}, 3: {"a@example.com"}}, members
+        )
+        self.assertIs(members, registry.get_members())
+
+        registry.add(
+            "users", User(_using=None, id=3, email="c@example.com", group_ids=[3])
+        )
+        self.assertSetEqual(
+            {"a@example.com", "c@example.com"}, registry.get_members()[3]
+        )
+
+    def test_get_deactivated_emails(self):
+        """Ensure deactivated users are listed once, and again when users are replaced."""
+        registry = MetabaseRegistry(client=None, users=[])
+        deactivated = [User(_using=None, id=4, email="d@example.com")]
+
+        with patch.object(User, "list", return_value=deactivated) as list_:
+            self.assertSetEqual({"d@example.com"}, registry.get_deactivated_emails())
+            registry.get_deactivated_emails()
+            list_.assert_called_once_with(using=None, status="deactivated")
+
+            registry.users = []
+            registry.get_deactivated_emails()
+            self.assertEqual(2, list_.call_count)
+
+    def test_cache_nested(self):
+        """Ensure fields are read along with their tables, rather than fetched again."""
+        registry = MetabaseRegistry(client=None)
+        fields = [FieldMetadata(_using=None, id=1), FieldMetadata(_using=None, id=2)]
+        tables = [TableMetadata(_using=None, id=1, fields=fields)]
+
+        with patch.object(
+            TableMetadata, "list", return_value=tables
+        ) as table, patch.object(FieldMetadata, "list") as field:
+            registry.cache(select=["tables", "fields"])
+
+            self.assertEqual(1, table.call_count)
+            self.assertFalse(field.called)
+            self.assertEqual(fields, registry.fields)
+
+        with patch.object(TableMetadata, "list") as table, patch.object(
+            FieldMetadata, "list", return_value=fields
+        ) as field:
+            registry.cache(select=["fields"])
+
+            self.assertFalse(table.called)
+            self.assertTrue(field.called)
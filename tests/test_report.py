@@ -0,0 +1,140 @@
+import json
+from io import StringIO
+from unittest import TestCase
+
+from metabase_manager.entities import Group
+from metabase_manager.report import (
+    CompactReporter,
+    Event,
+    HumanReporter,
+    JsonReporter,
+    SyncResult,
+)
+
+
+class ReporterTests(TestCase):
+    def setUp(self) -> None:
+        self.events = [
+            Event(
+                type="groups",
+                key="Finance",
+                action="create",
+                status="done",
+                duration=0.5,
+                entity=Group(name="Finance"),
+            ),
+            Event(
+                type="groups",
+                key="Sales",
+                action="delete",
+                status="failed",
+                error="Not found",
+                entity=Group(name="Sales"),
+            ),
+        ]
+
+    def test_buffer(self):
+        """Ensure lines are only written once the buffer is full, or flushed."""
+        stream = StringIO()
+        reporter = HumanReporter(stream=stream, buffer_size=2)
+
+        reporter.report(self.events[0])
+        self.assertEqual("", stream.getvalue())
+
+        reporter.report(self.events[1])
+        self.assertListEqual(
+            [
+                "[CREATE] Group(name='Finance')",
+                "[FAILED] [DELETE] Group(name='Sales'): Not found",
+            ],
+            stream.getvalue().splitlines(),
+        )
+
+        reporter.log("Done.")
+        reporter.close()
+        self.assertEqual("Done.", stream.getvalue().splitlines()[-1])
+
+    def test_compact(self):
+        """Ensure CompactReporter only writes the number of actions per type."""
+        stream = StringIO()
+        reporter = CompactReporter(stream=stream)
+        for event in self.events:
+            reporter.report(event)
+        reporter.close()
+
+        self.assertEqual(
+            "groups: create=1 update=0 delete=0 failed=1\n", stream.getvalue()
+        )
+
+    def test_compact_totals(self):
+        """Ensure the counts of CompactReporter add up to the number of actions."""
+        reporter = CompactReporter(stream=StringIO())
+        for action, status in [
+            ("create", "done"),
+            ("create", "failed"),
+            ("update", "done"),
+            ("update", "done"),
+            ("delete", "failed"),
+        ]:
+            reporter.report(
+                Event(type="users", key="a@example.com", action=action, status=status)
+            )
+
+        [line] = reporter.get_summary()
+        counts = dict(count.split("=") for count in line.split(": ")[1].split())
+        self.assertDictEqual(
+            {"create": "1", "update": "2", "delete": "0", "failed": "2"}, counts
+        )
+        self.assertEqual(5, sum(int(n) for n in counts.values()))
+
+    def test_jsonl(self):
+        """Ensure JsonReporter writes one event per line."""
+        stream = StringIO()
+        reporter = JsonReporter(stream=stream)
+        for event in self.events:
+            reporter.report(event)
+        reporter.close()
+
+        events = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertDictEqual(
+            {
+                "type": "groups",
+                "key": "Finance",
+                "action": "create",
+                "status": "done",
+                "changes": [],
+                "duration": 0.5,
+                "error": None,
+            },
+            events[0],
+        )
+        self.assertEqual("failed", events[1]["status"])
+
+
+class SyncResultTests(TestCase):
+    def test_add(self):
+        """Ensure timings are the time elapsed per type, not the sum of concurrent actions."""
+        result = SyncResult()
+        for key, started, duration in [
+            ("a", 10.0, 2.0),
+            ("b", 10.5, 2.0),
+            ("c", 13.0, 1.0),
+        ]:
+            result.add(
+                Event(
+                    type="users",
+                    key=key,
+                    action="create",
+                    status="done",
+                    duration=duration,
+                    started=started,
+                )
+            )
+        result.add(
+            Event(type="groups", key="Finance", action="create", status="planned")
+        )
+
+        self.assertDictEqual(
+            {"users": {"create": 3}, "groups": {"create": 1}}, result.counts
+        )
+        self.assertDictEqual({"users": 4.0}, result.timings)
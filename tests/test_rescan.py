@@ -0,0 +1,144 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from metabase import Database
+
+from metabase_manager.exceptions import NotFoundError
+from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.rescan import Rescan
+from metabase_manager.resources import TableMetadata
+
+
+class RescanTests(TestCase):
+    def setUp(self) -> None:
+        self.client = Mock()
+        self.registry = MetabaseRegistry(client=self.client)
+        self.databases = [
+            Database(_using=self.client, id=2, name="Warehouse"),
+            Database(_using=self.client, id=3, name="Sample"),
+        ]
+        self.tables = [
+            TableMetadata(
+                _using=self.client, id=i, database="Warehouse", schema=schema, name=name
+            )
+            for i, schema, name in [
+                (10, "public", "orders"),
+                (11, "public", "refunds"),
+                (12, "staging", "orders"),
+            ]
+        ]
+
+    def cache(self, select):
+        self.registry.databases = self.databases
+        if "tables" in select:
+            self.registry.tables = self.tables
+
+    def test_parse_selector(self):
+        """Ensure selectors are split into database, schema and table."""
+        self.assertTupleEqual(
+            ("Warehouse", None, None), Rescan.parse_selector("Warehouse")
+        )
+        self.assertTupleEqual(
+            ("Warehouse", "public", "orders.2022"),
+            Rescan.parse_selector("Warehouse.public.orders.2022"),
+        )
+
+        with self.assertRaises(ValueError):
+            Rescan.parse_selector("Warehouse..orders")
+
+    def test_get_targets(self):
+        """Ensure selectors limit the databases and tables to rescan."""
+        with patch.object(MetabaseRegistry, "cache", side_effect=self.cache) as cache:
+            targets = Rescan(registry=self.registry).get_targets()
+            self.assertListEqual([(d, None) for d in self.databases], targets)
+            self.assertIsNone(cache.assert_called_once_with(select=["databases"]))
+
+            targets = Rescan(
+                registry=self.registry,
+                select=["Warehouse.public", "Warehouse.public.orders", "Sample"],
+            ).get_targets()
+            self.assertListEqual(
+                [(self.databases[0], self.tables[:2]), (self.databases[1], None)],
+                targets,
+            )
+
+            targets = Rescan(
+                registry=self.registry, select=["Warehouse.public.orders", "Warehouse"]
+            ).get_targets()
+            self.assertListEqual([(self.databases[0], None)], targets)
+
+            with self.assertRaises(NotFoundError):
+                Rescan(registry=self.registry, select=["Unknown"]).get_targets()
+
+            with self.assertRaises(NotFoundError):
+                Rescan(registry=self.registry, select=["Warehouse.other"]).get_targets()
+
+    def test_run_database(self):
+        """Ensure the schema is synced, then field values rescanned, waiting for each."""
+        tasks = []
+
+        def post(endpoint):
+            action = endpoint.rsplit("/", 1)[-1]
+            tasks.append(
+                {"id": len(tasks) + 1, "db_id": 2, "task": Rescan.TASKS[action]}
+            )
+            return Mock(status_code=200)
+
+        self.client.post.side_effect = post
+        self.client.get.side_effect = lambda endpoint, params: Mock(
+            status_code=200, json=lambda: {"data": list(tasks)}
+        )
+
+        result = Rescan(registry=self.registry, poll_interval=0).run_database(
+            self.databases[0], None
+        )
+
+        self.assertIsNone(result.error)
+        self.assertEqual("Warehouse", result.database)
+        self.assertListEqual(
+            ["sync-metadata", "cache-field-values"], [t["task"] for t in tasks]
+        )
+
+    def test_run_database_timeout(self):
+        """Ensure a database whose rescan doesn't complete in time is reported as failed."""
+        self.client.post.return_value = Mock(status_code=200)
+        self.client.get.return_value = Mock(status_code=200, json=lambda: {"data": []})
+
+        result = Rescan(
+            registry=self.registry, poll_interval=0, timeout=0
+        ).run_database(self.databases[0], None)
+
+        self.assertIn("did not complete", result.error)
+
+    def test_run_tables(self):
+        """Ensure tables are synced and rescanned one by one, without waiting."""
+        self.client.post.return_value = Mock(status_code=200)
+
+        result = Rescan(registry=self.registry, rescan_values=False).run_database(
+            self.databases[0], self.tables[:2]
+        )
+
+        self.assertEqual(2, result.tables)
+        self.assertListEqual(
+            ["/api/table/10/sync_schema", "/api/table/11/sync_schema"],
+            [c.args[0] for c in self.client.post.call_args_list],
+        )
+        self.assertFalse(self.client.get.called)
+
+    def test_run(self):
+        """Ensure no more than max_concurrency databases are rescanned at once."""
+        running = []
+        peak = []
+
+        def run_database(database, tables):
+            running.append(database)
+            peak.append(len(running))
+            running.remove(database)
+            return database.name
+
+        rescan = Rescan(registry=self.registry, max_concurrency=1)
+        with patch.object(
+            MetabaseRegistry, "cache", side_effect=self.cache
+        ), patch.object(rescan, "run_database", side_effect=run_database):
+            self.assertSetEqual({"Warehouse", "Sample"}, set(rescan.run()))
+            self.assertEqual(1, max(peak))
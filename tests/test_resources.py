@@ -0,0 +1,533 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from metabase import Database, PermissionGroup, Table
+from requests import HTTPError
+
+from metabase_manager.mbql import hash_sql
+from metabase_manager.resources import (
+    CachePolicy,
+    Collection,
+    CollectionGraph,
+    CollectionPermission,
+    Dashboard,
+    DataPermission,
+    FieldMetadata,
+    PermissionsGraph,
+    Sandbox,
+    Segment,
+    Setting,
+    Snippet,
+    Subscription,
+    TableMetadata,
+)
+
+
+class PermissionsGraphTests(TestCase):
+    def test_update(self):
+        """Ensure PermissionsGraph.update() sends the revision and the changed groups."""
+        using = Mock()
+        using.put.return_value = Mock(status_code=200, json=lambda: {"revision": 4})
+        graph = PermissionsGraph(_using=using, revision=3, groups={})
+
+        graph.update({"1": {"2": {"data": {"native": "write"}}}})
+
+        self.assertIsNone(
+            using.put.assert_called_once_with(
+                "/api/permissions/graph",
+                json={
+                    "revision": 3,
+                    "groups": {"1": {"2": {"data": {"native": "write"}}}},
+                },
+            )
+        )
+        self.assertEqual(4, graph.revision)
+
+        using.put.return_value = Mock(status_code=409, content=b"conflict")
+        with self.assertRaises(HTTPError):
+            graph.update({})
+
+
+class DataPermissionTests(TestCase):
+    def test_list(self):
+        """
+        Ensure DataPermission.list() returns the permissions of every group on every database,
+        with table names instead of ids.
+        """
+        graph = PermissionsGraph(
+            _using=None,
+            revision=3,
+            groups={
+                "1": {"2": {"data": {"native": "write", "schemas": "all"}}},
+                "4": {"2": {"data": {"schemas": {"public": {"10": "all"}}}}},
+            },
+        )
+        groups = [
+            PermissionGroup(_using=None, id=1, name="All Users"),
+            PermissionGroup(_using=None, id=4, name="Finance"),
+        ]
+        databases = [
+            Database(_using=None, id=2, name="Warehouse"),
+            Database(_using=None, id=3, name="Sample"),
+        ]
+        tables = [Table(_using=None, id=10, db_id=2, schema="public", name="orders")]
+
+        with patch.object(PermissionsGraph, "get", return_value=graph), patch.object(
+            PermissionGroup, "list", return_value=groups
+        ), patch.object(Database, "list", return_value=databases), patch.object(
+            Table, "list", return_value=tables
+        ):
+            permissions = DataPermission.list(using=None)
+
+        self.assertEqual(4, len(permissions))
+        cells = {(p.group, p.database): p for p in permissions}
+
+        self.assertEqual("write", cells[("All Users", "Warehouse")].native)
+        self.assertEqual("all", cells[("All Users", "Warehouse")].schemas)
+        self.assertEqual("none", cells[("Finance", "Warehouse")].native)
+        self.assertEqual(
+            {"public": {"orders": "all"}}, cells[("Finance", "Warehouse")].schemas
+        )
+        self.assertEqual("none", cells[("Finance", "Sample")].schemas)
+        self.assertEqual(
+            10, cells[("Finance", "Warehouse")].get_table_id("public", "orders")
+        )
+        self.assertTrue(all(p.graph is graph for p in permissions))
+
+
+class CollectionTests(TestCase):
+    def test_list(self):
+        """Ensure Collection.list() flattens the collection tree into paths."""
+        using = Mock()
+        using.get.return_value = Mock(
+            status_code=200,
+            json=lambda: [
+                {
+                    "id": 1,
+                    "name": "Finance",
+                    "children": [
+                        {"id": 2, "name": "Reports", "archived": True, "children": []}
+                    ],
+                },
+                {"id": 3, "name": "Jane's Collection", "personal_owner_id": 1},
+            ],
+        )
+
+        collections = {c.path: c for c in Collection.list(using=using)}
+
+        self.assertSetEqual({"/Finance", "/Finance/Reports"}, set(collections))
+        self.assertIsNone(collections["/Finance"].parent_id)
+        self.assertEqual(1, collections["/Finance/Reports"].parent_id)
+        self.assertTrue(collections["/Finance/Reports"].archived)
+        self.assertIsNone(using.get.assert_called_once_with("/api/collection/tree"))
+
+
+class CollectionPermissionTests(TestCase):
+    def test_list(self):
+        """Ensure CollectionPermission.list() returns permissions other than none by path."""
+        graph = CollectionGraph(
+            _using=None,
+            revision=2,
+            groups={
+                "4": {"root": "read", "1": "write", "2": "none", "99": "write"},
+                "5": {"root": "read"},
+            },
+        )
+        groups = [PermissionGroup(_using=None, id=4, name="Finance")]
+        collections = [
+            Collection(_using=None, id=1, path="/Finance"),
+            Collection(_using=None, id=2, path="/Finance/Reports"),
+        ]
+
+        with patch.object(CollectionGraph, "get", return_value=graph), patch.object(
+            PermissionGroup, "list", return_value=groups
+        ), patch.object(Collection, "list", return_value=collections):
+            permissions = CollectionPermission.list(using=None)
+
+        self.assertDictEqual(
+            {"/": "read", "/Finance": "write"},
+            {p.collection: p.access for p in permissions},
+        )
+        self.assertTrue(all(p.group == "Finance" for p in permissions))
+
+
+class TableMetadataTests(TestCase):
+    def test_list(self):
+        """Ensure TableMetadata.list() reads tables and fields from the metadata of each database."""
+        using = Mock()
+        using.get.side_effect = lambda endpoint, params: Mock(
+            status_code=200,
+            json=lambda: {
+                "name": "Warehouse"
+                if endpoint == "/api/database/2/metadata"
+                else "Sample",
+                "tables": [
+                    {
+                        "id": 10,
+                        "name": "orders",
+                        "schema": "public",
+                        "fields": [{"id": 100, "name": "id"}],
+                    }
+                ],
+            },
+        )
+        databases = [
+            Database(_using=None, id=2, name="Warehouse"),
+            Database(_using=None, id=3, name="Sample"),
+        ]
+
+        with patch.object(Database, "list", return_value=databases):
+            tables = TableMetadata.list(using=using)
+
+        self.assertListEqual(["Warehouse", "Sample"], [t.database for t in tables])
+        field = tables[0].fields[0]
+        self.assertEqual(
+            ("Warehouse", "public", "orders"),
+            (field.database, field.schema, field.table),
+        )
+        self.assertEqual(2, using.get.call_count)
+        self.assertIsNone(
+            using.get.assert_any_call(
+                "/api/database/3/metadata", params={"include_hidden": "true"}
+            )
+        )
+
+    def test_update_many(self):
+        """Ensure TableMetadata.update_many() updates several tables in a single request."""
+        using = Mock()
+        using.put.return_value = Mock(status_code=200)
+
+        TableMetadata.update_many(using=using, ids=[1, 2], visibility_type="hidden")
+
+        self.assertIsNone(
+            using.put.assert_called_once_with(
+                "/api/table", json={"ids": [1, 2], "visibility_type": "hidden"}
+            )
+        )
+
+
+class FieldMetadataTests(TestCase):
+    def test_update(self):
+        """Ensure FieldMetadata.update() only sends the given attributes."""
+        using = Mock()
+        using.put.return_value = Mock(status_code=200)
+        field = FieldMetadata(_using=using, id=100, description=None)
+
+        field.update(description="Order id")
+
+        self.assertIsNone(
+            using.put.assert_called_once_with(
+                "/api/field/100", json={"description": "Order id"}
+            )
+        )
+        self.assertEqual("Order id", field.description)
+
+
+class SegmentTests(TestCase):
+    def test_list(self):
+        """Ensure Segment.list() names the table of each segment and hashes its definition."""
+        using = Mock()
+        using.get.return_value = Mock(
+            status_code=200,
+            json=lambda: [
+                {
+                    "id": 1,
+                    "name": "Paid",
+                    "table_id": 10,
+                    "definition": {
+                        "source-table": 10,
+                        "filter": ["=", ["field", 1, None], 2],
+                    },
+                }
+            ],
+        )
+        tables = [
+            Table(
+                _using=None,
+                id=10,
+                db={"name": "Warehouse"},
+                schema="public",
+                name="orders",
+            )
+        ]
+
+        with patch.object(Table, "list", return_value=tables):
+            segments = Segment.list(using=using)
+
+        self.assertEqual("Warehouse.public.orders", segments[0].table)
+        self.assertEqual(
+            Segment.hash_definition({"filter": ["=", ["field-id", 1], 2]}),
+            segments[0].definition_hash,
+        )
+        self.assertIsNone(using.get.assert_called_once_with("/api/segment"))
+
+
+class DashboardTests(TestCase):
+    def test_list(self):
+        """Ensure Dashboard.list() fetches the cards of every dashboard that isn't archived."""
+        dashboards = {
+            1: {
+                "id": 1,
+                "name": "Revenue",
+                "collection_id": 7,
+                "description": None,
+                "parameters": [],
+                "ordered_cards": [
+                    {
+                        "id": 10,
+                        "card_id": 3,
+                        "row": 0,
+                        "col": 0,
+                        "size_x": 4,
+                        "size_y": 4,
+                    }
+                ],
+            }
+        }
+        using = Mock()
+        using.get.side_effect = lambda endpoint: Mock(
+            status_code=200,
+            json=lambda: [
+                {"id": 1, "archived": False},
+                {"id": 2, "archived": True},
+            ]
+            if endpoint == "/api/dashboard"
+            else dashboards[int(endpoint.rsplit("/", 1)[-1])],
+        )
+
+        with patch.object(
+            Collection,
+            "list",
+            return_value=[Collection(_using=None, id=7, path="/Finance")],
+        ):
+            records = Dashboard.list(using=using)
+
+        self.assertEqual(1, len(records))
+        self.assertEqual("/Finance", records[0].collection_path)
+        self.assertEqual(
+            Dashboard.hash_dashcards(
+                [{"card_id": 3, "row": 0, "col": 0, "size_x": 4, "size_y": 4}]
+            ),
+            records[0].dashcards_hash,
+        )
+        self.assertEqual(2, using.get.call_count)
+
+    def test_update_dashcards(self):
+        """Ensure the cards of a dashboard are replaced in a single request."""
+        using = Mock()
+        using.put.return_value = Mock(status_code=200)
+        dashboard = Dashboard(_using=using, id=1, dashcards=[{"id": 10, "card_id": 3}])
+
+        dashboard.update_dashcards([{"card_id": 4, "row": 0}, {"card_id": 3, "row": 4}])
+
+        self.assertIsNone(
+            using.put.assert_called_once_with(
+                "/api/dashboard/1/cards",
+                json={
+                    "cards": [
+                        {"id": -1, "card_id": 4, "row": 0},
+                        {"id": 10, "card_id": 3, "row": 4},
+                    ]
+                },
+            )
+        )
+
+
+class SettingTests(TestCase):
+    def test_update_many(self):
+        """Ensure Setting.update_many() updates several settings in a single request."""
+        using = Mock()
+        using.put.return_value = Mock(status_code=204)
+
+        Setting.update_many(
+            using=using, values={"site-name": "Acme", "enable-embedding": True}
+        )
+
+        self.assertIsNone(
+            using.put.assert_called_once_with(
+                "/api/setting", json={"site-name": "Acme", "enable-embedding": True}
+            )
+        )
+
+        using.put.return_value = Mock(status_code=400, content=b"invalid")
+        with self.assertRaises(HTTPError):
+            Setting.update_many(using=using, values={})
+
+    def test_is_redacted(self):
+        """Ensure values obfuscated by Metabase are detected."""
+        self.assertTrue(Setting(_using=None, value="**********et").is_redacted)
+        self.assertFalse(Setting(_using=None, value="secret").is_redacted)
+        self.assertFalse(Setting(_using=None, value=None).is_redacted)
+
+
+class CachePolicyTests(TestCase):
+    def test_list(self):
+        """Ensure CachePolicy.list() reads the policy of every model with one request per model."""
+        responses = {
+            "/api/setting": [
+                {"key": "enable-query-caching", "value": True, "default": False},
+                {"key": "query-caching-ttl-ratio", "value": None, "default": 10},
+            ],
+            "/api/dashboard": [
+                {"id": 1, "name": "Sales", "collection_id": None, "cache_ttl": 6},
+                {"id": 2, "name": "Old", "collection_id": 7, "archived": True},
+            ],
+            "/api/card": [
+                {"id": 3, "name": "Orders", "collection_id": 7},
+                {"id": 4, "name": "Mine", "collection_id": 8, "cache_ttl": 1},
+            ],
+        }
+        using = Mock()
+        using.get.side_effect = lambda endpoint: Mock(
+            status_code=200, json=lambda: responses[endpoint]
+        )
+
+        with patch.object(
+            Database,
+            "list",
+            return_value=[Database(_using=None, id=2, name="Warehouse", cache_ttl=24)],
+        ), patch.object(
+            Collection,
+            "list",
+            return_value=[Collection(_using=None, id=7, path="/Finance")],
+        ):
+            policies = {p.key: p for p in CachePolicy.list(using=using)}
+
+        self.assertListEqual(
+            ["root", "database:Warehouse", "dashboard:/:Sales", "card:/Finance:Orders"],
+            list(policies),
+        )
+        self.assertTrue(policies["root"].enabled)
+        self.assertEqual(10, policies["root"].ttl_ratio)
+        self.assertEqual(24, policies["database:Warehouse"].ttl)
+        self.assertIsNone(policies["card:/Finance:Orders"].ttl)
+
+    def test_update(self):
+        """Ensure the root policy is updated through settings, and others through their object."""
+        using = Mock()
+        using.put.return_value = Mock(status_code=200)
+
+        CachePolicy(_using=using, model="root").update(enabled=True, ttl_ratio=20)
+        CachePolicy(_using=using, model="card", model_id=3).update(ttl=None)
+
+        self.assertListEqual(
+            [
+                (
+                    ("/api/setting",),
+                    {
+                        "json": {
+                            "enable-query-caching": True,
+                            "query-caching-ttl-ratio": 20,
+                        }
+                    },
+                ),
+                (("/api/card/3",), {"json": {"cache_ttl": None}}),
+            ],
+            using.put.call_args_list,
+        )
+
+
+class SandboxTests(TestCase):
+    def test_list(self):
+        """Ensure Sandbox.list() names the group and table of every sandbox."""
+        using = Mock()
+        using.get.return_value = Mock(
+            status_code=200,
+            json=lambda: [
+                {
+                    "id": 1,
+                    "group_id": 4,
+                    "table_id": 10,
+                    "card_id": None,
+                    "attribute_remappings": None,
+                }
+            ],
+        )
+        tables = [
+            Table(
+                _using=None,
+                id=10,
+                db={"name": "Warehouse"},
+                schema="public",
+                name="orders",
+            )
+        ]
+
+        with patch.object(
+            PermissionGroup,
+            "list",
+            return_value=[PermissionGroup(_using=None, id=4, name="Finance")],
+        ), patch.object(Table, "list", return_value=tables):
+            sandboxes = Sandbox.list(using=using)
+
+        self.assertEqual("Finance:Warehouse.public.orders", sandboxes[0].key)
+        self.assertDictEqual({}, sandboxes[0].attribute_remappings)
+        self.assertIsNone(using.get.assert_called_once_with("/api/mt/gtap"))
+
+
+class SubscriptionTests(TestCase):
+    def test_list(self):
+        """Ensure Subscription.list() only lists dashboard subscriptions, with their recipients."""
+        responses = {
+            "/api/dashboard": [{"id": 1, "name": "Sales", "collection_id": None}],
+            "/api/pulse": [
+                {
+                    "id": 1,
+                    "name": "Weekly",
+                    "dashboard_id": 1,
+                    "channels": [
+                        {
+                            "channel_type": "email",
+                            "schedule_type": "daily",
+                            "schedule_hour": 8,
+                            "recipients": [{"id": 4, "email": "Jane@example.com"}],
+                        }
+                    ],
+                },
+                {"id": 2, "name": "Alert", "dashboard_id": None, "channels": []},
+            ],
+        }
+        using = Mock()
+        using.get.side_effect = lambda endpoint: Mock(
+            status_code=200, json=lambda: responses[endpoint]
+        )
+
+        with patch.object(Collection, "list", return_value=[]):
+            subscriptions = Subscription.list(using=using)
+
+        self.assertEqual(1, len(subscriptions))
+        self.assertEqual("/:Sales:Weekly", subscriptions[0].key)
+        self.assertSetEqual({"jane@example.com"}, subscriptions[0].recipients)
+        self.assertDictEqual(
+            {
+                "schedule_type": "daily",
+                "schedule_hour": 8,
+                "schedule_day": None,
+                "schedule_frame": None,
+            },
+            subscriptions[0].schedule,
+        )
+
+
+class SnippetTests(TestCase):
+    def test_list(self):
+        """Ensure Snippet.list() lists archived snippets too, and hashes their content."""
+        using = Mock()
+        using.get.side_effect = lambda endpoint, params=None: Mock(
+            status_code=200,
+            json=lambda: [
+                {
+                    "id": 2 if params else 1,
+                    "name": "Old" if params else "Region",
+                    "content": "region = 'EU'\r\n",
+                    "description": None,
+                    "archived": bool(params),
+                }
+            ],
+        )
+
+        snippets = Snippet.list(using=using)
+
+        self.assertListEqual(["Region", "Old"], [s.name for s in snippets])
+        self.assertTrue(snippets[1].archived)
+        self.assertEqual(hash_sql("region = 'EU'"), snippets[0].content_hash)
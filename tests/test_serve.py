@@ -0,0 +1,162 @@
+import json
+import os
+import tempfile
+from http.server import ThreadingHTTPServer
+from threading import Event, Thread
+from unittest import TestCase
+from unittest.mock import patch
+from urllib.request import Request, urlopen
+
+from metabase_manager.exceptions import InvalidConfigError
+from metabase_manager.manager import MetabaseManager
+from metabase_manager.report import SyncResult
+from metabase_manager.serve import Reconciler, StatusHandler
+
+
+class ReconcilerTests(TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "metabase.yml")
+        self.write("groups:\n  - name: Finance\nsettings:\n  - name: site-name\n")
+
+        self.reconciler = Reconciler(
+            manager=MetabaseManager(
+                select=["groups", "users", "settings"],
+                metabase_host=None,
+                metabase_user=None,
+                metabase_password=None,
+            ),
+            paths=[self.path],
+        )
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def write(self, content: str, mtime: int = 0):
+        with open(self.path, "w") as f:
+            f.write(content)
+        # the size or modification time of a file changes along with its content
+        os.utime(self.path, ns=(mtime, mtime))
+
+    def test_load(self):
+        """Ensure files are only parsed again once changed, returning the keys that changed."""
+        self.assertSetEqual({"groups", "settings"}, self.reconciler.load())
+        self.assertIsNone(self.reconciler.load())
+
+        self.write("groups:\n  - name: Sales\nsettings:\n  - name: site-name\n", 1)
+        self.assertSetEqual({"groups"}, self.reconciler.load())
+        self.assertListEqual(
+            ["Sales"], [g.name for g in self.reconciler.manager.config.groups]
+        )
+
+    def test_load_invalid(self):
+        """Ensure invalid files are reported once, keeping the last valid config."""
+        self.reconciler.load()
+        config = self.reconciler.manager.config
+
+        self.write("unknown: []\n", 1)
+        with self.assertRaises(InvalidConfigError):
+            self.reconciler.load()
+        self.assertIsNone(self.reconciler.load())
+        self.assertIs(config, self.reconciler.manager.config)
+
+    def test_load_missing(self):
+        """Ensure files that are deleted are reported once, until they are back."""
+        self.reconciler.load()
+        os.remove(self.path)
+
+        with self.assertRaises(OSError):
+            self.reconciler.load()
+        self.assertIsNone(self.reconciler.load())
+
+        self.write("groups:\n  - name: Sales\n", 1)
+        self.assertSetEqual({"groups", "settings"}, self.reconciler.load())
+
+    def test_run_missing(self):
+        """Ensure the reconciler keeps running when a file is deleted."""
+        self.reconciler.poll = 0.01
+        synced, logs = Event(), []
+
+        with patch.object(
+            MetabaseManager, "sync", side_effect=lambda **_: synced.set()
+        ), patch.object(Reconciler, "log", side_effect=logs.append):
+            thread = Thread(target=self.reconciler.run)
+            thread.start()
+            try:
+                # deleted once the first sync started
+                synced.wait(timeout=1)
+                os.remove(self.path)
+                self.reconciler.trigger()
+                thread.join(timeout=0.2)
+                self.assertTrue(thread.is_alive())
+            finally:
+                self.reconciler.stop()
+                thread.join()
+
+        self.assertTrue(any("Invalid config" in message for message in logs))
+
+    def test_get_keys(self):
+        """Ensure keys that changed are synced along with the keys depending on them."""
+        self.assertListEqual(
+            ["groups", "settings", "users"], self.reconciler.get_keys()
+        )
+        self.assertListEqual(
+            ["groups", "users"], self.reconciler.get_keys({"groups", "cards"})
+        )
+        self.assertListEqual([], self.reconciler.get_keys({"cards"}))
+
+    def test_reconcile(self):
+        """Ensure only changed keys are synced, and the outcome is kept as the status."""
+        result = SyncResult(counts={"settings": {"update": 1}})
+
+        excluded = []
+
+        def sync(**_):
+            excluded.extend(self.reconciler.manager.exclude)
+            return result
+
+        with patch.object(MetabaseManager, "sync", side_effect=sync) as sync:
+            self.reconciler.reconcile({"settings"}, trigger="change")
+
+            sync.assert_called_once_with(delete=True)
+
+        status = self.reconciler.status
+        self.assertFalse(status["running"])
+        self.assertEqual("change", status["last"]["trigger"])
+        self.assertListEqual(["settings"], status["last"]["keys"])
+        self.assertDictEqual(result.counts, status["last"]["counts"])
+        self.assertListEqual(["groups", "users"], excluded)
+        self.assertListEqual([], self.reconciler.manager.exclude)
+
+        with patch.object(MetabaseManager, "sync", side_effect=ValueError("boom")):
+            self.reconciler.reconcile()
+        self.assertEqual("boom", self.reconciler.status["last"]["error"])
+
+    def test_handler(self):
+        """Ensure the status can be read, and a sync triggered, over HTTP."""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+        server.reconciler = self.reconciler
+        Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        try:
+            with urlopen(f"{url}/status") as response:
+                self.assertDictEqual(
+                    {"running": False, "last": None}, json.loads(response.read())
+                )
+
+            self.reconciler.manager.client.metrics.inc(
+                "metabase_manager_http_retries_total", status=429
+            )
+            with urlopen(f"{url}/metrics") as response:
+                self.assertIn(
+                    'metabase_manager_http_retries_total{status="429"} 1',
+                    response.read().decode(),
+                )
+
+            with urlopen(Request(f"{url}/sync", method="POST")) as response:
+                self.assertEqual(202, response.status)
+            self.assertTrue(self.reconciler._trigger.is_set())
+        finally:
+            server.shutdown()
+            server.server_close()
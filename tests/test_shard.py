@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from metabase_manager.shard import Shard
+
+
+class ShardTests(TestCase):
+    def test_parse(self):
+        """Ensure Shard.parse() creates a Shard from a string formatted as 'i/N'."""
+        self.assertEqual(Shard(index=1, count=4), Shard.parse("1/4"))
+
+        for value in ["1", "a/4", "1/4/2", "4/4", "-1/4", "0/0"]:
+            with self.assertRaises(ValueError):
+                Shard.parse(value)
+
+    def test_is_leader(self):
+        """Ensure only the first Shard is the leader."""
+        self.assertTrue(Shard(index=0, count=2).is_leader)
+        self.assertFalse(Shard(index=1, count=2).is_leader)
+
+    def test_contains(self):
+        """Ensure every key belongs to exactly one Shard, and always to the same one."""
+        shards = [Shard(index=i, count=3) for i in range(3)]
+        keys = [f"user{i}@example.com" for i in range(100)]
+
+        for key in keys:
+            self.assertEqual(1, sum(shard.contains(key) for shard in shards))
+
+        # crc32 is stable across processes, unlike hash()
+        self.assertTrue(Shard(index=0, count=3).contains("user1@example.com"))
+
+        # keys are spread across all shards
+        self.assertTrue(all(any(s.contains(k) for k in keys) for s in shards))
@@ -0,0 +1,79 @@
+import time
+from unittest import TestCase
+
+from metabase_manager.throttle import AdaptiveLimiter
+
+
+class AdaptiveLimiterTests(TestCase):
+    def test_additive_increase(self):
+        """Ensure AdaptiveLimiter grows its limit on success, up to its ceiling."""
+        limiter = AdaptiveLimiter(ceiling=3)
+        self.assertEqual(1, limiter.limit)
+
+        limiter.release(limiter.acquire(), 200)
+        self.assertEqual(2, limiter.limit)
+
+        for _ in range(10):
+            limiter.release(limiter.acquire(), 200)
+        self.assertEqual(3, limiter.limit)
+        self.assertEqual(11, limiter.requests)
+        self.assertEqual(0, limiter.in_flight)
+
+    def test_multiplicative_decrease(self):
+        """Ensure AdaptiveLimiter halves its limit when Metabase is overloaded or slow."""
+        for status_code, latency in [(429, 0), (503, 0), (None, 0), (200, 10)]:
+            limiter = AdaptiveLimiter(ceiling=8, latency_threshold=5)
+            limiter.limit = 8
+
+            started = limiter.acquire()
+            limiter.release(started - latency, status_code)
+            self.assertEqual(4, limiter.limit)
+
+        limiter = AdaptiveLimiter(ceiling=8)
+        limiter.limit = 1
+        limiter.release(limiter.acquire(), 429)
+        self.assertEqual(1, limiter.limit)
+        self.assertEqual(1, limiter.throttled)
+
+    def test_no_latency_threshold(self):
+        """Ensure slow responses don't decrease the limit without a latency threshold."""
+        limiter = AdaptiveLimiter(ceiling=4, latency_threshold=None, initial_limit=4)
+        self.assertEqual(4, limiter.limit)
+
+        started = limiter.acquire()
+        limiter.release(started - 10, 200)
+        self.assertEqual(4, limiter.limit)
+
+        limiter.release(limiter.acquire(), 503)
+        self.assertEqual(2, limiter.limit)
+
+    def test_decrease_once_per_window(self):
+        """Ensure requests in flight during a decrease don't decrease the limit again."""
+        limiter = AdaptiveLimiter(ceiling=8)
+        limiter.limit = 8
+
+        started = [limiter.acquire() for _ in range(4)]
+        for start in started:
+            limiter.release(start, 429)
+
+        self.assertEqual(4, limiter.limit)
+
+    def test_max_rps(self):
+        """Ensure AdaptiveLimiter does not start more than max_rps requests per second."""
+        limiter = AdaptiveLimiter(ceiling=8, max_rps=20)
+
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.release(limiter.acquire(), 200)
+
+        # the first request starts immediately
+        self.assertGreaterEqual(time.monotonic() - started, 4 / 20)
+
+    def test_mean_latency(self):
+        """Ensure AdaptiveLimiter.mean_latency averages completed requests."""
+        limiter = AdaptiveLimiter()
+        self.assertIsNone(limiter.mean_latency)
+
+        limiter.release(limiter.acquire() - 1, 200)
+        limiter.release(limiter.acquire() - 3, 200)
+        self.assertAlmostEqual(2, limiter.mean_latency, places=1)
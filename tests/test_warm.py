@@ -0,0 +1,163 @@
+import time
+from threading import Lock
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from requests import HTTPError
+
+from metabase_manager.client import MetabaseClient
+from metabase_manager.exceptions import NotFoundError
+from metabase_manager.registry import MetabaseRegistry
+from metabase_manager.resources import Card, Dashboard
+from metabase_manager.warm import Warm
+
+
+class WarmTests(TestCase):
+    def setUp(self) -> None:
+        self.client = Mock()
+        self.registry = MetabaseRegistry(client=self.client)
+        self.cards = [
+            Card(
+                _using=self.client,
+                id=i,
+                name=name,
+                collection_path=path,
+                dataset_query={"database": database},
+            )
+            for i, path, name, database in [
+                (1, "/Finance", "Orders", 2),
+                (2, "/Finance/Reports", "Refunds", 2),
+                (3, "/Marketing", "Campaigns", 3),
+                (4, None, "Mine", 2),
+            ]
+        ]
+        self.dashboards = [
+            Dashboard(
+                _using=self.client,
+                id=1,
+                name="Sales",
+                collection_path="/",
+                dashcards=[{"card_id": 3}, {"card_id": None}],
+            )
+        ]
+
+    def cache(self, select):
+        for key in select:
+            setattr(self.registry, key, getattr(self, key))
+
+    def test_get_targets(self):
+        """Ensure cards are selected by collection path, or by card or dashboard key."""
+        with patch.object(self.registry, "cache", side_effect=self.cache) as cache:
+            warm = Warm(registry=self.registry, select=["/Finance", "/Finance:Orders"])
+            self.assertListEqual([1, 2], [c.id for c in warm.get_targets()])
+            # dashboards are only read when selected
+            self.assertEqual(1, cache.call_count)
+
+            warm = Warm(registry=self.registry, select=["/:Sales", "/Fin"])
+            self.assertListEqual([3], [c.id for c in warm.get_targets()])
+
+            with self.assertRaises(NotFoundError):
+                Warm(registry=self.registry, select=["/:Unknown"]).get_targets()
+
+    def test_interleave(self):
+        """Ensure cards alternate between databases."""
+        self.assertListEqual([1, 3, 2, 4], [c.id for c in Warm.interleave(self.cards)])
+
+    def test_run(self):
+        """Ensure every card is queried, and failed queries are reported."""
+        self.client.post.side_effect = lambda endpoint: Mock(
+            status_code=202,
+            latency=0.1,
+            json=lambda: {"status": "failed", "error": "Timeout"}
+            if endpoint == "/api/card/3/query"
+            else {"status": "completed"},
+        )
+
+        with patch.object(self.registry, "cache", side_effect=self.cache):
+            results = {
+                r.card: r
+                for r in Warm(
+                    registry=self.registry, select=["/Finance", "/Marketing"]
+                ).run()
+            }
+
+        self.assertSetEqual(
+            {"/Finance:Orders", "/Finance/Reports:Refunds", "/Marketing:Campaigns"},
+            set(results),
+        )
+        self.assertIsNone(results["/Finance:Orders"].error)
+        self.assertEqual("Timeout", results["/Marketing:Campaigns"].error)
+
+    def test_run_budget(self):
+        """Ensure queries that haven't started once the time budget ran out are skipped."""
+
+        def query(endpoint):
+            time.sleep(0.05)
+            return Mock(
+                status_code=202, latency=0.05, json=lambda: {"status": "completed"}
+            )
+
+        self.client.post.side_effect = query
+
+        with patch.object(self.registry, "cache", side_effect=self.cache):
+            warm = Warm(
+                registry=self.registry,
+                select=["/Finance"],
+                max_concurrency=1,
+                budget=0.01,
+            )
+            results = list(warm.run())
+
+        self.assertListEqual([False, True], [r.skipped for r in results])
+        self.assertEqual(1, self.client.post.call_count)
+
+    def test_run_concurrency(self):
+        """Ensure slow queries don't reduce concurrency, and are timed once sent."""
+        client = MetabaseClient(
+            host="https://example.com",
+            user=None,
+            password=None,
+            token="token",
+            limiter=Warm.get_limiter(4),
+        )
+        self.registry.client = client
+        self.cards = [
+            Card(
+                _using=client,
+                id=i,
+                name=str(i),
+                collection_path="/Finance",
+                dataset_query={"database": i % 4},
+            )
+            for i in range(8)
+        ]
+        lock, in_flight, peak = Lock(), [0], [0]
+
+        def request(*args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.1)
+            with lock:
+                in_flight[0] -= 1
+            return Mock(status_code=202, json=lambda: {"status": "completed"})
+
+        with patch("requests.request", side_effect=request), patch.object(
+            self.registry, "cache", side_effect=self.cache
+        ):
+            results = list(
+                Warm(
+                    registry=self.registry, select=["/Finance"], max_concurrency=4
+                ).run()
+            )
+
+        self.assertEqual(4, peak[0])
+        self.assertEqual(8, len(results))
+        self.assertTrue(all(r.duration < 0.2 for r in results))
+
+    def test_query(self):
+        """Ensure errors returned by Metabase are raised."""
+        self.client.post.return_value = Mock(status_code=500, content=b"error")
+
+        with self.assertRaises(HTTPError):
+            Warm(registry=self.registry).query(self.cards[0])